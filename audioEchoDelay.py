@@ -1,15 +1,35 @@
-import numpy as np
 import soundfile as sf
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-from tkinterdnd2 import DND_FILES, TkinterDnD
-import pygame
-import time
 import os
-from concurrent.futures import ThreadPoolExecutor
 import glob
 from threading import Thread
 
+from eco_audio import (
+    CacheResultados,
+    CatalogoMetadados,
+    ConstrutorPicos,
+    ControleTrabalho,
+    MotorLote,
+    ProcessamentoCancelado,
+    ProgressoLote,
+    RenderizadorPrevia,
+    ReprodutorPrevia,
+    SUBTIPOS_SAIDA,
+    Tarefa,
+    banco_padrao,
+    carregar_picos,
+    estatisticas,
+    pasta_cache_picos,
+    processar_arquivo,
+    resumir_metadados,
+    salvar_picos,
+    validar_parametros,
+)
+
+# Intervalo com que a fila da pré-visualização é passada ao mixer
+INTERVALO_FILA_MS = 50
+
 class AplicacaoEcoAudio:
     """Aplicação para adicionar efeito de eco em arquivos de áudio usando interface gráfica."""
 
@@ -20,14 +40,32 @@ class AplicacaoEcoAudio:
         self.taxa_amostragem = None  # Taxa de amostragem do arquivo de áudio
         self.arquivo_audio = None  # Caminho do arquivo de áudio atual
         self.pasta_impulsos = None  # Pasta contendo arquivos de impulso
+        self.banco_ir = banco_padrao()  # Cache de IRs decodificados e transformados
+        self.motor_lote = MotorLote()  # Pool de processos para o processamento em lote
+        self.cache_resultados = None  # Resultados de lotes anteriores, criado se o cache for ativado
+        self.reprodutor = ReprodutorPrevia()  # Mixer persistente para pré-visualização
+        self.renderizador = None  # Renderização e cache da pré-visualização do áudio carregado
+        self.geracao_previa = 0  # Identifica a reprodução atual para descartar extensões antigas
+        self.controle = None  # Progresso e cancelamento do processamento em andamento
+        self.metadados = CatalogoMetadados()  # Cabeçalhos de arquivos e IRs, lidos sem decodificar
+        self.controle_varredura = None  # Varredura de metadados da seleção atual
+        self.controle_varredura_irs = None  # Varredura de metadados da pasta de IRs
+        self.carregando_audio = None  # Arquivo sendo decodificado para a pré-visualização
+        self.picos_seco = None  # Pirâmide de picos do arquivo selecionado
+        self.picos_processado = None  # Pirâmide de picos do último resultado desse arquivo
+        # Os picos montados pela interface ficam no cache do usuário, não ao lado dos áudios
+        self.pasta_picos = pasta_cache_picos()
+        self.vista_onda = None  # Trecho (primeiro quadro, quadro final) mostrado na forma de onda
+        self.arrasto_onda = None  # Posição x do último evento ao arrastar a forma de onda
         self.configurar_interface()
 
     def configurar_interface(self):
         """Configura os componentes da interface gráfica."""
         self.root.title("Aplicação de Eco e Delay")
-        self.root.geometry("400x400")
+        self.root.geometry("400x600")
 
         # Registro do suporte para arrastar e soltar
+        from tkinterdnd2 import DND_FILES
         self.root.drop_target_register(DND_FILES)
         self.root.dnd_bind('<<Drop>>', self.ao_soltar)
 
@@ -54,6 +92,20 @@ class AplicacaoEcoAudio:
         self.entrada_decaimento.pack()
         self.entrada_decaimento.insert(0, "0.5")  # Valor padrão
 
+        self.var_realimentacao = tk.BooleanVar()
+        tk.Checkbutton(frame_params, text="Repetir eco até decair (realimentação)",
+                       variable=self.var_realimentacao).pack()
+
+        tk.Label(frame_params, text="Formato de saída").pack()
+        self.combo_formato = ttk.Combobox(frame_params, values=SUBTIPOS_SAIDA, state='readonly')
+        self.combo_formato.pack()
+        self.combo_formato.set(SUBTIPOS_SAIDA[0])
+
+        # Opcional, como o --cache da linha de comando: guarda cópias dos resultados em disco
+        self.var_cache = tk.BooleanVar()
+        tk.Checkbutton(frame_params, text="Reaproveitar resultados de lotes anteriores (cache)",
+                       variable=self.var_cache).pack()
+
         # Frame para resposta de impulso
         frame_impulso = ttk.LabelFrame(self.root, text="Resposta de Impulso")
         frame_impulso.pack(pady=5, padx=5, fill="x")
@@ -94,126 +146,240 @@ class AplicacaoEcoAudio:
         self.botao_salvar = tk.Button(frame_controles, text="Processar", command=self.processar_arquivos)
         self.botao_salvar.pack(side=tk.LEFT, padx=5)
 
+        self.botao_cancelar = tk.Button(frame_controles, text="Cancelar",
+                                        command=self.cancelar_processamento, state='disabled')
+        self.botao_cancelar.pack(side=tk.LEFT, padx=5)
+
         # Barra de progresso
         self.barra_progresso = ttk.Progressbar(self.root, mode='determinate')
         self.barra_progresso.pack(pady=10, fill="x", padx=5)
 
-    def carregar_audio(self, caminho_arquivo):
+        # Forma de onda original (em cima) e processada (embaixo), desenhada
+        # da pirâmide de picos: roda do mouse aproxima, arrastar desloca
+        frame_onda = ttk.LabelFrame(self.root, text="Forma de onda (original / processada)")
+        frame_onda.pack(pady=5, padx=5, fill="both", expand=True)
+        self.tela_onda = tk.Canvas(frame_onda, height=110, background='white',
+                                   highlightthickness=0)
+        self.tela_onda.pack(fill="both", expand=True)
+        self.tela_onda.bind('<Configure>', lambda evento: self.desenhar_onda())
+        self.tela_onda.bind('<MouseWheel>', self.ao_rolar_onda)
+        self.tela_onda.bind('<Button-4>', self.ao_rolar_onda)
+        self.tela_onda.bind('<Button-5>', self.ao_rolar_onda)
+        self.tela_onda.bind('<ButtonPress-1>', self.ao_pressionar_onda)
+        self.tela_onda.bind('<B1-Motion>', self.ao_arrastar_onda)
+
+    def descrever_metadados(self, metadados):
+        """Texto curto com canais, duração e taxa de um arquivo."""
+        if metadados.canais == 1:
+            canais = "Mono"
+        elif metadados.canais == 2:
+            canais = "Estéreo"
+        else:
+            canais = f"{metadados.canais} canais"
+        return f"{canais} | {self.formatar_duracao(metadados.duracao)} | {metadados.taxa}Hz"
+
+    def formatar_duracao(self, segundos):
+        """Formata uma duração como 1:02:03, 2:03 ou 3.25s."""
+        if segundos < 60:
+            return f"{segundos:.2f}s"
+        minutos, segundos = divmod(int(segundos), 60)
+        horas, minutos = divmod(minutos, 60)
+        if horas:
+            return f"{horas}:{minutos:02d}:{segundos:02d}"
+        return f"{minutos}:{segundos:02d}"
+
+    def preparar_previa(self, caminho_arquivo):
         """
-        Carrega um arquivo de áudio na memória para pré-visualização.
+        Prepara um arquivo para pré-visualização lendo só o cabeçalho.
+
+        As amostras são decodificadas apenas no primeiro Tocar (ver carregar_audio).
 
         Args:
-            caminho_arquivo (str): Caminho do arquivo de áudio a ser carregado.
+            caminho_arquivo (str): Caminho do arquivo de áudio selecionado.
         """
+        self.dados_audio = None
+        self.descartar_renderizador()
+        # A forma de onda só aparece de imediato se já houver picos gravados
+        self.mostrar_picos(carregar_picos(caminho_arquivo, self.pasta_picos))
         try:
-            self.dados_audio, self.taxa_amostragem = sf.read(caminho_arquivo)
-            self.arquivo_audio = caminho_arquivo
-            self.rotulo_arquivo.config(text=f"Arquivo para pré-visualização: {os.path.basename(caminho_arquivo)}")
-            # Habilita botões de reprodução
-            self.botao_tocar.config(state='normal')
-            self.botao_parar.config(state='normal')
+            metadados = self.metadados.obter(caminho_arquivo)
         except Exception as e:
+            self.arquivo_audio = None
+            self.botao_tocar.config(state='disabled')
+            self.botao_parar.config(state='disabled')
             messagebox.showerror("Erro", f"Falha ao carregar arquivo: {e}")
+            return
+        self.arquivo_audio = caminho_arquivo
+        self.rotulo_arquivo.config(
+            text=f"Arquivo selecionado: {os.path.basename(caminho_arquivo)}\n"
+                 f"{self.descrever_metadados(metadados)}"
+        )
+        # Habilita botões de reprodução
+        self.botao_tocar.config(state='normal')
+        self.botao_parar.config(state='normal')
 
-    def adicionar_eco(self, dados_audio, atraso_ms, decaimento, taxa_amostragem=None):
+    def carregar_audio(self, caminho_arquivo, ao_carregar=None):
         """
-        Aplica efeito de eco aos dados de áudio.
+        Decodifica o arquivo em segundo plano para pré-visualização.
 
         Args:
-            dados_audio (numpy.ndarray): Dados do áudio original
-            atraso_ms (int): Atraso do eco em milissegundos
-            decaimento (float): Fator de decaimento do eco (0.0 a 1.0)
-            taxa_amostragem (int, optional): Taxa de amostragem do áudio. 
-                                           Se None, usa a taxa do áudio carregado.
+            caminho_arquivo (str): Caminho do arquivo de áudio a ser carregado.
+            ao_carregar (callable, optional): Chamado na thread da interface
+                quando o áudio estiver pronto
+        """
+        self.carregando_audio = caminho_arquivo
+        self.botao_tocar.config(state='disabled')
 
-        Returns:
-            numpy.ndarray: Dados do áudio com efeito de eco aplicado
+        def decodificar():
+            try:
+                # A pré-visualização é tocada em 16 bits; float32 basta e usa metade da memória
+                dados, taxa = sf.read(caminho_arquivo, dtype='float32')
+            except Exception as e:
+                self.root.after(0, lambda: self.concluir_carregamento(caminho_arquivo, erro=e))
+                return
+            # Aproveita a decodificação para montar (e guardar) os picos da forma de onda
+            picos = carregar_picos(caminho_arquivo, self.pasta_picos)
+            if picos is None:
+                construtor = ConstrutorPicos(taxa)
+                construtor.acumular(dados)
+                picos = construtor.finalizar()
+                salvar_picos(picos, caminho_arquivo, self.pasta_picos)
+            self.root.after(0, lambda: self.concluir_carregamento(
+                caminho_arquivo, dados, taxa, ao_carregar, picos=picos))
+
+        Thread(target=decodificar, daemon=True).start()
+
+    def concluir_carregamento(self, caminho_arquivo, dados=None, taxa=None, ao_carregar=None,
+                              erro=None, picos=None):
+        """Guarda o áudio decodificado, se ele ainda for o selecionado."""
+        if self.carregando_audio == caminho_arquivo:
+            self.carregando_audio = None
+        if caminho_arquivo != self.arquivo_audio:
+            return
+        if self.controle is None:
+            self.botao_tocar.config(state='normal')
+        if erro is not None:
+            messagebox.showerror("Erro", f"Falha ao carregar arquivo: {erro}")
+            return
+        self.dados_audio, self.taxa_amostragem = dados, taxa
+        self.renderizador = RenderizadorPrevia(self.dados_audio, self.taxa_amostragem,
+                                               banco=self.banco_ir)
+        if self.picos_seco is None:
+            self.mostrar_picos(picos, self.picos_processado)
+        if ao_carregar is not None:
+            ao_carregar()
+
+    def descartar_renderizador(self):
+        """Cancela a renderização da pré-visualização do áudio anterior e a descarta."""
+        if self.renderizador is not None:
+            self.renderizador.parar()
+        self.renderizador = None
+
+    def mostrar_picos(self, seco, processado=None):
+        """Troca as formas de onda exibidas e volta ao arquivo inteiro."""
+        self.picos_seco = seco
+        self.picos_processado = processado
+        self.vista_onda = None
+        self.desenhar_onda()
+
+    def quadros_onda(self):
+        """Duração, em quadros, do maior sinal exibido."""
+        return max([picos.quadros for picos in (self.picos_seco, self.picos_processado)
+                    if picos is not None] or [0])
+
+    def desenhar_onda(self):
+        """
+        Desenha as formas de onda do trecho visível.
+
+        Cada coluna vem da pirâmide de picos (ver PiramidePicos.janela), de
+        modo que redesenhar custa o mesmo para arquivos de segundos ou horas.
         """
-        if dados_audio is None:
-            raise ValueError("Nenhum dado de áudio carregado.")
-
-        # Usa a taxa de amostragem fornecida ou a da classe
-        taxa = taxa_amostragem if taxa_amostragem is not None else self.taxa_amostragem
-
-        # Converte atraso de milissegundos para amostras
-        amostras_atraso = int((atraso_ms / 1000) * taxa)
-
-        # Se estiver usando resposta de impulso
-        if self.var_usar_impulso.get() and self.pasta_impulsos:
-            return self.aplicar_resposta_impulso(dados_audio, taxa)
-
-        # Caso contrário, aplica eco normal
-        # Cria um array de saída com tamanho suficiente para acomodar o eco
-        tamanho_saida = len(dados_audio) + amostras_atraso
-        if dados_audio.ndim == 1:  # Áudio mono
-            saida = np.zeros(tamanho_saida)
-            # Copia o áudio original
-            saida[:len(dados_audio)] = dados_audio
-            # Adiciona o eco
-            for i in range(len(dados_audio)):
-                saida[i + amostras_atraso] += decaimento * dados_audio[i]
-        else:  # Áudio estéreo
-            saida = np.zeros((tamanho_saida, 2))
-            # Copia o áudio original
-            saida[:len(dados_audio)] = dados_audio
-            # Adiciona o eco
-            for i in range(len(dados_audio)):
-                saida[i + amostras_atraso, 0] += decaimento * dados_audio[i, 0]
-                saida[i + amostras_atraso, 1] += decaimento * dados_audio[i, 1]
-
-        return np.clip(saida, -1.0, 1.0)
-    
+        tela = self.tela_onda
+        tela.delete('all')
+        largura, altura = tela.winfo_width(), tela.winfo_height()
+        total = self.quadros_onda()
+        if total == 0 or largura < 2:
+            tela.create_text(largura // 2, altura // 2, fill='gray',
+                             text="Toque ou processe o arquivo para ver a forma de onda")
+            return
+        inicio, fim = self.vista_onda or (0, total)
+        meia = altura / 2
+        for indice, (picos, cor) in enumerate(((self.picos_seco, 'steel blue'),
+                                                 (self.picos_processado, 'dark orange'))):
+            centro = meia * indice + meia / 2
+            tela.create_line(0, centro, largura, centro, fill='light gray')
+            if picos is None:
+                continue
+            minimos, maximos = picos.janela(inicio, fim, largura)
+            if not len(minimos):
+                continue
+            # Colunas do trecho coberto por este sinal (o processado pode ser mais longo)
+            colunas = largura * (min(fim, picos.quadros) - inicio) / (fim - inicio)
+            escala = colunas / len(minimos)
+            minimos, maximos = minimos.min(axis=1), maximos.max(axis=1)
+            for coluna, (minimo, maximo) in enumerate(zip(minimos, maximos)):
+                x = coluna * escala
+                tela.create_line(x, centro - maximo * meia / 2, x, centro - minimo * meia / 2 + 1,
+                                 fill=cor)
+
+    def ao_rolar_onda(self, evento):
+        """Aproxima ou afasta a forma de onda em torno do cursor."""
+        total = self.quadros_onda()
+        if total == 0:
+            return
+        inicio, fim = self.vista_onda or (0, total)
+        aproximar = evento.num == 4 or evento.delta > 0
+        fator = 0.5 if aproximar else 2.0
+        largura = max(1, self.tela_onda.winfo_width())
+        ancora = inicio + (fim - inicio) * evento.x / largura
+        # Aproxima no máximo até um par do nível mais detalhado por coluna
+        detalhe = min(picos.amostras_por_pico for picos in (self.picos_seco, self.picos_processado)
+                      if picos is not None)
+        extensao = min(total, max(largura * detalhe, (fim - inicio) * fator))
+        inicio = min(max(0, ancora - (ancora - inicio) * fator), total - extensao)
+        self.vista_onda = (int(inicio), int(inicio + extensao))
+        self.desenhar_onda()
+
+    def ao_pressionar_onda(self, evento):
+        """Marca o início de um arrasto na forma de onda."""
+        self.arrasto_onda = evento.x
+
+    def ao_arrastar_onda(self, evento):
+        """Desloca o trecho visível acompanhando o mouse."""
+        total = self.quadros_onda()
+        if total == 0 or self.arrasto_onda is None:
+            return
+        inicio, fim = self.vista_onda or (0, total)
+        extensao = fim - inicio
+        largura = max(1, self.tela_onda.winfo_width())
+        deslocamento = (self.arrasto_onda - evento.x) * extensao / largura
+        self.arrasto_onda = evento.x
+        inicio = int(min(max(0, inicio + deslocamento), total - extensao))
+        self.vista_onda = (inicio, inicio + extensao)
+        self.desenhar_onda()
+
     def validar_parametros(self, atraso_ms, decaimento):
         try:
-            atraso = int(atraso_ms)
-            if atraso <= 0:
-                raise ValueError("O atraso deve ser um número positivo")
-                
-            decay = float(decaimento)
-            if not 0.0 <= decay <= 1.0:
-                raise ValueError("O decaimento deve estar entre 0.0 e 1.0")
-                
-            return atraso, decay
+            # A realimentação não se aplica quando a resposta de impulso está em uso
+            usar_impulso = self.var_usar_impulso.get() and self.pasta_impulsos
+            return validar_parametros(atraso_ms, decaimento,
+                                      self.var_realimentacao.get() and not usar_impulso)
         except ValueError as e:
             messagebox.showerror("Erro de Validação", str(e))
             raise
 
-    def aplicar_resposta_impulso(self, dados_audio, taxa_amostragem=None):
+    def obter_caminho_ir(self):
         """
-        Aplica a resposta de impulso ao áudio.
-        
-        Args:
-            dados_audio (numpy.ndarray): Dados do áudio original
-            taxa_amostragem (int, optional): Taxa de amostragem do áudio
+        Retorna o caminho do IR selecionado.
 
         Returns:
-            numpy.ndarray: Áudio processado com a resposta de impulso
+            str: Caminho do IR, ou None se a resposta de impulso não estiver em uso
         """
-        try:
-            if not self.combo_ir.get():
-                raise ValueError("Nenhum IR selecionado.")
-
-            # Carrega o arquivo de impulso selecionado
-            caminho_ir = os.path.join(self.pasta_impulsos, self.combo_ir.get())
-            impulso, taxa_impulso = sf.read(caminho_ir)
-
-            # Garante que o impulso seja mono se necessário
-            if impulso.ndim > 1:
-                impulso = np.mean(impulso, axis=1)
-
-            # Aplica a convolução
-            if dados_audio.ndim == 1:  # Áudio mono
-                resultado = np.convolve(dados_audio, impulso, mode='full')
-            else:  # Áudio estéreo
-                resultado_l = np.convolve(dados_audio[:, 0], impulso, mode='full')
-                resultado_r = np.convolve(dados_audio[:, 1], impulso, mode='full')
-                resultado = np.column_stack((resultado_l, resultado_r))
-
-            # Normaliza o resultado
-            return np.clip(resultado / np.max(np.abs(resultado)), -1.0, 1.0)
-        except Exception as e:
-            messagebox.showerror("Erro", f"Falha ao aplicar resposta de impulso: {e}")
-            return dados_audio
+        if not (self.var_usar_impulso.get() and self.pasta_impulsos):
+            return None
+        if not self.combo_ir.get():
+            raise ValueError("Nenhum IR selecionado.")
+        return os.path.join(self.pasta_impulsos, self.combo_ir.get())
 
     def selecionar_pasta_impulsos(self):
         """Permite ao usuário selecionar a pasta contendo arquivos de resposta de impulso."""
@@ -233,6 +399,11 @@ class AplicacaoEcoAudio:
                 self.combo_ir.set(nomes_irs[0])  # Seleciona o primeiro IR
                 self.combo_ir.config(state='readonly')
                 self.atualizar_info_ir(nomes_irs[0])
+                # Cataloga os demais cabeçalhos em segundo plano para a troca de IR ser imediata
+                if self.controle_varredura_irs is not None:
+                    self.controle_varredura_irs.cancelar()
+                self.controle_varredura_irs = ControleTrabalho()
+                self.metadados.varrer(arquivos_impulso, controle=self.controle_varredura_irs)
             else:
                 self.combo_ir.set('')
                 self.combo_ir['values'] = []
@@ -250,12 +421,10 @@ class AplicacaoEcoAudio:
         if nome_arquivo:
             caminho_completo = os.path.join(self.pasta_impulsos, nome_arquivo)
             try:
-                # Carrega o IR para obter informações
-                dados, taxa = sf.read(caminho_completo)
-                duracao = len(dados) / taxa
-                canais = "Estéreo" if dados.ndim > 1 else "Mono"
+                # Só o cabeçalho: o IR é decodificado quando for aplicado
+                metadados = self.metadados.obter(caminho_completo)
                 self.rotulo_ir.config(
-                    text=f"IR: {nome_arquivo} | {canais} | {duracao:.2f}s | {taxa}Hz"
+                    text=f"IR: {nome_arquivo} | {self.descrever_metadados(metadados)}"
                 )
             except Exception as e:
                 self.rotulo_ir.config(text=f"Erro ao carregar IR: {str(e)}")
@@ -278,19 +447,68 @@ class AplicacaoEcoAudio:
         self.barra_progresso['value'] = valor
         self.root.update_idletasks()
 
-    def finalizar_processamento_unico(self, sucesso, erro=None):
-        """Finaliza o processamento de arquivo único"""
-        # Reabilita botões
+    def iniciar_processamento(self):
+        """
+        Desabilita os botões e cria o controle do processamento.
+
+        O progresso chega na thread de processamento e é repassado à
+        interface com root.after, por quadros processados.
+
+        Returns:
+            ControleTrabalho: Controle a passar ao processamento
+        """
+        self.botao_salvar.config(state='disabled')
+        self.botao_tocar.config(state='disabled')
+        self.botao_parar.config(state='disabled')
+        self.botao_cancelar.config(state='normal')
+        self.barra_progresso['value'] = 0
+        self.root.update_idletasks()
+
+        def ao_progredir(feitos, total):
+            valor = 100 * feitos / total if total else 0
+            self.root.after(0, lambda: self.atualizar_progresso(valor))
+
+        self.controle = ControleTrabalho(ao_progredir)
+        return self.controle
+
+    def encerrar_processamento(self):
+        """Reabilita os botões e reseta a barra de progresso."""
+        self.controle = None
         self.botao_salvar.config(state='normal')
         self.botao_tocar.config(state='normal')
         self.botao_parar.config(state='normal')
-        
-        # Reseta barra de progresso
+        self.botao_cancelar.config(state='disabled')
         self.barra_progresso['value'] = 0
-        
+
+    def cancelar_processamento(self):
+        """Pede o cancelamento; o processamento para no próximo bloco."""
+        if self.controle is not None:
+            self.controle.cancelar()
+            self.botao_cancelar.config(state='disabled')
+
+    def finalizar_processamento_unico(self, sucesso, erro=None, medicao=None, cancelado=False,
+                                      caminho_entrada=None, picos=None):
+        """Finaliza o processamento de arquivo único"""
+        self.encerrar_processamento()
+
+        # Mostra o original e o resultado, se o arquivo ainda for o selecionado
+        if picos is not None and caminho_entrada == self.arquivo_audio:
+            self.mostrar_picos(*picos)
+
         # Mostra mensagem apropriada
-        if sucesso:
-            messagebox.showinfo("Sucesso", "Arquivo processado com sucesso!")
+        if cancelado:
+            messagebox.showinfo("Cancelado", "Processamento cancelado. O arquivo parcial foi removido.")
+        elif sucesso:
+            mensagem = "Arquivo processado com sucesso!"
+            if medicao is not None:
+                etapas = medicao.etapas
+                dados = medicao.como_dict()
+                mensagem += (f"\n\nLeitura: {etapas['decodificacao']:.2f} s"
+                             f"\nProcessamento: {etapas['dsp']:.2f} s"
+                             f"\nGravação: {etapas['codificacao']:.2f} s")
+                if dados['fator_tempo_real']:
+                    mensagem += f"\n{dados['fator_tempo_real']:.1f}x tempo real"
+            messagebox.showinfo("Sucesso", mensagem)
         else:
             messagebox.showerror("Erro", f"Falha ao processar arquivo: {erro}")
 
@@ -315,40 +533,45 @@ class AplicacaoEcoAudio:
             if not caminho_saida:  # Usuário cancelou
                 return
 
-            # Desabilita botões durante o processamento
-            self.botao_salvar.config(state='disabled')
-            self.botao_tocar.config(state='disabled')
-            self.botao_parar.config(state='disabled')
+            try:
+                caminho_ir = self.obter_caminho_ir()
+            except ValueError as e:
+                messagebox.showerror("Erro", str(e))
+                return
+            try:
+                atraso_ms, decaimento = self.validar_parametros(
+                    self.entrada_atraso.get(),
+                    self.entrada_decaimento.get()
+                )
+            except ValueError:
+                messagebox.showerror("Erro", "Parâmetros inválidos")
+                return
+            realimentacao = self.var_realimentacao.get()
+            subtipo = self.combo_formato.get()
 
-            # Reinicia a barra de progresso
-            self.barra_progresso['value'] = 0
-            self.root.update_idletasks()
+            caminho_entrada = self.arquivos_selecionados[0]
+
+            # Desabilita botões durante o processamento
+            controle = self.iniciar_processamento()
 
             def processar_unico():
                 try:
-                    # Leitura do arquivo - 25%
-                    dados, taxa = sf.read(self.arquivos_selecionados[0])
-                    self.root.after(0, lambda: self.atualizar_progresso(25))
-
-                    # Processamento do eco - 50%
-                    try:
-                        atraso_ms, decaimento = self.validar_parametros(
-                            self.entrada_atraso.get(),
-                            self.entrada_decaimento.get()
-                        )
-                    except ValueError:
-                        self.root.after(0, lambda: self.finalizar_processamento_unico(False, "Parâmetros inválidos"))
-                        return
-                    dados_modificados = self.adicionar_eco(dados, atraso_ms, decaimento, taxa_amostragem=taxa)
-                    self.root.after(0, lambda: self.atualizar_progresso(50))
-
-                    # Salvamento do arquivo - 75%
-                    sf.write(caminho_saida, dados_modificados, taxa)
-                    self.root.after(0, lambda: self.atualizar_progresso(75))
-
-                    # Finalização - 100%
-                    self.root.after(0, lambda: self.atualizar_progresso(100))
-                    self.root.after(0, lambda: self.finalizar_processamento_unico(True))
+                    # Leitura, processamento e salvamento em blocos, com progresso por bloco
+                    medicao = processar_arquivo(
+                        caminho_entrada, caminho_saida, atraso_ms, decaimento,
+                        realimentacao=realimentacao, caminho_ir=caminho_ir, banco=self.banco_ir,
+                        precisao='float32', subtipo=subtipo, controle=controle,
+                        picos=self.pasta_picos
+                    )
+                    estatisticas().registrar(medicao)
+                    picos = (
+                        carregar_picos(caminho_entrada, self.pasta_picos),
+                        carregar_picos(caminho_saida, self.pasta_picos),
+                    )
+                    self.root.after(0, lambda: self.finalizar_processamento_unico(
+                        True, medicao=medicao, caminho_entrada=caminho_entrada, picos=picos))
+                except ProcessamentoCancelado:
+                    self.root.after(0, lambda: self.finalizar_processamento_unico(False, cancelado=True))
                 except Exception as e:
                     self.root.after(0, lambda: self.finalizar_processamento_unico(False, str(e)))
 
@@ -362,100 +585,99 @@ class AplicacaoEcoAudio:
         if not pasta_destino:  # Usuário cancelou
             return
 
-        # Desabilita botões durante o processamento
-        self.botao_salvar.config(state='disabled')
-        self.botao_tocar.config(state='disabled')
-        self.botao_parar.config(state='disabled')
-
         try:
             atraso_ms, decaimento = self.validar_parametros(
                 self.entrada_atraso.get(),
                 self.entrada_decaimento.get()
             )
         except ValueError:
+            messagebox.showerror("Erro", "Parâmetros inválidos")
+            return
+
+        try:
+            caminho_ir = self.obter_caminho_ir()
+        except ValueError as e:
+            messagebox.showerror("Erro", str(e))
             return
+        realimentacao = self.var_realimentacao.get()
 
         # Variáveis para controle do processamento em lote
-        processamento_lote = {
-            'total': total,
-            'processados': 0,
-            'erros': [],
-            'params': {
-                'atraso_ms': int(self.entrada_atraso.get()),
-                'decaimento': float(self.entrada_decaimento.get()),
-                'pasta_destino': pasta_destino
-            }
+        parametros = {
+            'atraso_ms': atraso_ms,
+            'decaimento': decaimento,
+            'realimentacao': realimentacao,
+            'caminho_ir': caminho_ir,
+            'precisao': 'float32',
+            'subtipo': self.combo_formato.get(),
         }
+        tarefas = [
+            Tarefa(arquivo_entrada, os.path.join(
+                pasta_destino,
+                f"{os.path.splitext(os.path.basename(arquivo_entrada))[0]}_processado.wav"
+            ))
+            for arquivo_entrada in self.arquivos_selecionados
+        ]
+        progresso_lote = ProgressoLote(total)
 
-        def atualizar_progresso():
-            """Atualiza a barra de progresso e verifica se o processamento terminou"""
-            progresso = (processamento_lote['processados'] / processamento_lote['total']) * 100
-            self.barra_progresso['value'] = progresso
-            self.root.update_idletasks()
-            
-            if processamento_lote['processados'] == processamento_lote['total']:
-                # Reabilita botões
-                self.botao_salvar.config(state='normal')
-                self.botao_tocar.config(state='normal')
-                self.botao_parar.config(state='normal')
-                
-                # Reseta barra de progresso
-                self.barra_progresso['value'] = 0
-                
-                # Mostra mensagem com resultados
-                if processamento_lote['erros']:
-                    mensagem_erro = "\n".join([f"- {erro}" for erro in processamento_lote['erros'][:5]])
-                    if len(processamento_lote['erros']) > 5:
-                        mensagem_erro += f"\n(mais {len(processamento_lote['erros']) - 5} erros...)"
-                    messagebox.showwarning("Processamento Concluído com Erros",
-                                        f"{processamento_lote['processados']} de {processamento_lote['total']} arquivos processados com sucesso.\n\nErros:\n{mensagem_erro}")
-                else:
-                    messagebox.showinfo("Concluído", 
-                                    f"Processamento concluído com sucesso!\nTodos os {processamento_lote['total']} arquivos foram processados.")
-            else:
-                # Agenda próxima verificação
-                self.root.after(100, atualizar_progresso)
+        cache = self.obter_cache_resultados()
 
-        def processar_arquivo(arquivo_entrada):
-            try:
-                dados, taxa = sf.read(arquivo_entrada)
-                dados_modificados = self.adicionar_eco(
-                    dados, 
-                    processamento_lote['params']['atraso_ms'],
-                    processamento_lote['params']['decaimento'],
-                    taxa_amostragem=taxa
-                )
-                
-                nome_base = os.path.splitext(os.path.basename(arquivo_entrada))[0]
-                arquivo_saida = os.path.join(
-                    processamento_lote['params']['pasta_destino'], 
-                    f"{nome_base}_processado.wav"
-                )
-                
-                sf.write(arquivo_saida, dados_modificados, taxa)
-                processamento_lote['processados'] += 1
-                return None
-            except Exception as e:
-                processamento_lote['processados'] += 1
-                return f"Erro ao processar {os.path.basename(arquivo_entrada)}: {str(e)}"
+        # Desabilita botões durante o processamento
+        controle = self.iniciar_processamento()
 
         def processar_lote():
-            with ThreadPoolExecutor() as executor:
-                for resultado in executor.map(processar_arquivo, self.arquivos_selecionados):
-                    if resultado:  # Se houve erro
-                        processamento_lote['erros'].append(resultado)
+            try:
+                self.motor_lote.executar(tarefas, parametros, progresso_lote,
+                                         ao_medir=estatisticas().registrar,
+                                         cache=cache, controle=controle)
+            except Exception as e:
+                progresso_lote.abortar(f"Falha no processamento em lote: {str(e)}")
+            resumo = progresso_lote.resumo()
+            self.root.after(0, lambda: self.finalizar_processamento_lote(resumo))
 
         # Inicia o processamento em uma thread separada
         thread_processamento = Thread(target=processar_lote)
         thread_processamento.start()
 
-        # Inicia a verificação de progresso
-        atualizar_progresso()
+    def obter_cache_resultados(self):
+        """Retorna o cache de resultados se ele estiver ativado, criando-o no primeiro uso."""
+        if not self.var_cache.get():
+            return None
+        if self.cache_resultados is None:
+            try:
+                self.cache_resultados = CacheResultados()
+            except OSError as e:
+                messagebox.showwarning("Aviso", f"Cache indisponível; o lote segue sem ele: {str(e)}")
+        return self.cache_resultados
+
+    def finalizar_processamento_lote(self, resumo):
+        """Finaliza o processamento em lote e mostra o resultado."""
+        self.encerrar_processamento()
+
+        erros = resumo['erros']
+        cancelados = resumo['cancelados']
+        sucesso = max(resumo['total'] - len(erros) - cancelados, 0)
+        if erros:
+            mensagem_erro = "\n".join([f"- {erro}" for erro in erros[:5]])
+            if len(erros) > 5:
+                mensagem_erro += f"\n(mais {len(erros) - 5} erros...)"
+            messagebox.showwarning("Processamento Concluído com Erros",
+                                f"{sucesso} de {resumo['total']} arquivos processados com sucesso.\n\nErros:\n{mensagem_erro}")
+        elif cancelados:
+            messagebox.showinfo("Cancelado",
+                                f"Processamento cancelado.\n{sucesso} de {resumo['total']} arquivos processados; "
+                                f"{cancelados} cancelados (arquivos parciais removidos).")
+        else:
+            messagebox.showinfo("Concluído", 
+                            f"Processamento concluído com sucesso!\nTodos os {resumo['total']} arquivos foram processados.")
 
     def tocar_audio(self):
         """Toca o áudio com o efeito de eco aplicado."""
         try:
-            if self.dados_audio is not None:
+            if self.dados_audio is None:
+                # Decodifica na primeira reprodução e toca quando estiver pronto
+                if self.arquivo_audio and self.carregando_audio != self.arquivo_audio:
+                    self.carregar_audio(self.arquivo_audio, ao_carregar=self.tocar_audio)
+            else:
                 try:
                     atraso_ms, decaimento = self.validar_parametros(
                         self.entrada_atraso.get(),
@@ -464,50 +686,46 @@ class AplicacaoEcoAudio:
                 except ValueError:
                     return  # Retorna se houver erro de validação
 
-                dados_modificados = self.adicionar_eco(self.dados_audio, atraso_ms, decaimento)
-
-                # Limpa qualquer arquivo temporário anterior
-                for arquivo in os.listdir():
-                    if arquivo.startswith("temp_com_eco_") and arquivo.endswith(".wav"):
-                        try:
-                            os.remove(arquivo)
-                        except:
-                            pass  # Ignora erros se não conseguir remover
-
-                # Gera um nome de arquivo temporário único
-                arquivo_temp = f"temp_com_eco_{int(time.time() * 1000)}.wav"
-                sf.write(arquivo_temp, dados_modificados, self.taxa_amostragem)
-
-                # Para qualquer reprodução atual e reinicializa o mixer
-                pygame.mixer.quit()
-                pygame.mixer.init(frequency=self.taxa_amostragem)
-                pygame.mixer.music.load(arquivo_temp)
-                pygame.mixer.music.play()
-
-                # Função para tentar remover o arquivo após a reprodução
-                def remover_arquivo_temp():
-                    try:
-                        # Primeiro verifica se a música ainda está tocando
-                        if not pygame.mixer.music.get_busy():
-                            pygame.mixer.quit()  # Fecha o mixer para liberar o arquivo
-                            if os.path.exists(arquivo_temp):
-                                os.remove(arquivo_temp)
-                        else:
-                            # Se ainda está tocando, agenda nova tentativa
-                            self.root.after(100, remover_arquivo_temp)
-                    except:
-                        pass  # Ignora erros na remoção
-
-                # Agenda a primeira tentativa de remoção
-                duracao_ms = int(len(dados_modificados) / self.taxa_amostragem * 1000)
-                self.root.after(duracao_ms + 100, remover_arquivo_temp)
+                parametros = {
+                    'atraso_ms': atraso_ms,
+                    'decaimento': decaimento,
+                    'realimentacao': self.var_realimentacao.get(),
+                    'caminho_ir': self.obter_caminho_ir(),
+                }
+                self.geracao_previa += 1
+                geracao = self.geracao_previa
+
+                def estender(chave, restante):
+                    # Chamado em segundo plano; a fila do mixer é usada na thread da interface
+                    self.root.after(0, lambda: self.estender_previa(geracao, restante))
+
+                # Renderiza primeiro só o início e continua o restante, por trechos, em segundo plano
+                chave, trecho, completo = self.renderizador.iniciar(parametros, ao_estender=estender)
+
+                # Toca direto do buffer processado pelo mixer persistente
+                self.reprodutor.tocar(trecho, self.taxa_amostragem,
+                                      chave=chave if completo is not None else None)
 
         except Exception as e:
             messagebox.showerror("Erro", f"Falha ao reproduzir áudio: {e}")
 
+    def estender_previa(self, geracao, restante):
+        """Enfileira o próximo trecho da pré-visualização, se ela ainda for a atual."""
+        if geracao == self.geracao_previa and self.reprodutor.enfileirar(restante,
+                                                                        self.taxa_amostragem):
+            self.acompanhar_previa(geracao)
+
+    def acompanhar_previa(self, geracao):
+        """Passa os trechos enfileirados ao mixer à medida que os anteriores terminam."""
+        if geracao == self.geracao_previa and self.reprodutor.atualizar():
+            self.root.after(INTERVALO_FILA_MS, lambda: self.acompanhar_previa(geracao))
+
     def parar_audio(self):
         """Para a reprodução do áudio atual."""
-        pygame.mixer.music.stop()
+        self.geracao_previa += 1
+        self.reprodutor.parar()
+        if self.renderizador is not None:
+            self.renderizador.parar()
 
     def abrir_arquivo(self):
         """Abre um diálogo para selecionar arquivo(s) de áudio."""
@@ -516,21 +734,7 @@ class AplicacaoEcoAudio:
         )
         
         if arquivos:
-            self.arquivos_selecionados = arquivos
-            if len(arquivos) == 1:
-                # Se for um único arquivo, carrega para preview
-                self.carregar_audio(arquivos[0])
-                self.rotulo_arquivo.config(
-                    text=f"Arquivo selecionado: {os.path.basename(arquivos[0])}"
-                )
-            else:
-                # Se forem múltiplos arquivos, atualiza o rótulo
-                self.rotulo_arquivo.config(
-                    text=f"{len(arquivos)} arquivos selecionados para processamento"
-                )
-                # Desabilita botões de reprodução
-                self.botao_tocar.config(state='disabled')
-                self.botao_parar.config(state='disabled')
+            self.selecionar_arquivos(list(arquivos))
 
     def ao_soltar(self, evento):
         """
@@ -540,23 +744,73 @@ class AplicacaoEcoAudio:
             evento: O evento TkinterDnD de soltar contendo o caminho do arquivo.
         """
         caminhos = evento.data.strip("{}").split("} {")  # Suporta múltiplos arquivos
+        self.selecionar_arquivos(caminhos)
+
+    def selecionar_arquivos(self, caminhos):
+        """
+        Define a seleção atual sem decodificar nenhum arquivo.
+
+        Um único arquivo fica pronto para pré-visualização pelo cabeçalho;
+        para vários, os cabeçalhos são lidos em segundo plano e o rótulo
+        mostra o andamento e depois a duração e o tamanho totais.
+
+        Args:
+            caminhos (list): Arquivos selecionados
+        """
         self.arquivos_selecionados = caminhos
-        
+        if self.controle_varredura is not None:
+            self.controle_varredura.cancelar()
+            self.controle_varredura = None
+
         if len(caminhos) == 1:
-            self.carregar_audio(caminhos[0])
-            self.rotulo_arquivo.config(
-                text=f"Arquivo selecionado: {os.path.basename(caminhos[0])}"
-            )
-        else:
+            self.preparar_previa(caminhos[0])
+            return
+
+        self.arquivo_audio = None
+        self.dados_audio = None
+        self.descartar_renderizador()
+        self.mostrar_picos(None)
+        self.rotulo_arquivo.config(
+            text=f"{len(caminhos)} arquivos selecionados para processamento"
+        )
+        # Desabilita botões de reprodução para múltiplos arquivos
+        self.botao_tocar.config(state='disabled')
+        self.botao_parar.config(state='disabled')
+
+        def ao_progredir(feitos, total):
+            self.root.after(0, lambda: self.mostrar_varredura(controle, feitos, total))
+
+        def ao_concluir(lidos, erros):
+            self.root.after(0, lambda: self.concluir_varredura(controle, lidos, erros))
+
+        controle = ControleTrabalho(ao_progredir)
+        self.controle_varredura = controle
+        self.metadados.varrer(caminhos, ao_concluir, controle)
+
+    def mostrar_varredura(self, controle, feitos, total):
+        """Mostra o andamento da leitura dos cabeçalhos da seleção."""
+        if controle is self.controle_varredura and feitos < total:
             self.rotulo_arquivo.config(
-                text=f"{len(caminhos)} arquivos selecionados para processamento"
+                text=f"{total} arquivos selecionados para processamento\n"
+                     f"Lendo informações... {feitos}/{total}"
             )
-            # Desabilita botões de reprodução para múltiplos arquivos
-            self.botao_tocar.config(state='disabled')
-            self.botao_parar.config(state='disabled')
+
+    def concluir_varredura(self, controle, lidos, erros):
+        """Mostra a duração e o tamanho totais da seleção."""
+        if controle is not self.controle_varredura:
+            return
+        self.controle_varredura = None
+        resumo = resumir_metadados(lidos)
+        texto = (f"{len(self.arquivos_selecionados)} arquivos selecionados para processamento\n"
+                 f"{self.formatar_duracao(resumo['duracao'])} | "
+                 f"{resumo['tamanho_bytes'] / (1024 * 1024):.1f} MB")
+        if erros:
+            texto += f" | {len(erros)} ilegíveis"
+        self.rotulo_arquivo.config(text=texto)
 
 
 if __name__ == "__main__":
+    from tkinterdnd2 import TkinterDnD
     root = TkinterDnD.Tk()
     app = AplicacaoEcoAudio(root)
     root.mainloop()
@@ -0,0 +1,105 @@
+"""Núcleo de processamento de áudio da Aplicação de Eco e Delay."""
+
+import importlib
+
+from .atraso import (
+    Derivacao,
+    LIMIAR_PADRAO,
+    ProcessadorAtraso,
+    aplicar_derivacoes,
+    aplicar_eco,
+    aplicar_realimentacao,
+    ms_para_amostras,
+)
+from .convolucao import (
+    ConvolvedorMultiplo,
+    ConvolvedorParticionado,
+    convolver,
+    convolver_fft,
+    convolver_particionado,
+    mapa_canais,
+    particionar_impulso,
+    tamanho_fft_rapido,
+)
+from .banco_ir import BancoIR, ImpulsoPreparado, banco_padrao, reamostrar
+from .dinamica import (
+    ALVO_SONORIDADE_PADRAO,
+    NORMALIZACOES,
+    TETO_PADRAO_DB,
+    AnalisadorSonoridade,
+    LimitadorAntecipado,
+    ganho_normalizacao,
+    limitar,
+    resposta_ponderacao_k,
+    validar_normalizacao,
+)
+from .controle import ControleTrabalho, ProcessamentoCancelado
+from .metadados import CatalogoMetadados, Metadados, ler_metadados, resumir_metadados
+from .mapeamento import EntradaMapeada, SaidaMapeada, abrir_entrada_mapeada
+from .fluxo import (
+    PRECISOES,
+    PROFUNDIDADE_PIPELINE,
+    SUBTIPOS_SAIDA,
+    TAMANHO_BLOCO_FLUXO,
+    processar_arquivo,
+    processar_eco_fluxo,
+    processar_impulso_fluxo,
+    quadros_trabalho,
+    validar_formato,
+)
+from .lote import MotorLote, ProgressoLote, Tarefa, estimar_memoria
+from .cache_resultados import (
+    LIMITE_CACHE_PADRAO,
+    VERSAO_MOTOR,
+    CacheResultados,
+    pasta_cache_padrao,
+)
+from .picos import (
+    AMOSTRAS_POR_PICO,
+    FATOR_NIVEL,
+    ConstrutorPicos,
+    PiramidePicos,
+    caminho_picos,
+    carregar_picos,
+    pasta_cache_picos,
+    picos_arquivo,
+    salvar_picos,
+)
+from .processamento import normalizar_pico, pico_absoluto, processar_dados, validar_parametros
+from .reproducao import ReprodutorPrevia, converter_para_mixer
+from .previa import RenderizadorPrevia
+from .metricas import (
+    EstatisticasMetricas,
+    MedicaoArquivo,
+    RegistroMetricas,
+    estatisticas,
+    perfilar,
+)
+from .varredura import (
+    LOTE_VARIANTES,
+    caminho_variante,
+    montar_variantes,
+    processar_varredura,
+)
+
+# Nomes dos módulos que também são pontos de entrada (python -m eco_audio.servico,
+# python -m eco_audio.tempo_real), importados só quando usados: importá-los
+# aqui faria o runpy executar um módulo já carregado e traria o sqlite3 e o
+# tracemalloc a cada uso do pacote
+_EXPORTACOES_SOB_DEMANDA = {
+    'FilaTrabalhos': 'servico',
+    'ServicoEco': 'servico',
+    'BLOCO_MAXIMO_TEMPO_REAL': 'tempo_real',
+    'BLOCO_MINIMO_TEMPO_REAL': 'tempo_real',
+    'TAMANHO_BLOCO_TEMPO_REAL': 'tempo_real',
+    'ProcessadorTempoReal': 'tempo_real',
+    'simular_fluxo': 'tempo_real',
+}
+
+
+def __getattr__(nome):
+    """Importa sob demanda os nomes de _EXPORTACOES_SOB_DEMANDA."""
+    modulo = _EXPORTACOES_SOB_DEMANDA.get(nome)
+    if modulo is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+    return getattr(importlib.import_module(f'.{modulo}', __name__), nome)
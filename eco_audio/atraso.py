@@ -0,0 +1,311 @@
+"""Motor de atraso (eco) vetorizado com múltiplas derivações e realimentação."""
+
+import math
+from collections import namedtuple
+
+import numpy as np
+
+# Uma derivação (tap) do eco: atraso em milissegundos e ganho aplicado
+Derivacao = namedtuple('Derivacao', ['atraso_ms', 'ganho'])
+
+# Nível abaixo do qual as repetições da realimentação são descartadas (-60 dB)
+LIMIAR_PADRAO = 1e-3
+
+# Quantidade de quadros processados por vez ao misturar as derivações
+TAMANHO_BLOCO = 65536
+
+
+def ms_para_amostras(atraso_ms, taxa_amostragem):
+    """
+    Converte um atraso em milissegundos para número de amostras.
+
+    Args:
+        atraso_ms (float): Atraso em milissegundos
+        taxa_amostragem (int): Taxa de amostragem do áudio
+
+    Returns:
+        int: Atraso em amostras
+    """
+    return int((atraso_ms / 1000) * taxa_amostragem)
+
+
+def _normalizar_derivacoes(derivacoes, taxa_amostragem):
+    """Converte as derivações para pares (amostras, ganho) validados."""
+    if not derivacoes:
+        raise ValueError("É necessário informar ao menos uma derivação de eco.")
+    resultado = []
+    for atraso_ms, ganho in derivacoes:
+        amostras = ms_para_amostras(atraso_ms, taxa_amostragem)
+        if amostras < 0:
+            raise ValueError("O atraso de uma derivação não pode ser negativo")
+        resultado.append((amostras, float(ganho)))
+    return resultado
+
+
+def aplicar_derivacoes(dados_audio, taxa_amostragem, derivacoes, saida=None):
+    """
+    Soma ao sinal cópias atrasadas dele mesmo (eco sem realimentação).
+
+    A mistura é feita por fatias do array, em blocos de tamanho fixo com um
+    buffer temporário reaproveitado, funcionando para qualquer número de canais.
+
+    Args:
+        dados_audio (numpy.ndarray): Áudio de entrada (quadros,) ou (quadros, canais)
+        taxa_amostragem (int): Taxa de amostragem do áudio
+        derivacoes (list): Lista de Derivacao (ou pares atraso_ms, ganho)
+        saida (numpy.ndarray, optional): Buffer de saída já alocado com
+            len(dados_audio) + maior atraso quadros.
+
+    Returns:
+        numpy.ndarray: Áudio com o eco aplicado (sem limitação de pico)
+    """
+    pares = _normalizar_derivacoes(derivacoes, taxa_amostragem)
+    n = len(dados_audio)
+    tamanho_saida = n + max(amostras for amostras, _ in pares)
+
+    if saida is None:
+        saida = np.zeros((tamanho_saida,) + dados_audio.shape[1:],
+                         dtype=np.result_type(dados_audio.dtype, np.float32))
+    else:
+        saida[n:] = 0
+    saida[:n] = dados_audio
+
+    temporario = np.empty((min(n, TAMANHO_BLOCO),) + dados_audio.shape[1:], dtype=saida.dtype)
+    for amostras, ganho in pares:
+        if ganho == 0.0:
+            continue
+        for inicio in range(0, n, TAMANHO_BLOCO):
+            fim = min(inicio + TAMANHO_BLOCO, n)
+            bloco = temporario[:fim - inicio]
+            np.multiply(dados_audio[inicio:fim], ganho, out=bloco)
+            destino = saida[inicio + amostras:fim + amostras]
+            np.add(destino, bloco, out=destino)
+    return saida
+
+
+def duracao_cauda(pico, derivacoes_amostras, limiar=LIMIAR_PADRAO):
+    """
+    Estima quantas amostras a realimentação leva para cair abaixo do limiar.
+
+    Args:
+        pico (float): Pico absoluto do sinal de entrada
+        derivacoes_amostras (list): Pares (amostras, ganho) da realimentação
+        limiar (float): Amplitude a partir da qual as repetições são descartadas
+
+    Returns:
+        int: Limite superior do comprimento da cauda em amostras
+    """
+    ganho_laco = sum(abs(ganho) for _, ganho in derivacoes_amostras)
+    maior_atraso = max(amostras for amostras, _ in derivacoes_amostras)
+    if pico <= limiar or ganho_laco == 0.0:
+        return maior_atraso
+    # O pico de cada janela de maior_atraso amostras cai ao menos por ganho_laco
+    pico_saida = pico / (1.0 - ganho_laco)
+    repeticoes = math.ceil(math.log(limiar / pico_saida) / math.log(ganho_laco))
+    return maior_atraso * (max(repeticoes, 0) + 1)
+
+
+def aplicar_realimentacao(dados_audio, taxa_amostragem, derivacoes, limiar=LIMIAR_PADRAO):
+    """
+    Aplica eco com realimentação: y[n] = x[n] + soma(g_i * y[n - d_i]).
+
+    O eco se repete até decair abaixo do limiar. A recursão é resolvida em
+    blocos do tamanho do menor atraso, de modo que cada bloco depende apenas
+    de amostras já calculadas e pode ser vetorizado.
+
+    Args:
+        dados_audio (numpy.ndarray): Áudio de entrada (quadros,) ou (quadros, canais)
+        taxa_amostragem (int): Taxa de amostragem do áudio
+        derivacoes (list): Lista de Derivacao (ou pares atraso_ms, ganho)
+        limiar (float): Amplitude a partir da qual as repetições são descartadas
+
+    Returns:
+        numpy.ndarray: Áudio com o eco aplicado, incluindo a cauda
+    """
+    pares = [(amostras, ganho) for amostras, ganho in _normalizar_derivacoes(derivacoes, taxa_amostragem)
+             if ganho != 0.0]
+    if not pares:
+        return np.array(dados_audio, dtype=np.result_type(dados_audio.dtype, np.float32))
+    if any(amostras == 0 for amostras, _ in pares):
+        raise ValueError("O atraso deve ser positivo no modo de realimentação")
+    if sum(abs(ganho) for _, ganho in pares) >= 1.0:
+        raise ValueError("A soma dos ganhos da realimentação deve ser menor que 1.0")
+
+    n = len(dados_audio)
+    pico = float(np.max(np.abs(dados_audio))) if n else 0.0
+    menor_atraso = min(amostras for amostras, _ in pares)
+    maior_atraso = max(amostras for amostras, _ in pares)
+
+    saida = np.zeros((n + duracao_cauda(pico, pares, limiar),) + dados_audio.shape[1:],
+                     dtype=np.result_type(dados_audio.dtype, np.float32))
+    saida[:n] = dados_audio
+
+    inicio = menor_atraso
+    while inicio < len(saida):
+        fim = min(inicio + menor_atraso, len(saida))
+        destino = saida[inicio:fim]
+        for amostras, ganho in pares:
+            origem_inicio = inicio - amostras
+            if fim - amostras <= 0:
+                continue
+            deslocamento = max(0, -origem_inicio)
+            origem = saida[origem_inicio + deslocamento:fim - amostras]
+            alvo = destino[deslocamento:]
+            alvo += ganho * origem
+        inicio = fim
+        # Depois do fim da entrada, a saída futura é combinação da última janela
+        # de maior_atraso amostras; se ela está abaixo do limiar, pode parar.
+        if fim >= n + maior_atraso and np.max(np.abs(saida[fim - maior_atraso:fim])) < limiar:
+            return saida[:fim]
+    return saida
+
+
+def aplicar_eco(dados_audio, taxa_amostragem, derivacoes, realimentacao=False,
+                limiar=LIMIAR_PADRAO, limitar=True):
+    """
+    Aplica o efeito de eco com uma ou mais derivações.
+
+    Args:
+        dados_audio (numpy.ndarray): Áudio de entrada (quadros,) ou (quadros, canais)
+        taxa_amostragem (int): Taxa de amostragem do áudio
+        derivacoes (list): Lista de Derivacao (ou pares atraso_ms, ganho)
+        realimentacao (bool): Se True, o eco se repete até decair abaixo do limiar
+        limiar (float): Amplitude a partir da qual as repetições são descartadas
+        limitar (bool): Se True, passa a saída pelo limitador com antecipação
+            (ver dinamica.LimitadorAntecipado), com pico máximo de 0 dBFS
+
+    Returns:
+        numpy.ndarray: Dados do áudio com efeito de eco aplicado
+    """
+    if dados_audio is None:
+        raise ValueError("Nenhum dado de áudio carregado.")
+
+    if realimentacao:
+        saida = aplicar_realimentacao(dados_audio, taxa_amostragem, derivacoes, limiar)
+    else:
+        saida = aplicar_derivacoes(dados_audio, taxa_amostragem, derivacoes)
+
+    if limitar:
+        # Importado aqui: dinamica depende deste módulo
+        from .dinamica import limitar as limitar_pico
+        limitar_pico(saida, taxa_amostragem)
+        np.clip(saida, -1.0, 1.0, out=saida)
+    return saida
+
+
+class ProcessadorAtraso:
+    """
+    Versão com estado do motor de atraso, para processar o áudio em blocos.
+
+    Guarda apenas as últimas amostras necessárias para as derivações (da entrada
+    no modo direto, da saída no modo com realimentação), de modo que a memória
+    usada não depende do comprimento do arquivo.
+    """
+
+    def __init__(self, taxa_amostragem, derivacoes, canais, realimentacao=False,
+                 limiar=LIMIAR_PADRAO, dtype=np.float64):
+        """
+        Args:
+            taxa_amostragem (int): Taxa de amostragem do áudio
+            derivacoes (list): Lista de Derivacao (ou pares atraso_ms, ganho)
+            canais (int): Número de canais do sinal
+            realimentacao (bool): Se True, o eco se repete até decair abaixo do limiar
+            limiar (float): Amplitude a partir da qual as repetições são descartadas
+            dtype: Tipo de ponto flutuante usado no processamento
+        """
+        pares = _normalizar_derivacoes(derivacoes, taxa_amostragem)
+        self.maior_atraso = max(amostras for amostras, _ in pares)
+        self.pares = [(amostras, ganho) for amostras, ganho in pares if ganho != 0.0]
+        self.realimentacao = realimentacao
+        self.limiar = limiar
+        self.canais = canais
+        self.dtype = np.dtype(dtype)
+
+        if realimentacao and self.pares:
+            if any(amostras == 0 for amostras, _ in self.pares):
+                raise ValueError("O atraso deve ser positivo no modo de realimentação")
+            if sum(abs(ganho) for _, ganho in self.pares) >= 1.0:
+                raise ValueError("A soma dos ganhos da realimentação deve ser menor que 1.0")
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Zera a linha de atraso."""
+        # As primeiras maior_atraso linhas guardam o histórico entre chamadas;
+        # o restante recebe o bloco atual
+        self._estendido = np.zeros((self.maior_atraso, self.canais), dtype=self.dtype)
+        self._temporario = np.empty((0, self.canais), dtype=self.dtype)
+
+    def _reservar(self, quantidade):
+        """Aumenta os buffers internos para comportar blocos de `quantidade` quadros."""
+        atraso = self.maior_atraso
+        if len(self._estendido) - atraso >= quantidade:
+            return
+        estendido = np.zeros((atraso + quantidade, self.canais), dtype=self.dtype)
+        estendido[:atraso] = self._estendido[:atraso]
+        self._estendido = estendido
+        self._temporario = np.empty((quantidade, self.canais), dtype=self.dtype)
+
+    def processar(self, dados, saida=None):
+        """
+        Processa um bloco de quadros.
+
+        Os buffers internos são reaproveitados entre chamadas, de modo que
+        blocos de tamanho constante não alocam memória.
+
+        Args:
+            dados (numpy.ndarray): Quadros de entrada (quadros, canais)
+            saida (numpy.ndarray, optional): Destino do resultado, com a mesma
+                forma da entrada; pode ser o próprio array de entrada
+
+        Returns:
+            numpy.ndarray: Mesma quantidade de quadros com o eco aplicado
+        """
+        dados = np.asarray(dados, dtype=self.dtype).reshape(-1, self.canais)
+        atraso = self.maior_atraso
+        quantidade = len(dados)
+        if saida is None:
+            saida = np.empty_like(dados)
+        self._reservar(quantidade)
+        estendido = self._estendido[:atraso + quantidade]
+        estendido[atraso:] = dados
+
+        if self.realimentacao and self.pares:
+            # O histórico guarda a saída; resolve a recursão em sub-blocos
+            passo = min(amostras for amostras, _ in self.pares)
+            for inicio in range(atraso, atraso + quantidade, passo):
+                fim = min(inicio + passo, atraso + quantidade)
+                destino = estendido[inicio:fim]
+                temporario = self._temporario[:fim - inicio]
+                for amostras, ganho in self.pares:
+                    np.multiply(estendido[inicio - amostras:fim - amostras], ganho, out=temporario)
+                    destino += temporario
+            saida[:] = estendido[atraso:]
+        else:
+            # O histórico guarda a entrada
+            saida[:] = dados
+            temporario = self._temporario[:quantidade]
+            for amostras, ganho in self.pares:
+                np.multiply(estendido[atraso - amostras:atraso - amostras + quantidade], ganho,
+                            out=temporario)
+                saida += temporario
+
+        estendido[:atraso] = estendido[quantidade:]
+        return saida
+
+    def finalizar(self):
+        """
+        Gera a cauda do eco depois do fim da entrada.
+
+        Returns:
+            numpy.ndarray: Quadros restantes do eco
+        """
+        atraso = self.maior_atraso
+        if not (self.realimentacao and self.pares):
+            return self.processar(np.zeros((atraso, self.canais), dtype=self.dtype))
+
+        passo = min(amostras for amostras, _ in self.pares)
+        partes = [self.processar(np.zeros((atraso, self.canais), dtype=self.dtype))]
+        # A saída futura depende só da última janela de maior_atraso amostras
+        while np.max(np.abs(self._estendido[:atraso])) >= self.limiar:
+            partes.append(self.processar(np.zeros((passo, self.canais), dtype=self.dtype)))
+        return np.concatenate(partes, axis=0)
@@ -0,0 +1,278 @@
+"""Banco de respostas de impulso com cache LRU de IRs decodificados e transformados."""
+
+import math
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import soundfile as sf
+
+from .convolucao import (
+    convolver_particionado,
+    escolher_tamanho_bloco,
+    mapa_canais,
+    particionar_impulso,
+)
+
+# Orçamento de memória padrão do cache de IRs (256 MiB)
+LIMITE_PADRAO_BYTES = 256 * 1024 * 1024
+
+
+def reamostrar(dados, taxa_origem, taxa_destino):
+    """
+    Converte o sinal para outra taxa de amostragem por interpolação espectral.
+
+    O sinal é completado com silêncio até um comprimento em que a razão entre
+    as taxas resulta em um número inteiro de amostras, e o espectro é então
+    truncado (ou estendido com zeros) para a nova taxa, o que equivale a um
+    filtro passa-baixas ideal.
+
+    Args:
+        dados (numpy.ndarray): Sinal (quadros,) ou (quadros, canais)
+        taxa_origem (int): Taxa de amostragem atual
+        taxa_destino (int): Taxa de amostragem desejada
+
+    Returns:
+        numpy.ndarray: Sinal na nova taxa com round(quadros * destino / origem) quadros
+    """
+    taxa_origem = int(taxa_origem)
+    taxa_destino = int(taxa_destino)
+    if taxa_origem <= 0 or taxa_destino <= 0:
+        raise ValueError("As taxas de amostragem devem ser positivas")
+    if taxa_origem == taxa_destino or len(dados) == 0:
+        return dados
+
+    n = len(dados)
+    novo_tamanho = int(round(n * taxa_destino / taxa_origem))
+    divisor = math.gcd(taxa_origem, taxa_destino)
+    passo_origem = taxa_origem // divisor
+    passo_destino = taxa_destino // divisor
+
+    # Margem de silêncio para que a extensão periódica não vaze para o início
+    minimo = n + n // 8 + 64
+    tamanho_origem = -(-minimo // passo_origem) * passo_origem
+    tamanho_destino = tamanho_origem // passo_origem * passo_destino
+
+    espectro = np.fft.rfft(dados, tamanho_origem, axis=0)
+    bins = tamanho_destino // 2 + 1
+    novo_espectro = np.zeros((bins,) + espectro.shape[1:], dtype=espectro.dtype)
+    comuns = min(bins, len(espectro))
+    novo_espectro[:comuns] = espectro[:comuns]
+    resultado = np.fft.irfft(novo_espectro, tamanho_destino, axis=0)[:novo_tamanho]
+    resultado *= tamanho_destino / tamanho_origem
+    return resultado
+
+
+class ImpulsoPreparado:
+    """
+    Resposta de impulso decodificada, convertida para a taxa de destino e com
+    os espectros das partições calculados sob demanda.
+
+    Cada combinação de tamanho de bloco e precisão gera um conjunto de
+    espectros; ao_crescer, se definido, é chamado depois que um novo conjunto
+    é guardado (o BancoIR o usa para manter o orçamento de memória).
+    """
+
+    def __init__(self, caminho, dados, taxa, taxa_original):
+        """
+        Args:
+            caminho (str): Caminho do arquivo de origem
+            dados (numpy.ndarray): Amostras do impulso (quadros,) ou
+                (quadros, canais) na taxa de destino
+            taxa (int): Taxa de amostragem de destino
+            taxa_original (int): Taxa de amostragem do arquivo
+        """
+        self.caminho = caminho
+        self.dados = dados
+        self.taxa = taxa
+        self.taxa_original = taxa_original
+        self._espectros = {}
+        self._bytes_espectros = 0
+        self._trava = threading.Lock()
+        self.ao_crescer = None
+
+    def __len__(self):
+        return len(self.dados)
+
+    @property
+    def canais(self):
+        """Número de canais do impulso."""
+        return 1 if self.dados.ndim == 1 else self.dados.shape[1]
+
+    def canais_saida(self, canais_entrada):
+        """Número de canais do resultado para uma entrada com canais_entrada canais."""
+        return mapa_canais(canais_entrada, self.canais)[0]
+
+    @property
+    def duracao(self):
+        """Duração do impulso em segundos."""
+        return len(self.dados) / self.taxa
+
+    @property
+    def tamanho_bytes(self):
+        """Memória ocupada pelas amostras e espectros em cache."""
+        # Contador mantido sob a trava do item: o banco lê sem percorrer _espectros,
+        # que pode crescer em outra thread
+        return self.dados.nbytes + self._bytes_espectros
+
+    def espectros(self, tamanho_bloco=None, dtype=np.float64):
+        """
+        Retorna os espectros das partições para um tamanho de bloco.
+
+        Args:
+            tamanho_bloco (int, optional): Tamanho da partição. Se None, usa o
+                tamanho escolhido automaticamente para o impulso.
+            dtype: Tipo de ponto flutuante do processamento (float32 gera
+                espectros complex64)
+
+        Returns:
+            tuple: (tamanho_bloco, espectros)
+        """
+        tamanho_bloco = tamanho_bloco or escolher_tamanho_bloco(len(self.dados))
+        chave = (tamanho_bloco, np.dtype(dtype).name)
+        with self._trava:
+            espectros = self._espectros.get(chave)
+            novo = espectros is None
+            if novo:
+                espectros = particionar_impulso(self.dados, tamanho_bloco, dtype)
+                self._espectros[chave] = espectros
+                self._bytes_espectros += espectros.nbytes
+        if novo and self.ao_crescer is not None:
+            self.ao_crescer()
+        return tamanho_bloco, espectros
+
+    def convolver(self, dados_audio, tamanho_bloco=None):
+        """
+        Convolve o áudio com este impulso reaproveitando os espectros em cache.
+
+        Args:
+            dados_audio (numpy.ndarray): Áudio (quadros,) ou (quadros, canais);
+                áudio float32 é processado em float32
+            tamanho_bloco (int, optional): Tamanho da partição
+
+        Returns:
+            numpy.ndarray: Resultado com len(dados_audio) + len(impulso) - 1 quadros
+        """
+        dtype = np.result_type(dados_audio.dtype, np.float32)
+        tamanho_bloco, espectros = self.espectros(tamanho_bloco, dtype)
+        return convolver_particionado(dados_audio, self.dados, tamanho_bloco, espectros)
+
+
+class BancoIR:
+    """
+    Cache LRU de respostas de impulso indexado por caminho, data de modificação
+    e taxa de destino, limitado por um orçamento de memória.
+
+    O orçamento conta as amostras e todos os conjuntos de espectros de cada
+    IR, inclusive os criados depois do carregamento por
+    ImpulsoPreparado.espectros() com outro tamanho de bloco ou precisão.
+    """
+
+    def __init__(self, limite_bytes=LIMITE_PADRAO_BYTES):
+        """
+        Args:
+            limite_bytes (int): Memória máxima ocupada pelos IRs em cache
+        """
+        self.limite_bytes = limite_bytes
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    @staticmethod
+    def chave(caminho, taxa_destino):
+        """Monta a chave do cache para um arquivo de IR e uma taxa de destino."""
+        caminho = os.path.abspath(caminho)
+        info = os.stat(caminho)
+        return (caminho, info.st_mtime_ns, info.st_size, int(taxa_destino))
+
+    @property
+    def tamanho_bytes(self):
+        """Memória ocupada atualmente pelo cache."""
+        with self._trava:
+            return sum(item.tamanho_bytes for item in self._itens.values())
+
+    def obter(self, caminho, taxa_destino, dtype=np.float64):
+        """
+        Retorna o IR pronto para uso na taxa de destino, decodificando-o apenas
+        na primeira vez ou quando o arquivo muda.
+
+        Args:
+            caminho (str): Caminho do arquivo de IR
+            taxa_destino (int): Taxa de amostragem do áudio a ser processado
+            dtype: Precisão do processamento que vai usar o IR; os espectros
+                das partições são calculados já aqui, só para ela, para que
+                todos os usos os compartilhem. None não calcula nenhum.
+
+        Returns:
+            ImpulsoPreparado: IR decodificado e reamostrado
+        """
+        chave = self.chave(caminho, taxa_destino)
+        with self._trava:
+            item = self._itens.get(chave)
+            if item is not None:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+            else:
+                self.falhas += 1
+
+        if item is None:
+            # IRs multicanal são mantidos; o mapeamento de canais é feito na convolução
+            impulso, taxa_impulso = sf.read(chave[0])
+            impulso = reamostrar(impulso, taxa_impulso, taxa_destino)
+            item = ImpulsoPreparado(chave[0], impulso, int(taxa_destino), taxa_impulso)
+            with self._trava:
+                self._itens[chave] = item
+                self._itens.move_to_end(chave)
+                item.ao_crescer = lambda: self._ao_crescer(chave)
+                self._remover_excedentes()
+        if dtype is not None:
+            item.espectros(dtype=dtype)
+        return item
+
+    def _ao_crescer(self, chave):
+        """Um IR guardou novos espectros: passa a ser o mais recente e o orçamento é refeito."""
+        with self._trava:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self._remover_excedentes()
+
+    def _remover_excedentes(self):
+        """Descarta os IRs menos usados até caber no orçamento (mantém o mais recente)."""
+        total = sum(item.tamanho_bytes for item in self._itens.values())
+        while total > self.limite_bytes and len(self._itens) > 1:
+            _, removido = self._itens.popitem(last=False)
+            total -= removido.tamanho_bytes
+
+    def limpar(self):
+        """Esvazia o cache."""
+        with self._trava:
+            self._itens.clear()
+
+    def estatisticas(self):
+        """
+        Returns:
+            dict: Itens, bytes em uso, limite, acertos e falhas do cache
+        """
+        with self._trava:
+            return {
+                'itens': len(self._itens),
+                'bytes': sum(item.tamanho_bytes for item in self._itens.values()),
+                'limite_bytes': self.limite_bytes,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+            }
+
+
+_banco_padrao = None
+_trava_banco_padrao = threading.Lock()
+
+
+def banco_padrao():
+    """Retorna o banco de IRs compartilhado pelo processo."""
+    global _banco_padrao
+    with _trava_banco_padrao:
+        if _banco_padrao is None:
+            _banco_padrao = BancoIR()
+        return _banco_padrao
@@ -0,0 +1,370 @@
+"""Cache persistente de arquivos processados, endereçado pelo conteúdo."""
+
+import hashlib
+import json
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import time
+
+from .dinamica import ALVO_SONORIDADE_PADRAO, TETO_PADRAO_DB
+from .picos import picos_arquivo
+
+# Versão do motor de processamento; mude sempre que o resultado de um mesmo
+# arquivo com os mesmos parâmetros puder mudar, para invalidar o cache. A versão
+# 3 também descarta os objetos das versões anteriores, que eram links físicos
+# para as próprias saídas e podem ter sido alterados junto com elas
+VERSAO_MOTOR = '3'
+
+# Orçamento padrão de disco do cache (10 GiB)
+LIMITE_CACHE_PADRAO = 10 * 1024 * 1024 * 1024
+
+_TAMANHO_LEITURA = 1 << 20
+
+
+def pasta_cache_padrao():
+    """Retorna a pasta padrão do cache ($XDG_CACHE_HOME/eco_audio ou ~/.cache/eco_audio)."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'eco_audio', 'resultados')
+
+
+def _resumo_parametros(parametros, extensao):
+    """Parte dos parâmetros que determina o conteúdo do arquivo gerado."""
+    resumo = {
+        'formato': extensao.lower(),
+        'precisao': parametros.get('precisao', 'float64'),
+        'subtipo': parametros.get('subtipo'),
+        'normalizacao': parametros.get('normalizacao') or (
+            'pico' if parametros.get('caminho_ir') else 'nenhuma'),
+        'teto_db': parametros.get('teto_db', TETO_PADRAO_DB),
+    }
+    if resumo['normalizacao'] == 'sonoridade':
+        resumo['alvo_lufs'] = parametros.get('alvo_lufs', ALVO_SONORIDADE_PADRAO)
+    if not parametros.get('caminho_ir'):
+        resumo.update(atraso_ms=parametros['atraso_ms'], decaimento=parametros['decaimento'],
+                      realimentacao=bool(parametros.get('realimentacao')))
+    return resumo
+
+
+class CacheResultados:
+    """
+    Guarda cópias somente leitura dos arquivos processados, indexadas pelo
+    hash do conteúdo da entrada, dos parâmetros, do conteúdo do IR e da versão
+    do motor.
+
+    Antes de processar uma tarefa, restaurar() procura o resultado no cache e,
+    se o encontrar, cria a saída como uma cópia comum (gravável) do objeto
+    guardado. Com vincular=True, a saída é um link físico para o objeto e,
+    como ele, somente leitura; se a saída já for esse mesmo arquivo, nada é
+    feito. Com picos nos parâmetros, os arquivos de picos da entrada e da
+    saída são montados na restauração, no mesmo lugar em que processar_arquivo
+    os gravaria. Os hashes de conteúdo são memorizados por caminho, tamanho e
+    data de modificação, então uma nova execução sobre uma biblioteca
+    inalterada só lê os metadados dos arquivos.
+
+    O índice de objetos guarda, para cada objeto, o tamanho e a data de
+    modificação com que foi gravado e a data do último uso. Um objeto que
+    mudou (por exemplo, uma saída restaurada por link e editada no lugar) é
+    descartado em vez de reaproveitado, e a data de uso fica só no índice,
+    sem alterar a data de modificação das saídas ligadas ao objeto.
+
+    O espaço em disco é limitado: ao passar do limite, os objetos usados há
+    mais tempo são removidos.
+    """
+
+    def __init__(self, pasta=None, limite_bytes=LIMITE_CACHE_PADRAO, vincular=False):
+        """
+        Args:
+            pasta (str, optional): Pasta do cache. Se None, usa pasta_cache_padrao().
+            limite_bytes (int): Espaço máximo ocupado pelos objetos
+            vincular (bool): Se True, restaura por link físico (saídas somente
+                leitura, sem ocupar espaço a mais); se False, copia
+        """
+        self.pasta = pasta or pasta_cache_padrao()
+        self.limite_bytes = limite_bytes
+        self.vincular = vincular
+        self._pasta_objetos = os.path.join(self.pasta, 'objetos')
+        self._arquivo_hashes = os.path.join(self.pasta, 'hashes.json')
+        self._arquivo_indice = os.path.join(self.pasta, 'objetos.json')
+        os.makedirs(self._pasta_objetos, exist_ok=True)
+        self._trava = threading.RLock()
+        self._hashes = self._carregar_json(self._arquivo_hashes)
+        self._hashes_alterados = False
+        self._indice = self._carregar_json(self._arquivo_indice)
+        self._indice_alterado = False
+        self.acertos = 0
+        self.falhas = 0
+        self.atualizados = 0
+        self.guardados = 0
+        self.removidos = 0
+        self.bytes_reaproveitados = 0
+        self._bytes = sum(tamanho for _, _, tamanho in self._objetos())
+
+    @staticmethod
+    def _carregar_json(caminho):
+        try:
+            with open(caminho, encoding='utf-8') as arquivo:
+                return json.load(arquivo)
+        except (OSError, ValueError):
+            return {}
+
+    def _gravar_json(self, dados, caminho):
+        """Grava dados em caminho, substituindo o arquivo atomicamente."""
+        descritor, temporario = tempfile.mkstemp(dir=self.pasta, suffix='.tmp')
+        with os.fdopen(descritor, 'w', encoding='utf-8') as arquivo:
+            json.dump(dados, arquivo)
+        os.replace(temporario, caminho)
+
+    def salvar(self):
+        """Grava em disco os hashes de conteúdo memorizados e o índice de objetos."""
+        with self._trava:
+            if self._hashes_alterados:
+                # Descarta entradas de arquivos que não existem mais
+                self._hashes = {caminho: item for caminho, item in self._hashes.items()
+                                if os.path.exists(caminho)}
+                self._gravar_json(self._hashes, self._arquivo_hashes)
+                self._hashes_alterados = False
+            if self._indice_alterado:
+                self._indice = {nome: item for nome, item in self._indice.items()
+                                if os.path.exists(os.path.join(self._pasta_objetos, nome))}
+                self._gravar_json(self._indice, self._arquivo_indice)
+                self._indice_alterado = False
+
+    def hash_arquivo(self, caminho):
+        """
+        Retorna o SHA-256 do conteúdo do arquivo, relendo-o só se ele mudou.
+
+        Args:
+            caminho (str): Arquivo
+
+        Returns:
+            str: Hash em hexadecimal
+        """
+        caminho = os.path.abspath(caminho)
+        info = os.stat(caminho)
+        with self._trava:
+            item = self._hashes.get(caminho)
+            if item and item[0] == info.st_size and item[1] == info.st_mtime_ns:
+                return item[2]
+        resumo = hashlib.sha256()
+        with open(caminho, 'rb') as arquivo:
+            for parte in iter(lambda: arquivo.read(_TAMANHO_LEITURA), b''):
+                resumo.update(parte)
+        with self._trava:
+            self._hashes[caminho] = [info.st_size, info.st_mtime_ns, resumo.hexdigest()]
+            self._hashes_alterados = True
+        return resumo.hexdigest()
+
+    def chave(self, tarefa, parametros):
+        """
+        Calcula a chave de conteúdo de uma tarefa.
+
+        Args:
+            tarefa (Tarefa): Arquivos de entrada e saída
+            parametros (dict): Argumentos de processar_arquivo
+
+        Returns:
+            str: Hash em hexadecimal
+        """
+        partes = _resumo_parametros(parametros, os.path.splitext(tarefa.caminho_saida)[1])
+        partes['versao'] = VERSAO_MOTOR
+        partes['entrada'] = self.hash_arquivo(tarefa.caminho_entrada)
+        if parametros.get('caminho_ir'):
+            partes['ir'] = self.hash_arquivo(parametros['caminho_ir'])
+        texto = json.dumps(partes, sort_keys=True)
+        return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+    def _caminho_objeto(self, chave, extensao):
+        return os.path.join(self._pasta_objetos, chave[:2], chave + extensao.lower())
+
+    def _nome_objeto(self, objeto):
+        """Chave do objeto no índice (caminho relativo à pasta de objetos)."""
+        return os.path.relpath(objeto, self._pasta_objetos).replace(os.sep, '/')
+
+    def _objetos(self):
+        """Lista (data de uso, caminho, tamanho) de todos os objetos guardados."""
+        objetos = []
+        for raiz, _, arquivos in os.walk(self._pasta_objetos):
+            for nome in arquivos:
+                caminho = os.path.join(raiz, nome)
+                try:
+                    info = os.stat(caminho)
+                except OSError:
+                    continue
+                # Objetos fora do índice (índice perdido) usam a data de modificação
+                item = self._indice.get(self._nome_objeto(caminho))
+                objetos.append((item[0] if item else info.st_mtime, caminho, info.st_size))
+        return objetos
+
+    def _registrar_uso(self, objeto, info):
+        """Marca o objeto como usado agora, guardando o tamanho e a data que o validam."""
+        self._indice[self._nome_objeto(objeto)] = [time.time(), info.st_size, info.st_mtime_ns]
+        self._indice_alterado = True
+
+    def _remover_objeto(self, objeto):
+        """Remove um objeto (somente leitura) do disco e do índice."""
+        try:
+            os.chmod(objeto, stat.S_IWRITE | stat.S_IREAD)
+        except OSError:
+            pass
+        os.remove(objeto)
+        if self._indice.pop(self._nome_objeto(objeto), None) is not None:
+            self._indice_alterado = True
+
+    @staticmethod
+    def _temporario_ao_lado(destino):
+        """Nome livre na pasta de destino, para substituir destino atomicamente."""
+        pasta = os.path.dirname(os.path.abspath(destino))
+        descritor, temporario = tempfile.mkstemp(dir=pasta, suffix='.tmp')
+        os.close(descritor)
+        os.remove(temporario)
+        return temporario
+
+    def _materializar(self, origem, destino):
+        """Cria destino com o conteúdo de origem, por link físico se possível."""
+        temporario = self._temporario_ao_lado(destino)
+        try:
+            if self.vincular:
+                try:
+                    os.link(origem, temporario)
+                except OSError:
+                    shutil.copyfile(origem, temporario)
+            else:
+                shutil.copyfile(origem, temporario)
+            os.replace(temporario, destino)
+        except BaseException:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+
+    def restaurar(self, tarefa, parametros):
+        """
+        Cria a saída da tarefa a partir do cache, se o resultado estiver lá.
+
+        Args:
+            tarefa (Tarefa): Arquivos de entrada e saída
+            parametros (dict): Argumentos de processar_arquivo
+
+        Returns:
+            bool: True se a saída está pronta e a tarefa pode ser pulada
+        """
+        extensao = os.path.splitext(tarefa.caminho_saida)[1]
+        objeto = self._caminho_objeto(self.chave(tarefa, parametros), extensao)
+        with self._trava:
+            try:
+                info = os.stat(objeto)
+            except OSError:
+                self.falhas += 1
+                return False
+            item = self._indice.get(self._nome_objeto(objeto))
+            if item and (item[1], item[2]) != (info.st_size, info.st_mtime_ns):
+                # O objeto foi alterado depois de guardado (pela saída ligada a ele)
+                try:
+                    self._remover_objeto(objeto)
+                    self._bytes -= info.st_size
+                except OSError:
+                    pass
+                self.falhas += 1
+                return False
+            self._registrar_uso(objeto, info)
+            self.acertos += 1
+            self.bytes_reaproveitados += info.st_size
+        if os.path.exists(tarefa.caminho_saida) and os.path.samefile(objeto, tarefa.caminho_saida):
+            with self._trava:
+                self.atualizados += 1
+        else:
+            self._materializar(objeto, tarefa.caminho_saida)
+        picos = parametros.get('picos')
+        if picos:
+            # Só remonta os picos que não estiverem atualizados
+            pasta = picos if isinstance(picos, str) else None
+            picos_arquivo(tarefa.caminho_entrada, pasta=pasta)
+            picos_arquivo(tarefa.caminho_saida, pasta=pasta)
+        return True
+
+    def guardar(self, tarefa, parametros):
+        """
+        Guarda a saída recém-processada da tarefa no cache.
+
+        Args:
+            tarefa (Tarefa): Arquivos de entrada e saída
+            parametros (dict): Argumentos de processar_arquivo
+        """
+        extensao = os.path.splitext(tarefa.caminho_saida)[1]
+        objeto = self._caminho_objeto(self.chave(tarefa, parametros), extensao)
+        os.makedirs(os.path.dirname(objeto), exist_ok=True)
+        # Guarda uma cópia, e não um link, para que editar a saída não altere o cache
+        temporario = self._temporario_ao_lado(objeto)
+        try:
+            shutil.copyfile(tarefa.caminho_saida, temporario)
+            os.chmod(temporario, stat.S_IREAD | stat.S_IRGRP | stat.S_IROTH)
+            with self._trava:
+                if os.path.exists(objeto):
+                    self._bytes -= os.path.getsize(objeto)
+                    self._remover_objeto(objeto)
+                os.replace(temporario, objeto)
+        except BaseException:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+        with self._trava:
+            info = os.stat(objeto)
+            self._registrar_uso(objeto, info)
+            self.guardados += 1
+            self._bytes += info.st_size
+            if self._bytes > self.limite_bytes:
+                self._remover_excedentes(manter=objeto)
+
+    def _remover_excedentes(self, manter=None):
+        """Remove os objetos usados há mais tempo até caber no limite."""
+        objetos = sorted(self._objetos())
+        self._bytes = sum(tamanho for _, _, tamanho in objetos)
+        for _, caminho, tamanho in objetos:
+            if self._bytes <= self.limite_bytes:
+                break
+            if caminho == manter:
+                continue
+            try:
+                self._remover_objeto(caminho)
+            except OSError:
+                continue
+            self._bytes -= tamanho
+            self.removidos += 1
+
+    def limpar(self):
+        """Remove todos os objetos e hashes memorizados."""
+        with self._trava:
+            for _, caminho, _ in self._objetos():
+                try:
+                    self._remover_objeto(caminho)
+                except OSError:
+                    pass
+            shutil.rmtree(self._pasta_objetos, ignore_errors=True)
+            os.makedirs(self._pasta_objetos, exist_ok=True)
+            self._hashes = {}
+            self._hashes_alterados = True
+            self._indice = {}
+            self._indice_alterado = True
+            self._bytes = 0
+
+    def estatisticas(self):
+        """
+        Returns:
+            dict: Acertos, falhas, objetos guardados e removidos nesta sessão,
+            bytes reaproveitados e ocupação atual do cache
+        """
+        with self._trava:
+            return {
+                'pasta': self.pasta,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'ja_atualizados': self.atualizados,
+                'guardados': self.guardados,
+                'removidos': self.removidos,
+                'bytes_reaproveitados': self.bytes_reaproveitados,
+                'itens': len(self._objetos()),
+                'bytes': self._bytes,
+                'limite_bytes': self.limite_bytes,
+            }
@@ -0,0 +1,323 @@
+"""Interface de linha de comando para processar arquivos sem a interface gráfica."""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+from .cache_resultados import LIMITE_CACHE_PADRAO, CacheResultados
+from .dinamica import ALVO_SONORIDADE_PADRAO, NORMALIZACOES, TETO_PADRAO_DB
+from .fluxo import PRECISOES, PROFUNDIDADE_PIPELINE, SUBTIPOS_SAIDA, processar_arquivo
+from .lote import MotorLote, ProgressoLote, Tarefa, guardar_no_cache, restaurar_do_cache
+from .metricas import EstatisticasMetricas, MedicaoArquivo, RegistroMetricas, perfilar
+from .processamento import validar_parametros
+from .varredura import montar_variantes, processar_varredura
+
+# Extensões consideradas ao expandir diretórios
+EXTENSOES_AUDIO = ('.wav', '.flac', '.ogg', '.aiff', '.aif')
+
+SUFIXO_SAIDA = "_processado.wav"
+
+# Parâmetros do eco quando não informados
+ATRASO_PADRAO = '200'
+DECAIMENTO_PADRAO = '0.5'
+
+
+def expandir_entradas(entradas, recursivo=False):
+    """
+    Expande arquivos, padrões glob e diretórios em uma lista de arquivos de áudio.
+
+    Args:
+        entradas (list): Caminhos, padrões glob ou diretórios
+        recursivo (bool): Se True, percorre também os subdiretórios
+
+    Returns:
+        list: Caminhos de arquivos, sem repetição, na ordem encontrada
+    """
+    arquivos = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            padrao = os.path.join(entrada, '**', '*') if recursivo else os.path.join(entrada, '*')
+            encontrados = sorted(
+                caminho for caminho in glob.glob(padrao, recursive=recursivo)
+                if os.path.isfile(caminho) and caminho.lower().endswith(EXTENSOES_AUDIO)
+            )
+        elif glob.has_magic(entrada):
+            encontrados = sorted(caminho for caminho in glob.glob(entrada, recursive=True)
+                                 if os.path.isfile(caminho))
+        else:
+            encontrados = [entrada]
+        arquivos.extend(encontrados)
+    return list(dict.fromkeys(arquivos))
+
+
+def caminho_saida_padrao(caminho_entrada, pasta_destino=None):
+    """Monta o caminho <nome>_processado.wav na pasta de destino (ou na da entrada)."""
+    nome_base = os.path.splitext(os.path.basename(caminho_entrada))[0]
+    pasta = pasta_destino or os.path.dirname(os.path.abspath(caminho_entrada))
+    return os.path.join(pasta, f"{nome_base}{SUFIXO_SAIDA}")
+
+
+def montar_tarefas(arquivos, saida=None):
+    """
+    Associa cada arquivo de entrada ao seu arquivo de saída.
+
+    Com um único arquivo, saida pode ser o nome do arquivo final; caso
+    contrário, é tratada como pasta de destino.
+
+    Returns:
+        list: Lista de Tarefa
+    """
+    if len(arquivos) == 1 and saida and not os.path.isdir(saida) and \
+            saida.lower().endswith(EXTENSOES_AUDIO):
+        return [Tarefa(arquivos[0], saida)]
+    if saida:
+        os.makedirs(saida, exist_ok=True)
+    return [Tarefa(arquivo, caminho_saida_padrao(arquivo, saida)) for arquivo in arquivos]
+
+
+def criar_parser():
+    """Cria o parser dos argumentos da linha de comando."""
+    parser = argparse.ArgumentParser(
+        prog='eco_audio',
+        description="Aplica eco ou resposta de impulso a arquivos de áudio.")
+    parser.add_argument('entradas', nargs='+',
+                        help="Arquivos, padrões glob ou diretórios de entrada")
+    parser.add_argument('-o', '--saida',
+                        help="Arquivo de saída (entrada única) ou pasta de destino")
+    parser.add_argument('-a', '--atraso',
+                        help="Atraso do eco em milissegundos (padrão: 200); na varredura, "
+                             "uma lista separada por vírgulas")
+    parser.add_argument('-d', '--decaimento',
+                        help="Decaimento do eco, de 0.0 a 1.0 (padrão: 0.5); na varredura, "
+                             "uma lista separada por vírgulas")
+    parser.add_argument('--realimentacao', action='store_true',
+                        help="Repete o eco até decair (realimentação)")
+    parser.add_argument('--ir', action='append',
+                        help="Arquivo de resposta de impulso (substitui o eco); na varredura, "
+                             "pode ser repetido")
+    parser.add_argument('--varredura', action='store_true',
+                        help="Renderiza cada entrada com todas as combinações de --atraso e "
+                             "--decaimento e com cada --ir, lendo a entrada uma única vez")
+    parser.add_argument('--precisao', choices=PRECISOES, default='float64',
+                        help="Precisão do processamento; float32 reduz a memória pela metade "
+                             "(padrão: float64)")
+    parser.add_argument('--formato', choices=SUBTIPOS_SAIDA,
+                        help="Formato de amostra da saída (padrão: o do tipo de arquivo, "
+                             "PCM_16 para WAV)")
+    parser.add_argument('--normalizacao', choices=NORMALIZACOES,
+                        help="Normalização da saída; 'pico' e 'sonoridade' gravam em duas "
+                             "passadas (padrão: nenhuma para o eco, pico para IR)")
+    parser.add_argument('--alvo-lufs', type=float, default=ALVO_SONORIDADE_PADRAO,
+                        help="Sonoridade alvo de --normalizacao sonoridade (padrão: -16)")
+    parser.add_argument('--teto-db', type=float, default=TETO_PADRAO_DB,
+                        help="Pico máximo da saída em dBFS, garantido pelo limitador "
+                             "(padrão: 0)")
+    parser.add_argument('--picos', action='store_true',
+                        help="Grava ao lado da entrada e da saída um arquivo .picos.npz com a "
+                             "pirâmide de picos para desenhar a forma de onda")
+    parser.add_argument('--sem-mmap', action='store_true',
+                        help="Não usa mapeamento de memória para WAVs sem compressão")
+    parser.add_argument('--profundidade', type=int, default=PROFUNDIDADE_PIPELINE,
+                        help="Blocos em fila entre decodificação, DSP e gravação, que rodam em "
+                             "threads próprias; 0 processa em sequência (padrão: 2)")
+    parser.add_argument('-j', '--trabalhadores', type=int,
+                        help="Número de processos do lote (padrão: número de CPUs)")
+    parser.add_argument('--limite-memoria', type=int,
+                        help="Orçamento de memória do lote, em MiB")
+    parser.add_argument('--cache', nargs='?', const='', metavar='PASTA',
+                        help="Reaproveita resultados de execuções anteriores com a mesma entrada, "
+                             "parâmetros e IR (padrão da pasta: ~/.cache/eco_audio/resultados)")
+    parser.add_argument('--cache-limite', type=int,
+                        help="Espaço máximo do cache, em MiB (padrão: 10240)")
+    parser.add_argument('-r', '--recursivo', action='store_true',
+                        help="Percorre subdiretórios das pastas de entrada")
+    parser.add_argument('--metricas',
+                        help="Acrescenta a medição de cada arquivo a este arquivo JSON lines")
+    parser.add_argument('--perfilar', metavar='ARQUIVO',
+                        help="Processa este arquivo no próprio processo sob um perfilador")
+    parser.add_argument('--perfilador', choices=('cprofile', 'amostragem'), default='cprofile',
+                        help="Tipo de perfilador usado com --perfilar (padrão: cprofile)")
+    parser.add_argument('--perfil-saida',
+                        help="Arquivo do perfil (padrão: <arquivo>.prof ou <arquivo>.collapsed)")
+    return parser
+
+
+def _processar_local(tarefa, parametros, progresso, ao_medir, perfil=None, cache=None):
+    """Processa uma tarefa no próprio processo, opcionalmente sob um perfilador."""
+    if cache is not None and restaurar_do_cache(cache, tarefa, parametros, progresso):
+        return
+    try:
+        def executar():
+            return processar_arquivo(tarefa.caminho_entrada, tarefa.caminho_saida, **parametros)
+
+        if perfil is None:
+            medicao = executar()
+        else:
+            medicao = perfilar(executar, *perfil)
+        if cache is not None:
+            guardar_no_cache(cache, tarefa, parametros)
+        ao_medir(medicao.como_dict())
+        progresso.registrar()
+    except Exception as e:
+        progresso.registrar(f"Erro ao processar {os.path.basename(tarefa.caminho_entrada)}: {str(e)}")
+
+
+def _lista(valor):
+    """Separa uma lista de valores separados por vírgulas."""
+    return [item.strip() for item in valor.split(',') if item.strip()] if valor else []
+
+
+def _executar_varredura(args, parser, arquivos):
+    """Executa o modo --varredura e imprime o resumo em JSON."""
+    atrasos = _lista(args.atraso)
+    decaimentos = _lista(args.decaimento)
+    if atrasos or decaimentos or not args.ir:
+        atrasos = atrasos or [ATRASO_PADRAO]
+        decaimentos = decaimentos or [DECAIMENTO_PADRAO]
+    try:
+        variantes = montar_variantes(atrasos, decaimentos, args.realimentacao, args.ir or [])
+    except ValueError as e:
+        parser.error(str(e))
+
+    inicio = time.perf_counter()
+    estatisticas = EstatisticasMetricas()
+    registro = RegistroMetricas(args.metricas) if args.metricas else None
+    erros = []
+    saidas = []
+    processados = 0
+    for arquivo in arquivos:
+        try:
+            medicao = MedicaoArquivo(arquivo)
+            resultados = processar_varredura(
+                arquivo, variantes, args.saida, medicao=medicao, precisao=args.precisao,
+                subtipo=args.formato, mapear=not args.sem_mmap,
+                profundidade=args.profundidade)
+            saidas.extend(resultado['saida'] for resultado in resultados)
+            estatisticas.registrar(medicao)
+            if registro is not None:
+                registro.escrever(medicao)
+            processados += 1
+        except Exception as e:
+            erros.append(f"Erro ao processar {os.path.basename(arquivo)}: {str(e)}")
+
+    resumo = {
+        'total': len(arquivos),
+        'processados': processados,
+        'erros': erros,
+        'sucesso': processados,
+        'variantes': variantes,
+        'saidas': saidas,
+        'duracao_s': round(time.perf_counter() - inicio, 3),
+        'metricas': estatisticas.resumo(),
+    }
+    json.dump(resumo, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+    return 1 if erros else 0
+
+
+def main(argv=None):
+    """
+    Ponto de entrada da linha de comando.
+
+    Imprime em stdout um resumo em JSON com total, processados, erros, saídas
+    e as métricas agregadas por etapa.
+
+    Returns:
+        int: 0 se todos os arquivos foram processados, 1 se houve erros, 2 se
+        os argumentos forem inválidos
+    """
+    parser = criar_parser()
+    args = parser.parse_args(argv)
+    arquivos = expandir_entradas(args.entradas, args.recursivo)
+    if not arquivos:
+        parser.error("Nenhum arquivo de áudio encontrado nas entradas informadas")
+    if args.profundidade < 0:
+        parser.error("A profundidade do pipeline não pode ser negativa")
+    if args.teto_db > 0:
+        parser.error("O teto não pode passar de 0 dBFS")
+    if args.varredura:
+        if args.normalizacao or args.teto_db != TETO_PADRAO_DB or args.picos:
+            parser.error("--normalizacao, --teto-db e --picos não são usados com --varredura")
+        return _executar_varredura(args, parser, arquivos)
+
+    try:
+        atraso_ms, decaimento = validar_parametros(args.atraso or ATRASO_PADRAO,
+                                                   args.decaimento or DECAIMENTO_PADRAO,
+                                                   args.realimentacao and not args.ir)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.ir and len(args.ir) > 1:
+        parser.error("Vários IRs só podem ser usados com --varredura")
+    tarefas = montar_tarefas(arquivos, args.saida)
+    parametros = {
+        'atraso_ms': atraso_ms,
+        'decaimento': decaimento,
+        'realimentacao': args.realimentacao,
+        'caminho_ir': args.ir[0] if args.ir else None,
+        'precisao': args.precisao,
+        'subtipo': args.formato,
+        'mapear': not args.sem_mmap,
+        'profundidade': args.profundidade,
+        'normalizacao': args.normalizacao,
+        'alvo_lufs': args.alvo_lufs,
+        'teto_db': args.teto_db,
+        'picos': args.picos,
+    }
+
+    registro = RegistroMetricas(args.metricas) if args.metricas else None
+    estatisticas = EstatisticasMetricas()
+
+    def ao_medir(medicao):
+        estatisticas.registrar(medicao)
+        if registro is not None:
+            registro.escrever(medicao)
+
+    perfilada = None
+    if args.perfilar:
+        alvo = os.path.abspath(args.perfilar)
+        perfilada = next((tarefa for tarefa in tarefas
+                          if os.path.abspath(tarefa.caminho_entrada) == alvo), None)
+        if perfilada is None:
+            pasta_destino = os.path.dirname(tarefas[0].caminho_saida)
+            perfilada = Tarefa(args.perfilar, caminho_saida_padrao(args.perfilar, pasta_destino))
+            tarefas.append(perfilada)
+        extensao = '.prof' if args.perfilador == 'cprofile' else '.collapsed'
+        perfil = (args.perfil_saida or os.path.splitext(args.perfilar)[0] + extensao, args.perfilador)
+
+    cache = None
+    if args.cache is not None:
+        limite_cache = args.cache_limite * 1024 * 1024 if args.cache_limite else LIMITE_CACHE_PADRAO
+        cache = CacheResultados(args.cache or None, limite_cache)
+
+    inicio = time.perf_counter()
+    restantes = [tarefa for tarefa in tarefas if tarefa is not perfilada]
+    progresso = ProgressoLote(len(tarefas))
+    if perfilada is not None:
+        # O arquivo perfilado é sempre processado, mesmo que esteja no cache
+        _processar_local(perfilada, parametros, progresso, ao_medir, perfil)
+    if len(restantes) == 1:
+        # Um único arquivo é processado no próprio processo, sem custo de pool
+        _processar_local(restantes[0], parametros, progresso, ao_medir, cache=cache)
+        if cache is not None:
+            cache.salvar()
+    elif restantes:
+        limite = args.limite_memoria * 1024 * 1024 if args.limite_memoria else None
+        motor = MotorLote(trabalhadores=args.trabalhadores, limite_memoria=limite)
+        motor.executar(restantes, parametros, progresso, ao_medir, cache)
+
+    resumo = progresso.resumo()
+    resumo['sucesso'] = resumo['total'] - len(resumo['erros'])
+    resumo['saidas'] = [tarefa.caminho_saida for tarefa in tarefas]
+    resumo['parametros'] = parametros
+    resumo['duracao_s'] = round(time.perf_counter() - inicio, 3)
+    resumo['metricas'] = estatisticas.resumo()
+    if perfilada is not None:
+        resumo['perfil'] = perfil[0]
+    if cache is not None:
+        resumo['cache'] = cache.estatisticas()
+    json.dump(resumo, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+    return 1 if resumo['erros'] else 0
@@ -0,0 +1,126 @@
+"""Controle de trabalhos longos: progresso por quadros e cancelamento cooperativo."""
+
+import threading
+import time
+
+# Intervalo mínimo entre duas chamadas de ao_progredir
+INTERVALO_PROGRESSO_S = 0.1
+
+
+class ProcessamentoCancelado(Exception):
+    """O trabalho foi cancelado por ControleTrabalho.cancelar()."""
+
+
+class ControleTrabalho:
+    """
+    Liga quem executa um trabalho a quem o acompanha.
+
+    O processamento chama avancar() a cada bloco com os quadros concluídos;
+    se o trabalho tiver sido cancelado, avancar() levanta
+    ProcessamentoCancelado, de modo que o cancelamento é atendido em no
+    máximo um bloco. O progresso é repassado a ao_progredir(feitos, total),
+    no máximo uma vez a cada intervalo_s, na thread que processa: uma
+    interface gráfica deve repassá-lo à sua própria thread (por exemplo, com
+    root.after).
+
+    cancelar() e as propriedades podem ser usados de qualquer thread.
+    """
+
+    def __init__(self, ao_progredir=None, intervalo_s=INTERVALO_PROGRESSO_S):
+        """
+        Args:
+            ao_progredir (callable, optional): Recebe (quadros feitos, total)
+            intervalo_s (float): Intervalo mínimo entre duas notificações
+        """
+        self.ao_progredir = ao_progredir
+        self.intervalo_s = intervalo_s
+        self._cancelamento = threading.Event()
+        self._trava = threading.Lock()
+        self.total = 0
+        self.feitos = 0
+        self._ultima_notificacao = 0.0
+
+    @property
+    def cancelado(self):
+        """True depois de cancelar()."""
+        return self._cancelamento.is_set()
+
+    def cancelar(self):
+        """Pede o cancelamento; o trabalho para no próximo bloco."""
+        self._cancelamento.set()
+
+    def verificar(self):
+        """
+        Raises:
+            ProcessamentoCancelado: Se o trabalho foi cancelado
+        """
+        if self._cancelamento.is_set():
+            raise ProcessamentoCancelado("Processamento cancelado")
+
+    def iniciar(self, total):
+        """
+        Define o total de quadros do trabalho e zera o progresso.
+
+        Args:
+            total (float): Quadros de trabalho (ver fluxo.quadros_trabalho), ou
+                outra unidade de trabalho (arquivos, na varredura de metadados)
+        """
+        with self._trava:
+            self.total = total
+            self.feitos = 0
+        self._notificar(forcar=True)
+
+    def avancar(self, quadros):
+        """
+        Registra quadros concluídos e verifica o cancelamento.
+
+        Args:
+            quadros (float): Quadros de trabalho concluídos desde a última chamada
+
+        Raises:
+            ProcessamentoCancelado: Se o trabalho foi cancelado
+        """
+        self.registrar(quadros)
+        self.verificar()
+
+    def registrar(self, quadros):
+        """
+        Registra quadros concluídos sem verificar o cancelamento.
+
+        Usado por quem acompanha trabalho feito em outro lugar (por exemplo,
+        o lote, que soma o progresso dos processos trabalhadores).
+
+        Args:
+            quadros (float): Quadros de trabalho concluídos desde a última chamada
+        """
+        with self._trava:
+            self.feitos += quadros
+        self._notificar()
+
+    def concluir(self):
+        """Marca o trabalho como completo e faz a última notificação."""
+        with self._trava:
+            self.feitos = self.total
+        self._notificar(forcar=True)
+
+    def fracao(self):
+        """
+        Returns:
+            float: Parte concluída, de 0.0 a 1.0
+        """
+        with self._trava:
+            if not self.total:
+                return 0.0
+            return min(1.0, self.feitos / self.total)
+
+    def _notificar(self, forcar=False):
+        """Chama ao_progredir, respeitando o intervalo mínimo."""
+        if self.ao_progredir is None:
+            return
+        agora = time.monotonic()
+        if not forcar and agora - self._ultima_notificacao < self.intervalo_s:
+            return
+        self._ultima_notificacao = agora
+        with self._trava:
+            feitos, total = min(self.feitos, self.total), self.total
+        self.ao_progredir(feitos, total)
@@ -0,0 +1,452 @@
+"""Motor de convolução por FFT para aplicação de respostas de impulso."""
+
+import numpy as np
+
+MODOS = ('auto', 'fft', 'particionado')
+
+# Acima deste tamanho (em quadros) o modo automático deixa de usar uma FFT única
+LIMITE_FFT_UNICA = 1 << 21
+
+# Limites do tamanho de bloco escolhido automaticamente no modo particionado
+BLOCO_MINIMO = 256
+BLOCO_MAXIMO = 1 << 16
+
+# Quantidade aproximada de quadros transformados de uma vez no modo particionado
+QUADROS_POR_LOTE = 1 << 20
+
+
+def tamanho_fft_rapido(n):
+    """
+    Retorna o menor tamanho >= n cujos únicos fatores primos são 2, 3 e 5.
+
+    Args:
+        n (int): Tamanho mínimo da transformada
+
+    Returns:
+        int: Tamanho eficiente para a FFT
+    """
+    if n <= 6:
+        return max(n, 1)
+    melhor = 1 << (n - 1).bit_length()
+    potencia5 = 1
+    while potencia5 < melhor:
+        potencia35 = potencia5
+        while potencia35 < melhor:
+            # Completa com potências de 2 até alcançar n
+            candidato = potencia35
+            while candidato < n:
+                candidato *= 2
+            melhor = min(melhor, candidato)
+            potencia35 *= 3
+        potencia5 *= 5
+    return melhor
+
+
+def proxima_potencia_2(n):
+    """Retorna a menor potência de 2 maior ou igual a n."""
+    return 1 << max(int(n) - 1, 0).bit_length()
+
+
+def escolher_tamanho_bloco(tamanho_impulso):
+    """
+    Escolhe o tamanho de partição do modo particionado para um impulso.
+
+    Args:
+        tamanho_impulso (int): Comprimento do impulso em quadros
+
+    Returns:
+        int: Tamanho de bloco (potência de 2)
+    """
+    return int(np.clip(proxima_potencia_2(tamanho_impulso), BLOCO_MINIMO, BLOCO_MAXIMO))
+
+
+def escolher_modo(tamanho_entrada, tamanho_impulso):
+    """
+    Escolhe o modo de convolução mais adequado aos tamanhos envolvidos.
+
+    Args:
+        tamanho_entrada (int): Comprimento do sinal em quadros
+        tamanho_impulso (int): Comprimento do impulso em quadros
+
+    Returns:
+        str: 'fft' para entradas curtas, 'particionado' para entradas longas
+    """
+    if tamanho_entrada + tamanho_impulso - 1 <= LIMITE_FFT_UNICA:
+        return 'fft'
+    return 'particionado'
+
+
+def _como_matriz(dados):
+    """Retorna os dados no formato (quadros, canais)."""
+    return dados[:, np.newaxis] if dados.ndim == 1 else dados
+
+
+def _como_impulso(impulso):
+    """Valida o impulso e o retorna no formato (quadros, canais do impulso)."""
+    impulso = np.asarray(impulso)
+    if impulso.ndim not in (1, 2):
+        raise ValueError("O impulso deve ser um array (quadros,) ou (quadros, canais)")
+    if len(impulso) == 0 or impulso.size == 0:
+        raise ValueError("O impulso está vazio")
+    return _como_matriz(impulso)
+
+
+def mapa_canais(canais_entrada, canais_impulso):
+    """
+    Define como os canais do impulso se combinam com os canais do sinal.
+
+    - Impulso mono: o mesmo impulso é aplicado a cada canal da entrada.
+    - Entrada mono: cada canal do impulso gera um canal de saída (por exemplo,
+      um IR estéreo torna uma fonte mono estéreo).
+    - Mesmo número de canais: cada canal da entrada usa o canal correspondente
+      do impulso.
+    - canais_impulso = canais_entrada * S: matriz completa (true stereo,
+      surround). Os canais do impulso são ordenados por entrada, depois por
+      saída; no estéreo, LL, LR, RL, RR. Cada saída é a soma das entradas
+      convolvidas com o caminho entrada -> saída.
+
+    Args:
+        canais_entrada (int): Canais do sinal de entrada
+        canais_impulso (int): Canais do arquivo de impulso
+
+    Returns:
+        tuple: (canais de saída, True se for uma matriz completa)
+    """
+    if canais_impulso == 1 or canais_entrada == 1 or canais_impulso == canais_entrada:
+        return max(canais_entrada, canais_impulso), False
+    if canais_impulso % canais_entrada == 0:
+        return canais_impulso // canais_entrada, True
+    raise ValueError(
+        f"Um impulso com {canais_impulso} canais não pode ser aplicado a um áudio "
+        f"com {canais_entrada} canais"
+    )
+
+
+def _multiplicar_acumular(acumulado, espectros_entrada, espectros_impulso, matricial):
+    """
+    Soma a acumulado o produto dos espectros da entrada pelos do impulso.
+
+    Args:
+        acumulado (numpy.ndarray): Destino (..., bins, canais de saída)
+        espectros_entrada (numpy.ndarray): (..., bins, canais de entrada)
+        espectros_impulso (numpy.ndarray): (bins, canais do impulso)
+        matricial (bool): Se True, o impulso é uma matriz entrada x saída
+    """
+    if not matricial:
+        acumulado += espectros_entrada * espectros_impulso
+        return
+    canais_entrada = espectros_entrada.shape[-1]
+    matriz = espectros_impulso.reshape(len(espectros_impulso), canais_entrada, -1)
+    for canal in range(canais_entrada):
+        acumulado += espectros_entrada[..., canal:canal + 1] * matriz[:, canal]
+
+
+def convolver_fft(dados_audio, impulso):
+    """
+    Convolução completa usando uma única FFT para todos os canais.
+
+    Args:
+        dados_audio (numpy.ndarray): Áudio (quadros,) ou (quadros, canais)
+        impulso (numpy.ndarray): Resposta de impulso (quadros,) ou
+            (quadros, canais); ver mapa_canais
+
+    Returns:
+        numpy.ndarray: Resultado com len(dados_audio) + len(impulso) - 1 quadros
+    """
+    impulso = _como_impulso(impulso)
+    entrada = _como_matriz(dados_audio)
+    canais_saida, matricial = mapa_canais(entrada.shape[1], impulso.shape[1])
+    tamanho_saida = len(entrada) + len(impulso) - 1
+    tamanho_fft = tamanho_fft_rapido(tamanho_saida)
+
+    espectro = np.fft.rfft(entrada, tamanho_fft, axis=0)
+    espectro_impulso = np.fft.rfft(impulso, tamanho_fft, axis=0)
+    if matricial or canais_saida != entrada.shape[1]:
+        acumulado = np.zeros((len(espectro), canais_saida), dtype=espectro.dtype)
+        _multiplicar_acumular(acumulado, espectro, espectro_impulso, matricial)
+        espectro = acumulado
+    else:
+        espectro *= espectro_impulso
+    resultado = np.fft.irfft(espectro, tamanho_fft, axis=0)[:tamanho_saida]
+
+    resultado = resultado.astype(np.result_type(dados_audio.dtype, np.float32), copy=False)
+    return resultado[:, 0] if dados_audio.ndim == 1 and canais_saida == 1 else resultado
+
+
+def particionar_impulso(impulso, tamanho_bloco, dtype=np.float64):
+    """
+    Divide o impulso em partições e calcula o espectro de cada uma.
+
+    Args:
+        impulso (numpy.ndarray): Resposta de impulso (quadros,) ou (quadros, canais)
+        tamanho_bloco (int): Tamanho de cada partição em quadros
+        dtype: Tipo de ponto flutuante usado na transformada
+
+    Returns:
+        numpy.ndarray: Espectros (partições, tamanho_bloco + 1, canais do impulso)
+    """
+    impulso = _como_impulso(impulso)
+    particoes = -(-len(impulso) // tamanho_bloco)
+    canais = impulso.shape[1]
+    completo = np.zeros((particoes * tamanho_bloco, canais), dtype=dtype)
+    completo[:len(impulso)] = impulso
+    preenchido = np.zeros((particoes, 2 * tamanho_bloco, canais), dtype=dtype)
+    preenchido[:, :tamanho_bloco] = completo.reshape(particoes, tamanho_bloco, canais)
+    return np.fft.rfft(preenchido, axis=1)
+
+
+class ConvolvedorMultiplo:
+    """
+    Convolução uniformemente particionada (overlap-save) de um mesmo sinal
+    com um ou mais impulsos, com estado entre chamadas.
+
+    Cada impulso é dividido em partições de tamanho_bloco quadros, cada uma
+    pré-transformada com uma FFT de 2 * tamanho_bloco. Os espectros dos blocos
+    de entrada ficam em uma linha de atraso no domínio da frequência, e cada
+    bloco de saída é a soma dos produtos dessa linha pelas partições. Todos os
+    canais são transformados juntos: há uma FFT por canal de entrada e uma
+    inversa por canal de saída, qualquer que seja o tamanho da matriz de
+    canais do impulso (ver mapa_canais).
+
+    A linha de atraso é compartilhada: com vários impulsos, a entrada é
+    transformada uma única vez e só a multiplicação-acumulação e a FFT
+    inversa são feitas por impulso.
+    """
+
+    def __init__(self, impulsos, canais, tamanho_bloco=None, dtype=np.float64, espectros=None):
+        """
+        Prepara as partições dos impulsos.
+
+        Args:
+            impulsos (list): Respostas de impulso (quadros,) ou (quadros, canais)
+            canais (int): Número de canais do sinal de entrada
+            tamanho_bloco (int, optional): Tamanho da partição. Se None, é
+                escolhido a partir do maior impulso.
+            dtype: Tipo de ponto flutuante usado no processamento
+            espectros (list, optional): Resultado de particionar_impulso já
+                calculado para cada impulso (ou None) com este tamanho_bloco
+        """
+        impulsos = [_como_impulso(impulso) for impulso in impulsos]
+        if not impulsos:
+            raise ValueError("Nenhum impulso informado")
+        self.tamanho_bloco = tamanho_bloco or escolher_tamanho_bloco(max(map(len, impulsos)))
+        self.canais = canais
+        self.dtype = np.dtype(dtype)
+        self.tamanhos_impulso = [len(impulso) for impulso in impulsos]
+        self.mapas = [mapa_canais(canais, impulso.shape[1]) for impulso in impulsos]
+        # Mantém a precisão escolhida: espectros float64 não promovem um
+        # processamento em float32
+        tipo_complexo = np.result_type(self.dtype, np.complex64)
+        self.espectros_impulsos = []
+        for impulso, calculado in zip(impulsos, espectros or [None] * len(impulsos)):
+            if calculado is None:
+                calculado = particionar_impulso(impulso, self.tamanho_bloco, self.dtype)
+            self.espectros_impulsos.append(calculado.astype(tipo_complexo, copy=False))
+        self.reiniciar()
+
+    @property
+    def particoes(self):
+        """Número de partições do maior impulso."""
+        return max(espectros.shape[0] for espectros in self.espectros_impulsos)
+
+    def reiniciar(self):
+        """Descarta o estado acumulado (linha de atraso e entrada pendente)."""
+        bloco = self.tamanho_bloco
+        tipo_complexo = self.espectros_impulsos[0].dtype
+        self._anterior = np.zeros((bloco, self.canais), dtype=self.dtype)
+        self._linha_atraso = np.zeros((self.particoes - 1, bloco + 1, self.canais), dtype=tipo_complexo)
+        self._pendente = np.zeros((0, self.canais), dtype=self.dtype)
+        self.quadros_entrada = 0
+
+    def _processar_blocos(self, entrada):
+        """Convolve um número inteiro de blocos e atualiza o estado."""
+        bloco = self.tamanho_bloco
+        quantidade = len(entrada) // bloco
+        estendida = np.concatenate((self._anterior, entrada), axis=0)
+
+        quadros = np.empty((quantidade, 2 * bloco, self.canais), dtype=self.dtype)
+        quadros[:, :bloco] = estendida[:-bloco].reshape(quantidade, bloco, self.canais)
+        quadros[:, bloco:] = estendida[bloco:].reshape(quantidade, bloco, self.canais)
+        espectros = np.fft.rfft(quadros, axis=1)
+
+        historico = np.concatenate((self._linha_atraso, espectros), axis=0)
+        atrasos = self.particoes - 1
+        saidas = []
+        for espectros_impulso, (canais_saida, matricial) in zip(self.espectros_impulsos, self.mapas):
+            acumulado = np.zeros((quantidade, bloco + 1, canais_saida), dtype=espectros.dtype)
+            for p in range(len(espectros_impulso)):
+                _multiplicar_acumular(acumulado, historico[atrasos - p:atrasos - p + quantidade],
+                                      espectros_impulso[p], matricial)
+            saida = np.fft.irfft(acumulado, 2 * bloco, axis=1)[:, bloco:]
+            saidas.append(saida.reshape(quantidade * bloco, canais_saida).astype(self.dtype, copy=False))
+
+        if atrasos:
+            self._linha_atraso = historico[-atrasos:].copy()
+        self._anterior = entrada[-bloco:].copy()
+        return saidas
+
+    def processar(self, dados):
+        """
+        Alimenta quadros de entrada e retorna os quadros de saída já completos.
+
+        Quadros que não completam um bloco ficam pendentes até a próxima
+        chamada ou até finalizar().
+
+        Args:
+            dados (numpy.ndarray): Quadros de entrada (quadros, canais)
+
+        Returns:
+            list: Para cada impulso, os quadros de saída (múltiplo de
+            tamanho_bloco) com os canais de saída do impulso
+        """
+        return self._alimentar(dados)
+
+    def _alimentar(self, dados):
+        """Implementação de processar() que as subclasses podem reaproveitar."""
+        dados = np.asarray(dados, dtype=self.dtype).reshape(-1, self.canais)
+        self.quadros_entrada += len(dados)
+        if len(self._pendente):
+            dados = np.concatenate((self._pendente, dados), axis=0)
+
+        bloco = self.tamanho_bloco
+        completos = (len(dados) // bloco) * bloco
+        self._pendente = dados[completos:].copy()
+
+        lote = max(1, QUADROS_POR_LOTE // (bloco * self.canais)) * bloco
+        partes = [self._processar_blocos(dados[inicio:min(inicio + lote, completos)])
+                  for inicio in range(0, completos, lote)]
+        if not partes:
+            return [np.zeros((0, canais_saida), dtype=self.dtype) for canais_saida, _ in self.mapas]
+        if len(partes) == 1:
+            return partes[0]
+        return [np.concatenate(saidas, axis=0) for saidas in zip(*partes)]
+
+    def finalizar(self):
+        """
+        Esvazia a entrada pendente e as caudas dos impulsos.
+
+        Returns:
+            list: Para cada impulso, os quadros restantes, de forma que o total
+            retornado seja quadros de entrada + len(impulso) - 1
+        """
+        bloco = self.tamanho_bloco
+        ja_emitidos = self.quadros_entrada - len(self._pendente)
+        restantes = [self.quadros_entrada + tamanho - 1 - ja_emitidos
+                     for tamanho in self.tamanhos_impulso]
+        blocos = -(-max(restantes) // bloco)
+        pendente = len(self._pendente)
+        silencio = np.zeros((max(blocos * bloco - pendente, 0), self.canais), dtype=self.dtype)
+        quadros_entrada = self.quadros_entrada
+        saidas = self._alimentar(silencio)
+        self.quadros_entrada = quadros_entrada
+        return [saida[:restante] for saida, restante in zip(saidas, restantes)]
+
+
+class ConvolvedorParticionado(ConvolvedorMultiplo):
+    """
+    Convolução uniformemente particionada (overlap-save) com um único
+    impulso; ver ConvolvedorMultiplo.
+    """
+
+    def __init__(self, impulso, canais, tamanho_bloco=None, dtype=np.float64, espectros=None):
+        """
+        Prepara as partições do impulso.
+
+        Args:
+            impulso (numpy.ndarray): Resposta de impulso (quadros,) ou
+                (quadros, canais); ver mapa_canais
+            canais (int): Número de canais do sinal de entrada
+            tamanho_bloco (int, optional): Tamanho da partição. Se None, é
+                escolhido a partir do comprimento do impulso.
+            dtype: Tipo de ponto flutuante usado no processamento
+            espectros (numpy.ndarray, optional): Resultado de particionar_impulso
+                já calculado para este impulso e tamanho_bloco
+        """
+        super().__init__([impulso], canais, tamanho_bloco, dtype, [espectros])
+
+    @property
+    def canais_saida(self):
+        """Número de canais do resultado."""
+        return self.mapas[0][0]
+
+    @property
+    def matricial(self):
+        """Indica se o impulso é uma matriz completa de canais."""
+        return self.mapas[0][1]
+
+    @property
+    def tamanho_impulso(self):
+        """Comprimento do impulso em quadros."""
+        return self.tamanhos_impulso[0]
+
+    @property
+    def espectros_impulso(self):
+        """Espectros das partições do impulso."""
+        return self.espectros_impulsos[0]
+
+    def processar(self, dados):
+        """
+        Alimenta quadros de entrada e retorna os quadros de saída já completos.
+
+        Args:
+            dados (numpy.ndarray): Quadros de entrada (quadros, canais)
+
+        Returns:
+            numpy.ndarray: Quadros de saída (múltiplo de tamanho_bloco) com
+            canais_saida canais
+        """
+        return super().processar(dados)[0]
+
+    def finalizar(self):
+        """
+        Esvazia a entrada pendente e a cauda do impulso.
+
+        Returns:
+            numpy.ndarray: Quadros restantes, de forma que o total retornado seja
+            quadros de entrada + len(impulso) - 1
+        """
+        return super().finalizar()[0]
+
+
+def convolver_particionado(dados_audio, impulso, tamanho_bloco=None, espectros=None):
+    """
+    Convolução completa usando partições uniformes (overlap-save).
+
+    Args:
+        dados_audio (numpy.ndarray): Áudio (quadros,) ou (quadros, canais)
+        impulso (numpy.ndarray): Resposta de impulso (quadros,) ou (quadros, canais)
+        tamanho_bloco (int, optional): Tamanho da partição
+        espectros (numpy.ndarray, optional): Partições já transformadas
+
+    Returns:
+        numpy.ndarray: Resultado com len(dados_audio) + len(impulso) - 1 quadros
+    """
+    entrada = _como_matriz(dados_audio)
+    dtype = np.result_type(dados_audio.dtype, np.float32)
+    convolvedor = ConvolvedorParticionado(impulso, entrada.shape[1], tamanho_bloco, dtype, espectros)
+    resultado = np.concatenate((convolvedor.processar(entrada), convolvedor.finalizar()), axis=0)
+    return resultado[:, 0] if dados_audio.ndim == 1 and convolvedor.canais_saida == 1 else resultado
+
+
+def convolver(dados_audio, impulso, modo='auto', tamanho_bloco=None):
+    """
+    Convolve o áudio com uma resposta de impulso.
+
+    Args:
+        dados_audio (numpy.ndarray): Áudio (quadros,) ou (quadros, canais)
+        impulso (numpy.ndarray): Resposta de impulso (quadros,) ou
+            (quadros, canais); ver mapa_canais
+        modo (str): 'fft' (uma única FFT), 'particionado' (overlap-save
+            particionado) ou 'auto' (escolhe pelo tamanho)
+        tamanho_bloco (int, optional): Tamanho da partição no modo particionado
+
+    Returns:
+        numpy.ndarray: Resultado com len(dados_audio) + len(impulso) - 1 quadros
+    """
+    if modo not in MODOS:
+        raise ValueError(f"Modo de convolução inválido: {modo}")
+    if modo == 'auto':
+        modo = escolher_modo(len(dados_audio), len(impulso))
+    if modo == 'fft':
+        return convolver_fft(dados_audio, impulso)
+    return convolver_particionado(dados_audio, impulso, tamanho_bloco)
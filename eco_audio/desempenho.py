@@ -0,0 +1,338 @@
+"""
+Suíte de desempenho dos caminhos de DSP e de lote.
+
+Gera sinais e IRs sintéticos, mede cada cenário em um processo separado (para
+que o pico de memória seja o do próprio cenário) e grava os resultados em JSON.
+
+Uso:
+    python -m eco_audio.desempenho --saida base.json
+    python -m eco_audio.desempenho --perfil completo --saida completo.json
+    python -m eco_audio.desempenho --comparar base.json novo.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import soundfile as sf
+
+TAXA_AMOSTRAGEM = 48000
+
+# Cenários de cada perfil: (tipo, canais, duração do sinal em s, duração do IR em s)
+PERFIS = {
+    'rapido': [
+        ('eco', 1, 10, None),
+        ('eco', 2, 60, None),
+        ('eco', 8, 10, None),
+        ('eco_realimentacao', 2, 60, None),
+        ('ir_fft', 2, 10, 0.01),
+        ('ir_fft', 2, 10, 2.0),
+        ('ir_particionado', 2, 60, 2.0),
+        ('ir_particionado', 2, 10, 10.0),
+        ('fluxo_eco', 2, 120, None),
+        ('fluxo_ir', 2, 120, 2.0),
+    ],
+    'completo': [
+        ('eco', 1, 10, None),
+        ('eco', 2, 600, None),
+        ('eco', 8, 60, None),
+        ('eco_realimentacao', 2, 600, None),
+        ('ir_fft', 1, 10, 0.01),
+        ('ir_fft', 2, 30, 3.0),
+        ('ir_particionado', 2, 600, 0.5),
+        ('ir_particionado', 2, 600, 3.0),
+        ('ir_particionado', 2, 60, 30.0),
+        ('ir_particionado', 8, 60, 3.0),
+        ('fluxo_eco', 2, 3600, None),
+        ('fluxo_ir', 2, 3600, 3.0),
+    ],
+}
+
+# Lote: quantidade de arquivos e duração de cada um por perfil
+LOTES = {
+    'rapido': (8, 20),
+    'completo': (32, 60),
+}
+
+# Quadros gerados por vez ao criar arquivos sintéticos
+_BLOCO_GERACAO = 1 << 18
+
+
+def gerar_sinal(quadros, canais, semente=0, inicio=0):
+    """
+    Gera um sinal sintético (ruído modulado e senoides) com amplitude até 0.5.
+
+    Args:
+        quadros (int): Número de quadros
+        canais (int): Número de canais
+        semente (int): Semente do gerador aleatório
+        inicio (int): Índice do primeiro quadro, para gerar arquivos em blocos
+
+    Returns:
+        numpy.ndarray: Sinal (quadros,) se canais == 1, senão (quadros, canais)
+    """
+    gerador = np.random.default_rng(semente + inicio)
+    tempo = (np.arange(quadros) + inicio) / TAXA_AMOSTRAGEM
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 0.5 * tempo)
+    sinal = 0.2 * gerador.standard_normal((quadros, canais)) * envelope[:, np.newaxis]
+    sinal += 0.2 * np.sin(2 * np.pi * 440.0 * tempo)[:, np.newaxis]
+    np.clip(sinal, -0.5, 0.5, out=sinal)
+    return sinal[:, 0] if canais == 1 else sinal
+
+
+def gerar_impulso(duracao_s, semente=1):
+    """
+    Gera uma resposta de impulso sintética com decaimento exponencial (RT60 = duração).
+
+    Returns:
+        numpy.ndarray: IR mono
+    """
+    quadros = max(1, int(duracao_s * TAXA_AMOSTRAGEM))
+    gerador = np.random.default_rng(semente)
+    decaimento = np.exp(-6.9 * np.arange(quadros) / quadros)
+    impulso = gerador.standard_normal(quadros) * decaimento
+    impulso[0] = 1.0
+    return impulso
+
+
+def gravar_sinal(caminho, duracao_s, canais, semente=0):
+    """Grava um sinal sintético em blocos, sem mantê-lo inteiro na memória."""
+    total = int(duracao_s * TAXA_AMOSTRAGEM)
+    with sf.SoundFile(caminho, mode='w', samplerate=TAXA_AMOSTRAGEM, channels=canais,
+                      subtype='PCM_16') as arquivo:
+        for inicio in range(0, total, _BLOCO_GERACAO):
+            quantidade = min(_BLOCO_GERACAO, total - inicio)
+            arquivo.write(gerar_sinal(quantidade, canais, semente, inicio))
+
+
+def pico_rss_mb():
+    """Pico de memória residente do processo atual em MiB, ou None se indisponível."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é dado em KiB no Linux e em bytes no macOS
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(pico / divisor, 1)
+
+
+def _medir(funcao, repeticoes):
+    """Executa a função repetidas vezes e retorna o menor tempo."""
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def _executar_cenario(tipo, canais, duracao_s, duracao_ir_s, repeticoes, pasta):
+    """Mede um cenário; executado em um processo próprio."""
+    from .atraso import Derivacao, aplicar_eco
+    from .convolucao import convolver
+    from .fluxo import processar_arquivo
+
+    quadros = int(duracao_s * TAXA_AMOSTRAGEM)
+    derivacoes = [Derivacao(200, 0.5)]
+
+    if tipo.startswith('fluxo'):
+        entrada = os.path.join(pasta, f'entrada_{os.getpid()}.wav')
+        saida = os.path.join(pasta, f'saida_{os.getpid()}.wav')
+        caminho_ir = None
+        gravar_sinal(entrada, duracao_s, canais)
+        if tipo == 'fluxo_ir':
+            caminho_ir = os.path.join(pasta, f'ir_{os.getpid()}.wav')
+            sf.write(caminho_ir, gerar_impulso(duracao_ir_s), TAXA_AMOSTRAGEM, subtype='FLOAT')
+        tempo = _medir(lambda: processar_arquivo(entrada, saida, 200, 0.5, caminho_ir=caminho_ir),
+                       repeticoes)
+    else:
+        sinal = gerar_sinal(quadros, canais)
+        if tipo == 'eco':
+            funcao = lambda: aplicar_eco(sinal, TAXA_AMOSTRAGEM, derivacoes)
+        elif tipo == 'eco_realimentacao':
+            funcao = lambda: aplicar_eco(sinal, TAXA_AMOSTRAGEM, derivacoes, realimentacao=True)
+        else:
+            impulso = gerar_impulso(duracao_ir_s)
+            modo = tipo.split('_', 1)[1]
+            funcao = lambda: convolver(sinal, impulso, modo=modo)
+        tempo = _medir(funcao, repeticoes)
+
+    return {
+        'tempo_s': round(tempo, 4),
+        'fator_tempo_real': round(duracao_s / tempo, 2),
+        'amostras_por_s': round(quadros * canais / tempo),
+        'pico_rss_mb': pico_rss_mb(),
+    }
+
+
+def nome_cenario(tipo, canais, duracao_s, duracao_ir_s):
+    """Identificador estável de um cenário, usado para comparar execuções."""
+    nome = f"{tipo}/{canais}ch/{duracao_s}s"
+    return nome if duracao_ir_s is None else f"{nome}/ir{duracao_ir_s}s"
+
+
+def medir_cenarios(cenarios, repeticoes, pasta):
+    """
+    Mede cada cenário em um processo novo.
+
+    Returns:
+        dict: Resultados por nome de cenário
+    """
+    contexto = multiprocessing.get_context('spawn')
+    resultados = {}
+    for tipo, canais, duracao_s, duracao_ir_s in cenarios:
+        nome = nome_cenario(tipo, canais, duracao_s, duracao_ir_s)
+        print(f"  {nome}", file=sys.stderr, flush=True)
+        with contexto.Pool(1) as pool:
+            resultado = pool.apply(_executar_cenario,
+                                   (tipo, canais, duracao_s, duracao_ir_s, repeticoes, pasta))
+        resultado.update({'tipo': tipo, 'canais': canais, 'duracao_s': duracao_s,
+                          'duracao_ir_s': duracao_ir_s})
+        resultados[nome] = resultado
+    return resultados
+
+
+def medir_lote(arquivos, duracao_s, pasta, trabalhadores=None):
+    """
+    Mede o processamento em lote com diferentes números de processos.
+
+    Args:
+        arquivos (int): Quantidade de arquivos sintéticos
+        duracao_s (float): Duração de cada arquivo
+        pasta (str): Pasta temporária
+        trabalhadores (list, optional): Números de processos a medir. Se None,
+            usa potências de 2 até o número de CPUs.
+
+    Returns:
+        dict: Resultados por número de processos
+    """
+    from .lote import MotorLote
+
+    if trabalhadores is None:
+        limite = os.cpu_count() or 1
+        trabalhadores = sorted({min(2 ** i, limite) for i in range(limite.bit_length() + 1)})
+
+    pasta_entrada = os.path.join(pasta, 'lote')
+    pasta_saida = os.path.join(pasta, 'lote_saida')
+    os.makedirs(pasta_entrada, exist_ok=True)
+    os.makedirs(pasta_saida, exist_ok=True)
+    tarefas = []
+    for indice in range(arquivos):
+        entrada = os.path.join(pasta_entrada, f'arquivo_{indice}.wav')
+        gravar_sinal(entrada, duracao_s, 2, semente=indice)
+        tarefas.append((entrada, os.path.join(pasta_saida, f'arquivo_{indice}_processado.wav')))
+
+    parametros = {'atraso_ms': 200, 'decaimento': 0.5, 'realimentacao': False, 'caminho_ir': None}
+    resultados = {}
+    base = None
+    for quantidade in trabalhadores:
+        print(f"  lote/{quantidade} processos", file=sys.stderr, flush=True)
+        inicio = time.perf_counter()
+        progresso = MotorLote(trabalhadores=quantidade).executar(tarefas, parametros)
+        tempo = time.perf_counter() - inicio
+        base = base or tempo
+        resultados[str(quantidade)] = {
+            'tempo_s': round(tempo, 4),
+            'arquivos_por_s': round(arquivos / tempo, 2),
+            'fator_tempo_real': round(arquivos * duracao_s / tempo, 2),
+            'aceleracao': round(base / tempo, 2),
+            'erros': len(progresso.resumo()['erros']),
+        }
+    return resultados
+
+
+def executar(perfil='rapido', repeticoes=3, incluir_lote=True, trabalhadores=None):
+    """
+    Executa a suíte completa de um perfil.
+
+    Returns:
+        dict: Metadados do ambiente, cenários e lote
+    """
+    pasta = tempfile.mkdtemp(prefix='eco_audio_desempenho_')
+    try:
+        relatorio = {
+            'perfil': perfil,
+            'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'ambiente': {
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'plataforma': platform.platform(),
+                'cpus': os.cpu_count(),
+            },
+            'taxa_amostragem': TAXA_AMOSTRAGEM,
+            'cenarios': medir_cenarios(PERFIS[perfil], repeticoes, pasta),
+        }
+        if incluir_lote:
+            arquivos, duracao_s = LOTES[perfil]
+            relatorio['lote'] = medir_lote(arquivos, duracao_s, pasta, trabalhadores)
+        return relatorio
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+
+def comparar(anterior, atual):
+    """
+    Compara dois relatórios e retorna a variação de cada métrica.
+
+    Returns:
+        list: Linhas (nome, métrica, anterior, atual, variação percentual)
+    """
+    linhas = []
+    for secao, metricas in (('cenarios', ('fator_tempo_real', 'pico_rss_mb')),
+                            ('lote', ('fator_tempo_real', 'aceleracao'))):
+        for nome, valores in atual.get(secao, {}).items():
+            valores_anteriores = anterior.get(secao, {}).get(nome)
+            if valores_anteriores is None:
+                continue
+            for metrica in metricas:
+                antes, depois = valores_anteriores.get(metrica), valores.get(metrica)
+                if not antes or depois is None:
+                    continue
+                variacao = round((depois - antes) / antes * 100, 1)
+                linhas.append((f"{secao}/{nome}", metrica, antes, depois, variacao))
+    return linhas
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando da suíte de desempenho."""
+    parser = argparse.ArgumentParser(prog='eco_audio.desempenho',
+                                     description="Mede o desempenho do DSP e do lote.")
+    parser.add_argument('--perfil', choices=sorted(PERFIS), default='rapido')
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--sem-lote', action='store_true', help="Não mede o processamento em lote")
+    parser.add_argument('--trabalhadores', type=int, nargs='+',
+                        help="Números de processos medidos no lote")
+    parser.add_argument('--saida', help="Arquivo JSON de resultados (padrão: stdout)")
+    parser.add_argument('--comparar', nargs=2, metavar=('ANTERIOR', 'ATUAL'),
+                        help="Compara dois arquivos de resultados em vez de medir")
+    args = parser.parse_args(argv)
+
+    if args.comparar:
+        with open(args.comparar[0], encoding='utf-8') as arquivo:
+            anterior = json.load(arquivo)
+        with open(args.comparar[1], encoding='utf-8') as arquivo:
+            atual = json.load(arquivo)
+        for nome, metrica, antes, depois, variacao in comparar(anterior, atual):
+            print(f"{nome:55} {metrica:18} {antes:>12} {depois:>12} {variacao:>+8.1f}%")
+        return 0
+
+    relatorio = executar(args.perfil, args.repeticoes, not args.sem_lote, args.trabalhadores)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+    else:
+        json.dump(relatorio, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,403 @@
+"""Limitador de pico com antecipação e medição de sonoridade, ambos em blocos."""
+
+import math
+
+import numpy as np
+
+from .atraso import ms_para_amostras
+from .convolucao import ConvolvedorParticionado
+
+# Modos de normalização da saída
+NORMALIZACOES = ('nenhuma', 'pico', 'sonoridade')
+
+# Nível máximo da saída do limitador, em dBFS (0 dBFS mantém intacto o que não passa de 1.0)
+TETO_PADRAO_DB = 0.0
+
+# Antecipação: o ganho começa a descer este tempo antes do pico
+ANTECIPACAO_PADRAO_MS = 5.0
+
+# Liberação: tempo em que o ganho volta a 1 depois de um pico
+LIBERACAO_PADRAO_MS = 80.0
+
+# Sonoridade alvo da normalização por sonoridade, em LUFS
+ALVO_SONORIDADE_PADRAO = -16.0
+
+# Duração da resposta do filtro de ponderação K (o passa-altas decai em poucos ms)
+_DURACAO_FILTRO_K_S = 0.1
+
+# Blocos de medição da ITU-R BS.1770: 400 ms com passo de 100 ms
+_SUBBLOCOS_POR_BLOCO = 4
+
+# Portas absoluta (LUFS) e relativa (LU) da sonoridade integrada
+_PORTA_ABSOLUTA = -70.0
+_PORTA_RELATIVA = -10.0
+
+
+def validar_normalizacao(normalizacao):
+    """
+    Valida o modo de normalização.
+
+    Raises:
+        ValueError: Se o modo não for aceito
+    """
+    if normalizacao not in NORMALIZACOES:
+        raise ValueError(f"Normalização inválida: {normalizacao} (use {', '.join(NORMALIZACOES)})")
+
+
+def db_para_linear(db):
+    """Converte decibéis em fator de amplitude."""
+    return 10.0 ** (db / 20.0)
+
+
+def _minimo_deslizante(valores, janela):
+    """
+    Mínimo de cada janela de `janela` valores consecutivos (algoritmo de van
+    Herk/Gil-Werman: mínimos de prefixo e de sufixo por bloco, O(n)).
+
+    Returns:
+        numpy.ndarray: len(valores) - janela + 1 mínimos
+    """
+    quantidade = len(valores) - janela + 1
+    if janela == 1:
+        return valores.copy()
+    blocos = -(-len(valores) // janela)
+    preenchido = np.full(blocos * janela, np.inf)
+    preenchido[:len(valores)] = valores
+    matriz = preenchido.reshape(blocos, janela)
+    prefixo = np.minimum.accumulate(matriz, axis=1).ravel()
+    sufixo = np.minimum.accumulate(matriz[:, ::-1], axis=1)[:, ::-1].ravel()
+    return np.minimum(sufixo[:quantidade], prefixo[janela - 1:janela - 1 + quantidade])
+
+
+def _media_deslizante(valores, janela):
+    """Média de cada janela de `janela` valores consecutivos."""
+    soma = np.empty(len(valores) + 1)
+    soma[0] = 0.0
+    np.cumsum(valores, out=soma[1:])
+    return (soma[janela:] - soma[:-janela]) * (1.0 / janela)
+
+
+class LimitadorAntecipado:
+    """
+    Limitador de pico com antecipação, para processamento em blocos.
+
+    O ganho é o mesmo em todos os canais e garante que nenhuma amostra passe
+    do teto. Para cada amostra calcula-se o ganho necessário; o mínimo desse
+    ganho em uma janela de antecipação, suavizado por uma média da mesma
+    largura, faz o ganho descer em rampa até o pico e nunca ficar acima do
+    necessário. Uma segunda média, da largura da liberação, faz o ganho
+    voltar a 1 gradualmente depois do pico. Tudo é vetorizado por bloco.
+
+    A saída fica atrasada pela antecipação; processar() descarta o atraso
+    inicial e finalizar() devolve as últimas amostras, então o total gravado
+    é igual ao total recebido e as amostras ficam alinhadas com a entrada.
+    """
+
+    def __init__(self, taxa_amostragem, canais, teto_db=TETO_PADRAO_DB,
+                 antecipacao_ms=ANTECIPACAO_PADRAO_MS, liberacao_ms=LIBERACAO_PADRAO_MS,
+                 dtype=np.float64):
+        """
+        Args:
+            taxa_amostragem (int): Taxa de amostragem do áudio
+            canais (int): Número de canais
+            teto_db (float): Nível máximo da saída em dBFS
+            antecipacao_ms (float): Duração da rampa de ataque
+            liberacao_ms (float): Duração da volta do ganho depois do pico
+            dtype: Tipo de ponto flutuante das amostras
+        """
+        self.teto = db_para_linear(teto_db)
+        self.canais = canais
+        self.dtype = np.dtype(dtype)
+        self.antecipacao = max(1, ms_para_amostras(antecipacao_ms, taxa_amostragem))
+        self.liberacao = max(1, ms_para_amostras(liberacao_ms, taxa_amostragem))
+        # Atraso da saída em relação à entrada
+        self.latencia = self.antecipacao - 1
+        self.menor_ganho = 1.0
+        self._ganho_necessario = np.ones(self.antecipacao - 1)
+        self._minimos = np.ones(self.antecipacao - 1)
+        self._ganhos = np.ones(self.liberacao - 1)
+        self._estendido = np.zeros((self.latencia, canais), dtype=self.dtype)
+        self._descartar = self.latencia
+
+    def _reservar(self, quantidade):
+        """Garante espaço para latencia + quantidade quadros, mantendo o histórico."""
+        if len(self._estendido) < self.latencia + quantidade:
+            estendido = np.empty((self.latencia + quantidade, self.canais), dtype=self.dtype)
+            estendido[:self.latencia] = self._estendido[:self.latencia]
+            self._estendido = estendido
+        return self._estendido
+
+    def processar(self, dados, saida=None):
+        """
+        Limita um bloco.
+
+        Args:
+            dados (numpy.ndarray): Quadros (quantidade, canais)
+            saida (numpy.ndarray, optional): Onde gravar o resultado, com ao
+                menos len(dados) quadros; pode ser o próprio `dados`
+
+        Returns:
+            numpy.ndarray: Quadros limitados, atrasados pela latência (no
+            primeiro bloco, até `latencia` quadros a menos)
+        """
+        quantidade = len(dados)
+        if not quantidade:
+            return np.empty((0, self.canais), dtype=self.dtype)
+        dados = dados.reshape(quantidade, -1)
+        if saida is None:
+            saida = np.empty((quantidade, self.canais), dtype=self.dtype)
+        else:
+            saida = saida.reshape(len(saida), -1)
+        estendido = self._reservar(quantidade)
+        estendido[self.latencia:self.latencia + quantidade] = dados
+
+        # Ganho necessário em cada quadro (pico entre os canais)
+        pico = np.max(np.abs(dados), axis=1)
+        necessario = self.teto / np.maximum(pico, self.teto)
+        todos = np.concatenate((self._ganho_necessario, necessario))
+        minimos = np.concatenate((self._minimos, _minimo_deslizante(todos, self.antecipacao)))
+        ataque = _media_deslizante(minimos, self.antecipacao)
+        ganhos = np.concatenate((self._ganhos, ataque))
+        ganho = np.minimum(ataque, _media_deslizante(ganhos, self.liberacao))
+        if self.antecipacao > 1:
+            self._ganho_necessario = todos[-(self.antecipacao - 1):]
+            self._minimos = minimos[-(self.antecipacao - 1):]
+        if self.liberacao > 1:
+            self._ganhos = ganhos[-(self.liberacao - 1):]
+
+        inicio = min(self._descartar, quantidade)
+        self._descartar -= inicio
+        emitidos = quantidade - inicio
+        np.multiply(estendido[inicio:quantidade],
+                    ganho[inicio:, None].astype(self.dtype, copy=False), out=saida[:emitidos])
+        if emitidos:
+            self.menor_ganho = min(self.menor_ganho, float(np.min(ganho[inicio:])))
+        # Últimas amostras recebidas viram o histórico do próximo bloco
+        estendido[:self.latencia] = estendido[quantidade:quantidade + self.latencia]
+        return saida[:emitidos]
+
+    def finalizar(self):
+        """
+        Devolve as amostras retidas pela antecipação.
+
+        Returns:
+            numpy.ndarray: Os últimos quadros limitados
+        """
+        if not self.latencia:
+            return np.zeros((0, self.canais), dtype=self.dtype)
+        restantes = self.latencia - self._descartar
+        return self.processar(np.zeros((self.latencia, self.canais), dtype=self.dtype))[:restantes]
+
+
+def limitar(dados_audio, taxa_amostragem, teto_db=TETO_PADRAO_DB, **opcoes):
+    """
+    Aplica o limitador a um sinal inteiro, no próprio array.
+
+    Args:
+        dados_audio (numpy.ndarray): Áudio (quadros,) ou (quadros, canais)
+        taxa_amostragem (int): Taxa de amostragem do áudio
+        teto_db (float): Nível máximo da saída em dBFS
+        **opcoes: antecipacao_ms e liberacao_ms de LimitadorAntecipado
+
+    Returns:
+        numpy.ndarray: O mesmo array, limitado
+    """
+    matriz = dados_audio.reshape(len(dados_audio), -1)
+    limitador = LimitadorAntecipado(taxa_amostragem, matriz.shape[1], teto_db,
+                                    dtype=matriz.dtype, **opcoes)
+    emitidos = len(limitador.processar(matriz, saida=matriz))
+    # Os quadros retidos ocupam o fim do array, já liberado pelo deslocamento
+    matriz[emitidos:] = limitador.finalizar()
+    return dados_audio
+
+
+def _biquad(b, a, frequencias):
+    """Resposta em frequência de um biquad nas frequências normalizadas (rad/amostra)."""
+    z = np.exp(-1j * frequencias)
+    return (b[0] + b[1] * z + b[2] * z * z) / (a[0] + a[1] * z + a[2] * z * z)
+
+
+def resposta_ponderacao_k(taxa_amostragem):
+    """
+    Resposta ao impulso (FIR) do filtro de ponderação K da ITU-R BS.1770.
+
+    Os dois estágios (prateleira de agudos de +4 dB e passa-altas de 38 Hz)
+    são projetados para a taxa informada e amostrados em frequência; a
+    resposta truncada em 100 ms reproduz o filtro IIR com erro desprezível.
+
+    Args:
+        taxa_amostragem (int): Taxa de amostragem do áudio
+
+    Returns:
+        numpy.ndarray: Coeficientes do filtro
+    """
+    # Parâmetros analógicos que reproduzem os coeficientes da norma a 48 kHz
+    # (derivação de B. De Man), aplicados à taxa informada
+    k = math.tan(math.pi * 1681.974450955533 / taxa_amostragem)
+    q = 0.7071752369554196
+    agudos = 10.0 ** (3.999843853973347 / 20.0)
+    medios = agudos ** 0.4996667741545416
+    prateleira = (
+        (agudos + medios * k / q + k * k, 2 * (k * k - agudos), agudos - medios * k / q + k * k),
+        (1 + k / q + k * k, 2 * (k * k - 1), 1 - k / q + k * k),
+    )
+    k = math.tan(math.pi * 38.13547087602444 / taxa_amostragem)
+    q = 0.5003270373238773
+    a0 = 1 + k / q + k * k
+    # Na norma o numerador do passa-altas é 1, -2, 1 sem divisão por a0
+    passa_altas = ((a0, -2 * a0, a0),
+                   (a0, 2 * (k * k - 1), 1 - k / q + k * k))
+    tamanho = max(1, int(_DURACAO_FILTRO_K_S * taxa_amostragem))
+    tamanho_fft = 1 << (8 * tamanho - 1).bit_length()
+    frequencias = np.linspace(0, math.pi, tamanho_fft // 2 + 1)
+    resposta = _biquad(*prateleira, frequencias) * _biquad(*passa_altas, frequencias)
+    return np.fft.irfft(resposta, tamanho_fft)[:tamanho]
+
+
+def _pesos_canais(canais):
+    """Pesos da BS.1770 por canal: 5.1 ignora o LFE e reforça os surrounds."""
+    if canais == 6:
+        return np.array([1.0, 1.0, 1.0, 0.0, 1.41, 1.41])
+    return np.ones(canais)
+
+
+class AnalisadorSonoridade:
+    """
+    Mede em blocos o pico de amostra e a sonoridade integrada (ITU-R BS.1770,
+    em LUFS) de um sinal.
+
+    O sinal é ponderado pelo filtro K por convolução particionada, e a
+    energia é somada em sub-blocos de 100 ms; resultado() monta os blocos de
+    400 ms (75% de sobreposição) e aplica as portas absoluta e relativa.
+    A memória usada cresce só com o número de sub-blocos (um valor por
+    canal a cada 100 ms).
+    """
+
+    def __init__(self, taxa_amostragem, canais, sonoridade=True):
+        """
+        Args:
+            taxa_amostragem (int): Taxa de amostragem do áudio
+            canais (int): Número de canais
+            sonoridade (bool): Se False, mede apenas o pico
+        """
+        self.canais = canais
+        self.pico = 0.0
+        self.quadros = 0
+        self._filtro = None
+        if sonoridade:
+            self._filtro = ConvolvedorParticionado(resposta_ponderacao_k(taxa_amostragem), canais)
+        self._subbloco = max(1, taxa_amostragem // 10)
+        self._energias = []
+        self._parcial = np.zeros(canais)
+        self._no_subbloco = 0
+        self._sonoridade = None
+
+    def processar(self, dados):
+        """Acrescenta um bloco (quantidade, canais) à medição."""
+        dados = dados.reshape(len(dados), -1)
+        if not len(dados):
+            return
+        self.quadros += len(dados)
+        self.pico = max(self.pico, float(np.max(dados)), -float(np.min(dados)))
+        if self._filtro is not None:
+            self._acumular(self._filtro.processar(dados))
+
+    def _acumular(self, ponderado):
+        """Soma a energia do sinal ponderado nos sub-blocos de 100 ms."""
+        # O filtro devolve os quadros em atraso; só conta os que correspondem à entrada
+        ponderado = ponderado[:max(0, self.quadros - self._quadros_medidos())]
+        inicio = 0
+        if self._no_subbloco:
+            parte = ponderado[:self._subbloco - self._no_subbloco]
+            self._parcial += np.einsum('ij,ij->j', parte, parte)
+            self._no_subbloco += len(parte)
+            inicio = len(parte)
+            if self._no_subbloco < self._subbloco:
+                return
+            self._energias.append(self._parcial.copy())
+            self._parcial[:] = 0.0
+            self._no_subbloco = 0
+        completos = (len(ponderado) - inicio) // self._subbloco
+        if completos:
+            trecho = ponderado[inicio:inicio + completos * self._subbloco]
+            trecho = trecho.reshape(completos, self._subbloco, self.canais)
+            self._energias.extend(np.einsum('ijk,ijk->ik', trecho, trecho))
+            inicio += completos * self._subbloco
+        resto = ponderado[inicio:]
+        if len(resto):
+            self._parcial += np.einsum('ij,ij->j', resto, resto)
+            self._no_subbloco = len(resto)
+
+    def _quadros_medidos(self):
+        return len(self._energias) * self._subbloco + self._no_subbloco
+
+    def sonoridade(self):
+        """
+        Calcula a sonoridade integrada. Encerra a medição: depois desta
+        chamada, processar() não deve mais ser usado.
+
+        Returns:
+            float: Sonoridade em LUFS, ou -inf para silêncio ou sinal sem medição
+        """
+        if self._sonoridade is not None:
+            return self._sonoridade
+        self._sonoridade = -math.inf
+        if self._filtro is None or not self.quadros:
+            return self._sonoridade
+        # Completa a medição com os quadros ainda retidos pelo filtro
+        self._acumular(self._filtro.finalizar())
+        subblocos = np.array(self._energias).reshape(-1, self.canais)
+        if not len(subblocos):
+            # Sinal mais curto que um sub-bloco: mede o que houver
+            subblocos = self._parcial[None, :] * (self._subbloco / max(self._no_subbloco, 1))
+
+        # Blocos de 400 ms a cada 100 ms; arquivos curtos formam um único bloco
+        por_bloco = min(_SUBBLOCOS_POR_BLOCO, len(subblocos))
+        soma = np.cumsum(np.vstack((np.zeros((1, self.canais)), subblocos)), axis=0)
+        blocos = (soma[por_bloco:] - soma[:-por_bloco]) / (por_bloco * self._subbloco)
+        potencias = blocos @ _pesos_canais(self.canais)
+        with np.errstate(divide='ignore'):
+            niveis = -0.691 + 10 * np.log10(potencias)
+        acima = niveis > _PORTA_ABSOLUTA
+        if not np.any(acima):
+            return self._sonoridade
+        porta = -0.691 + 10 * math.log10(np.mean(potencias[acima])) + _PORTA_RELATIVA
+        self._sonoridade = -0.691 + 10 * math.log10(np.mean(potencias[acima & (niveis > porta)]))
+        return self._sonoridade
+
+    def resultado(self):
+        """
+        Returns:
+            dict: Pico de amostra (linear e dBFS) e sonoridade integrada (LUFS)
+        """
+        sonoridade = self.sonoridade()
+        return {
+            'pico': self.pico,
+            'pico_db': 20 * math.log10(self.pico) if self.pico > 0 else -math.inf,
+            'sonoridade_lufs': sonoridade,
+        }
+
+
+def ganho_normalizacao(analise, normalizacao, alvo_lufs=ALVO_SONORIDADE_PADRAO,
+                       teto_db=TETO_PADRAO_DB):
+    """
+    Calcula o ganho de normalização a partir de uma análise.
+
+    Args:
+        analise (AnalisadorSonoridade): Medição do sinal a ser normalizado
+        normalizacao (str): 'nenhuma', 'pico' (leva o pico ao teto) ou
+            'sonoridade' (leva a sonoridade integrada ao alvo)
+        alvo_lufs (float): Sonoridade alvo do modo 'sonoridade'
+        teto_db (float): Nível do pico no modo 'pico', em dBFS
+
+    Returns:
+        float: Ganho linear (1.0 se o sinal for silêncio)
+    """
+    validar_normalizacao(normalizacao)
+    if normalizacao == 'pico' and analise.pico > 0:
+        return db_para_linear(teto_db) / analise.pico
+    if normalizacao == 'sonoridade':
+        sonoridade = analise.sonoridade()
+        if math.isfinite(sonoridade):
+            return db_para_linear(alvo_lufs - sonoridade)
+    return 1.0
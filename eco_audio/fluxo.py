@@ -0,0 +1,769 @@
+"""Processamento de arquivos em blocos, com memória constante."""
+
+import os
+import queue
+import tempfile
+import threading
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+import soundfile as sf
+
+from .atraso import Derivacao, ProcessadorAtraso
+from .banco_ir import banco_padrao
+from .controle import ControleTrabalho
+from .convolucao import ConvolvedorParticionado
+from .mapeamento import SaidaMapeada, abrir_entrada_mapeada, pode_mapear_saida
+from .metricas import MedicaoArquivo
+from .picos import ConstrutorPicos, salvar_picos
+from .dinamica import (
+    ALVO_SONORIDADE_PADRAO,
+    TETO_PADRAO_DB,
+    AnalisadorSonoridade,
+    LimitadorAntecipado,
+    ganho_normalizacao,
+    validar_normalizacao,
+)
+
+# Quantidade de quadros lidos e escritos por vez
+TAMANHO_BLOCO_FLUXO = 65536
+
+# Blocos em trânsito em cada fila entre as etapas de decodificação, DSP e
+# gravação; 0 executa as três etapas em sequência na mesma thread
+PROFUNDIDADE_PIPELINE = 2
+
+# Precisões aceitas no processamento, da decodificação à gravação
+PRECISOES = ('float64', 'float32')
+
+# Formatos de amostra do arquivo de saída (None mantém o padrão do formato)
+SUBTIPOS_SAIDA = ('PCM_16', 'PCM_24', 'FLOAT')
+
+
+def validar_formato(precisao, subtipo=None):
+    """
+    Valida a precisão do processamento e o formato de amostra da saída.
+
+    Raises:
+        ValueError: Se algum dos valores não for aceito
+    """
+    if precisao not in PRECISOES:
+        raise ValueError(f"Precisão inválida: {precisao} (use {', '.join(PRECISOES)})")
+    if subtipo is not None and subtipo not in SUBTIPOS_SAIDA:
+        raise ValueError(f"Formato de saída inválido: {subtipo} (use {', '.join(SUBTIPOS_SAIDA)})")
+
+
+def _escrever(arquivo_saida, dados, medicao, picos=None):
+    """
+    Grava o bloco, limitado a [-1.0, 1.0].
+
+    O nível já vem controlado pelo limitador (ver dinamica); o corte aqui só
+    protege a conversão para inteiros contra erros de arredondamento. Com
+    picos (ConstrutorPicos), o bloco gravado também entra na pirâmide da saída.
+    """
+    if len(dados) == 0:
+        return
+    with medicao.medir('dsp'):
+        np.clip(dados, -1.0, 1.0, out=dados)
+        if picos is not None:
+            picos.acumular(dados)
+    if isinstance(arquivo_saida, _GravadorAssincrono):
+        # O tempo de gravação é medido na thread de gravação
+        arquivo_saida.write(dados)
+        return
+    with medicao.medir('codificacao'):
+        arquivo_saida.write(dados)
+
+
+def _ler_blocos(entrada, tamanho_bloco, medicao, precisao='float64'):
+    """
+    Lê a entrada em blocos (quadros, canais), medindo o tempo de decodificação.
+
+    Todos os blocos são lidos no mesmo buffer, que o consumidor não deve
+    guardar entre iterações. Com entrada mapeada, o bloco pode ser uma visão
+    somente leitura do arquivo.
+    """
+    buffer = np.empty((tamanho_bloco, entrada.channels), dtype=precisao)
+    while True:
+        with medicao.medir('decodificacao'):
+            bloco = entrada.read(dtype=precisao, always_2d=True, out=buffer)
+        if not len(bloco):
+            return
+        yield bloco
+
+
+# Marca o fim da entrada na fila da thread de leitura
+_FIM = object()
+
+
+class _LeitorAntecipado:
+    """
+    Decodifica a entrada em uma thread própria, à frente do DSP.
+
+    Os blocos lidos passam por uma fila de até `profundidade` blocos; com a
+    fila cheia a leitura espera, o que limita a memória quando o DSP ou a
+    gravação são o gargalo. A thread lê em um anel de 2·profundidade + 3
+    buffers: como a fila do DSP e a do gravador têm no máximo `profundidade`
+    blocos cada, um buffer só é reutilizado depois que o bloco que ele
+    continha foi gravado. Os blocos são sempre graváveis (uma leitura
+    mapeada sem conversão é copiada para o anel, o que também traz as
+    páginas do arquivo para a memória fora da thread do DSP).
+    """
+
+    def __init__(self, entrada, tamanho_bloco, medicao, precisao, profundidade):
+        self._entrada = entrada
+        self._medicao = medicao
+        self._precisao = precisao
+        self._anel = [np.empty((tamanho_bloco, entrada.channels), dtype=precisao)
+                      for _ in range(2 * profundidade + 3)]
+        self._prontos = queue.Queue(maxsize=profundidade)
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._ler, name='eco-leitura', daemon=True)
+        self._thread.start()
+
+    def _ler(self):
+        indice = 0
+        try:
+            while not self._parar.is_set():
+                buffer = self._anel[indice % len(self._anel)]
+                indice += 1
+                with self._medicao.medir('decodificacao'):
+                    bloco = self._entrada.read(dtype=self._precisao, always_2d=True, out=buffer)
+                    if not bloco.flags.writeable:
+                        buffer[:len(bloco)] = bloco
+                        bloco = buffer[:len(bloco)]
+                if not len(bloco):
+                    break
+                self._prontos.put(bloco)
+        except BaseException as e:
+            self._prontos.put(e)
+        finally:
+            self._prontos.put(_FIM)
+
+    def __iter__(self):
+        while True:
+            item = self._prontos.get()
+            if item is _FIM:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        # Esvazia a fila para liberar a thread caso o consumidor pare antes do fim
+        self._parar.set()
+        while self._thread.is_alive():
+            try:
+                self._prontos.get(timeout=0.05)
+            except queue.Empty:
+                pass
+        self._thread.join()
+
+
+class _GravadorAssincrono:
+    """
+    Grava os blocos em uma thread própria, atrás do DSP e na ordem recebida.
+
+    write() só espera quando já há `profundidade` blocos na fila. Os dados
+    passados não podem ser alterados depois (ver _LeitorAntecipado). Um erro
+    de gravação é repassado na próxima chamada a write() ou ao fechar.
+    """
+
+    def __init__(self, saida, medicao, profundidade):
+        self._saida = saida
+        self._medicao = medicao
+        self._fila = queue.Queue(maxsize=profundidade)
+        self._erro = None
+        self._thread = threading.Thread(target=self._gravar, name='eco-gravacao', daemon=True)
+        self._thread.start()
+
+    def _gravar(self):
+        while True:
+            dados = self._fila.get()
+            if dados is None:
+                return
+            if self._erro is not None:
+                continue
+            try:
+                with self._medicao.medir('codificacao'):
+                    self._saida.write(dados)
+            except BaseException as e:
+                self._erro = e
+
+    def write(self, dados):
+        if self._erro is not None:
+            raise self._erro
+        self._fila.put(dados)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, *excecao):
+        self._fila.put(None)
+        self._thread.join()
+        if tipo is None and self._erro is not None:
+            raise self._erro
+
+
+def _etapa_leitura(entrada, tamanho_bloco, medicao, precisao, profundidade, picos=None):
+    """
+    Contexto que fornece os blocos da entrada, lidos em thread própria se profundidade > 0.
+
+    Com picos (ConstrutorPicos), cada bloco entra na pirâmide da entrada
+    antes de chegar ao DSP.
+    """
+    if profundidade > 0:
+        etapa = _LeitorAntecipado(entrada, tamanho_bloco, medicao, precisao, profundidade)
+    else:
+        etapa = nullcontext(_ler_blocos(entrada, tamanho_bloco, medicao, precisao))
+    if picos is None:
+        return etapa
+    return _resumindo(etapa, medicao, picos)
+
+
+@contextmanager
+def _resumindo(etapa, medicao, picos):
+    """Repassa os blocos da etapa de leitura acumulando-os na pirâmide de picos."""
+    def blocos_resumidos(blocos):
+        for bloco in blocos:
+            with medicao.medir('dsp'):
+                picos.acumular(bloco)
+            yield bloco
+
+    with etapa as blocos:
+        yield blocos_resumidos(blocos)
+
+
+def _construtores_picos(picos, entrada):
+    """Construtores das pirâmides da entrada e da saída, ou (None, None) sem picos."""
+    if not picos:
+        return None, None
+    return ConstrutorPicos(entrada.samplerate), ConstrutorPicos(entrada.samplerate)
+
+
+def _salvar_picos(picos, picos_entrada, picos_saida, caminho_entrada, caminho_saida, entrada):
+    """
+    Grava os arquivos de picos da entrada e da saída, se foram montados.
+
+    Com picos=True eles ficam ao lado dos arquivos; com uma pasta (str), nela
+    (ver caminho_picos).
+    """
+    if picos_entrada is None:
+        return
+    pasta = picos if isinstance(picos, str) else None
+    salvar_picos(picos_entrada.finalizar(entrada.channels), caminho_entrada, pasta)
+    salvar_picos(picos_saida.finalizar(entrada.channels), caminho_saida, pasta)
+
+
+def _etapa_gravacao(saida, medicao, profundidade):
+    """
+    Contexto que fornece onde gravar os blocos: a própria saída ou, se
+    profundidade > 0, um gravador em thread própria.
+
+    Saídas mapeadas são sempre gravadas na thread do DSP, que calcula os
+    blocos direto no mapa; a gravação nelas não tem o que sobrepor.
+    """
+    if profundidade > 0 and not isinstance(saida, SaidaMapeada):
+        return _GravadorAssincrono(saida, medicao, profundidade)
+    return nullcontext(saida)
+
+
+def _destino(saida, bloco, reserva):
+    """
+    Escolhe onde o DSP grava o bloco: direto no mapa da saída, no próprio
+    bloco lido ou, se ele for somente leitura, no buffer de reserva.
+    """
+    if isinstance(saida, SaidaMapeada):
+        return saida.buffer(len(bloco), bloco.dtype)
+    if bloco.flags.writeable:
+        return bloco
+    return reserva[:len(bloco)]
+
+
+def quadros_trabalho(quadros, caminho_ir=None, normalizacao=None):
+    """
+    Trabalho de um arquivo em quadros, a unidade do progresso (ver ControleTrabalho).
+
+    Cada passada sobre o sinal conta os quadros da entrada uma vez; com
+    normalização há duas passadas (a análise e a gravação final).
+
+    Args:
+        quadros (int): Quadros da entrada
+        caminho_ir (str, optional): IR aplicado, se houver
+        normalizacao (str, optional): Como em processar_arquivo
+
+    Returns:
+        int: Quadros de trabalho
+    """
+    normalizacao = normalizacao or ('pico' if caminho_ir else 'nenhuma')
+    return quadros if normalizacao == 'nenhuma' else 2 * quadros
+
+
+def _temporario_da_saida(caminho_saida):
+    """Nome livre na pasta da saída, com a mesma extensão (que define o formato)."""
+    pasta, nome = os.path.split(os.path.abspath(caminho_saida))
+    base, extensao = os.path.splitext(nome)
+    descritor, temporario = tempfile.mkstemp(dir=pasta, prefix=f'.{base}.', suffix=extensao)
+    os.close(descritor)
+    # Recriado pela gravação, com as permissões padrão de um arquivo novo
+    os.remove(temporario)
+    return temporario
+
+
+@contextmanager
+def _abrir_saida(caminho_saida, entrada, canais=None, subtipo=None, mapear=False, quadros=0):
+    """
+    Abre o arquivo de saída com a mesma taxa e, se não informado, os canais da entrada.
+
+    A gravação é feita em um arquivo temporário na pasta da saída, que só
+    substitui caminho_saida (os.replace) se tudo der certo. Se o
+    processamento for cancelado ou falhar, o temporário é removido e uma
+    saída que já existia fica intacta. Uma saída restaurada do cache por
+    link físico também não é alterada no lugar, então o objeto guardado
+    continua valendo.
+
+    Com mapear=True e um WAV em formato mapeável, a saída é criada com
+    `quadros` quadros reservados e gravada por mapeamento de memória.
+    """
+    canais = canais or entrada.channels
+    temporario = _temporario_da_saida(caminho_saida)
+    try:
+        if mapear and pode_mapear_saida(caminho_saida, subtipo):
+            saida = SaidaMapeada(temporario, entrada.samplerate, canais, subtipo, quadros)
+        else:
+            saida = sf.SoundFile(temporario, mode='w', samplerate=entrada.samplerate,
+                                 channels=canais, subtype=subtipo)
+        with saida:
+            yield saida
+        os.replace(temporario, caminho_saida)
+    except BaseException:
+        try:
+            os.remove(temporario)
+        except OSError:
+            pass
+        raise
+
+
+def _abrir_entrada(caminho_entrada, medicao, mapear=False):
+    """Abre a entrada (mapeada, se possível e pedido) e registra seu formato na medição."""
+    with medicao.medir('decodificacao'):
+        entrada = abrir_entrada_mapeada(caminho_entrada) if mapear else None
+        if entrada is None:
+            entrada = sf.SoundFile(caminho_entrada)
+    medicao.quadros = entrada.frames
+    medicao.canais = entrada.channels
+    medicao.taxa_amostragem = entrada.samplerate
+    return entrada
+
+
+class _SaidaNormalizada:
+    """
+    Saída normalizada pelo pico ou pela sonoridade, gravada em duas passadas.
+
+    A normalização precisa do resultado completo: os blocos vão primeiro para
+    um arquivo temporário bruto (na precisão do processamento) enquanto são
+    analisados (pico e, se for o caso, sonoridade integrada; ver
+    AnalisadorSonoridade), e gravar() lê esse arquivo em um buffer
+    reaproveitado, aplica o ganho e grava a saída final. Na normalização por
+    sonoridade o ganho pode levar picos acima do teto, então a segunda
+    passada também passa pelo limitador.
+    """
+
+    def __init__(self, caminho_saida, canais, precisao, medicao, taxa_amostragem,
+                 normalizacao='pico', alvo_lufs=ALVO_SONORIDADE_PADRAO, teto_db=TETO_PADRAO_DB,
+                 picos=None):
+        """
+        Args:
+            caminho_saida (str): Arquivo final; o temporário fica na mesma pasta
+            canais (int): Canais do resultado
+            precisao (str): 'float64' ou 'float32'
+            medicao (MedicaoArquivo): Medição que recebe os tempos
+            taxa_amostragem (int): Taxa de amostragem do resultado
+            normalizacao (str): 'pico' ou 'sonoridade'
+            alvo_lufs (float): Sonoridade alvo do modo 'sonoridade'
+            teto_db (float): Pico máximo da saída, em dBFS
+            picos (ConstrutorPicos, optional): Recebe os blocos da gravação final
+        """
+        self.caminho_saida = caminho_saida
+        self.canais = canais
+        self.precisao = precisao
+        self.medicao = medicao
+        self.taxa_amostragem = taxa_amostragem
+        self.normalizacao = normalizacao
+        self.alvo_lufs = alvo_lufs
+        self.teto_db = teto_db
+        self.picos = picos
+        self.analise = AnalisadorSonoridade(taxa_amostragem, canais,
+                                            sonoridade=normalizacao == 'sonoridade')
+        self.total = 0
+        pasta_saida = os.path.dirname(os.path.abspath(caminho_saida))
+        self._temporario = tempfile.TemporaryFile(dir=pasta_saida)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self._temporario.close()
+
+    def acumular(self, resultado):
+        """Analisa o bloco e o guarda no arquivo temporário."""
+        if not len(resultado):
+            return
+        with self.medicao.medir('dsp'):
+            self.analise.processar(resultado)
+        # O arquivo temporário faz parte da etapa de gravação
+        with self.medicao.medir('codificacao'):
+            resultado.tofile(self._temporario)
+        self.total += len(resultado)
+
+    def gravar(self, entrada, subtipo=None, mapear=False, tamanho_bloco=TAMANHO_BLOCO_FLUXO,
+               profundidade=0, controle=None):
+        """
+        Aplica o ganho de normalização e grava o arquivo final.
+
+        Args:
+            entrada: Arquivo de entrada aberto (define a taxa de amostragem)
+            subtipo (str, optional): Formato de amostra da saída
+            mapear (bool): Se True, grava WAVs por mapeamento de memória
+            tamanho_bloco (int): Quadros gravados por vez
+            profundidade (int): Blocos na fila da thread de gravação (0 grava
+                na thread atual)
+            controle (ControleTrabalho, optional): Recebe o progresso (esta
+                passada vale os quadros da entrada) e pode cancelar a gravação
+        """
+        controle = controle or ControleTrabalho()
+        escala = entrada.frames / self.total if self.total else 0.0
+        with self.medicao.medir('dsp'):
+            ganho = ganho_normalizacao(self.analise, self.normalizacao, self.alvo_lufs,
+                                       self.teto_db)
+        limitador = None
+        if self.normalizacao == 'sonoridade':
+            limitador = LimitadorAntecipado(self.taxa_amostragem, self.canais, self.teto_db,
+                                            dtype=self.precisao)
+        self._temporario.seek(0)
+        with _abrir_saida(self.caminho_saida, entrada, self.canais, subtipo, mapear,
+                          self.total) as saida, \
+                _etapa_gravacao(saida, self.medicao, profundidade) as gravacao:
+            # Com gravação assíncrona, cada buffer só volta a ser usado depois
+            # de gravado: `profundidade` na fila, um em gravação e um em leitura
+            quantidade = 1 if gravacao is saida else profundidade + 2
+            anel = [np.empty((tamanho_bloco, self.canais), dtype=self.precisao)
+                    for _ in range(quantidade)]
+            for indice, inicio in enumerate(range(0, self.total, tamanho_bloco)):
+                buffer = anel[indice % quantidade]
+                bloco = _destino(saida, buffer[:min(tamanho_bloco, self.total - inicio)], buffer)
+                with self.medicao.medir('codificacao'):
+                    self._temporario.readinto(bloco)
+                with self.medicao.medir('dsp'):
+                    bloco *= ganho
+                    if limitador is not None:
+                        bloco = limitador.processar(bloco, saida=bloco)
+                _escrever(gravacao, bloco, self.medicao, self.picos)
+                controle.avancar(len(bloco) * escala)
+            if limitador is not None:
+                with self.medicao.medir('dsp'):
+                    restante = limitador.finalizar()
+                _escrever(gravacao, restante, self.medicao, self.picos)
+
+
+def processar_eco_fluxo(caminho_entrada, caminho_saida, derivacoes, realimentacao=False,
+                        tamanho_bloco=TAMANHO_BLOCO_FLUXO, medicao=None, precisao='float64',
+                        subtipo=None, mapear=True, profundidade=PROFUNDIDADE_PIPELINE,
+                        normalizacao=None, alvo_lufs=ALVO_SONORIDADE_PADRAO,
+                        teto_db=TETO_PADRAO_DB, controle=None, picos=False):
+    """
+    Aplica o eco lendo e gravando o arquivo em blocos.
+
+    A memória usada é limitada pelo tamanho do bloco somado ao maior atraso.
+    Cada bloco é processado sem alocações: no próprio buffer de leitura ou,
+    com saída mapeada, direto na região do arquivo de saída.
+
+    Com profundidade > 0, a decodificação e a gravação rodam em threads
+    próprias ligadas ao DSP por filas limitadas, de modo que a leitura do
+    próximo bloco e a gravação do anterior se sobrepõem ao cálculo do atual
+    (o libsndfile e o numpy liberam o GIL nessas operações).
+
+    Sem normalização (o padrão), a saída passa por um limitador com
+    antecipação (ver LimitadorAntecipado) em vez de ser cortada em ±1.0; com
+    normalização por pico ou sonoridade, o resultado é analisado e gravado
+    em duas passadas (ver _SaidaNormalizada).
+
+    O progresso é informado a cada bloco ao controle, em quadros de trabalho
+    (ver quadros_trabalho); se o trabalho for cancelado, o processamento para
+    no bloco seguinte; a saída parcial é removida e uma saída anterior com o
+    mesmo nome fica intacta.
+
+    Com picos, a mesma passada monta as pirâmides de picos da entrada e da
+    saída (ver PiramidePicos), gravadas ao lado de cada arquivo ou, se picos
+    for uma pasta, nela.
+
+    Args:
+        caminho_entrada (str): Arquivo de áudio de origem
+        caminho_saida (str): Arquivo de áudio a ser criado
+        derivacoes (list): Lista de Derivacao (ou pares atraso_ms, ganho)
+        realimentacao (bool): Se True, o eco se repete até decair abaixo do limiar
+        tamanho_bloco (int): Quadros lidos por vez
+        medicao (MedicaoArquivo, optional): Medição a ser preenchida
+        precisao (str): 'float64' ou 'float32', usada da leitura à gravação
+        subtipo (str, optional): Formato de amostra da saída (ver SUBTIPOS_SAIDA)
+        mapear (bool): Se True, WAVs sem compressão são lidos e gravados por
+            mapeamento de memória; os demais formatos usam o soundfile
+        profundidade (int): Blocos em cada fila entre decodificação, DSP e
+            gravação (0 desativa as threads de leitura e gravação)
+        normalizacao (str, optional): 'nenhuma', 'pico' ou 'sonoridade'. Se
+            None, usa 'nenhuma'.
+        alvo_lufs (float): Sonoridade alvo da normalização 'sonoridade'
+        teto_db (float): Pico máximo da saída, em dBFS
+        controle (ControleTrabalho, optional): Progresso e cancelamento
+        picos (bool or str): Se True, grava os arquivos de picos da entrada e
+            da saída ao lado deles; se for uma pasta, grava-os nela
+
+    Returns:
+        MedicaoArquivo: Tempos por etapa e volume de dados
+
+    Raises:
+        ProcessamentoCancelado: Se o controle for cancelado
+    """
+    validar_formato(precisao, subtipo)
+    normalizacao = normalizacao or 'nenhuma'
+    validar_normalizacao(normalizacao)
+    medicao = medicao or MedicaoArquivo(caminho_entrada, caminho_saida)
+    controle = controle or ControleTrabalho()
+    if normalizacao != 'nenhuma':
+        return _processar_eco_normalizado(caminho_entrada, caminho_saida, derivacoes,
+                                          realimentacao, tamanho_bloco, medicao, precisao,
+                                          subtipo, mapear, profundidade, normalizacao,
+                                          alvo_lufs, teto_db, controle, picos)
+    with _abrir_entrada(caminho_entrada, medicao, mapear) as entrada:
+        controle.iniciar(quadros_trabalho(entrada.frames, normalizacao=normalizacao))
+        picos_entrada, picos_saida = _construtores_picos(picos, entrada)
+        processador = ProcessadorAtraso(entrada.samplerate, derivacoes, entrada.channels,
+                                        realimentacao=realimentacao, dtype=precisao)
+        limitador = LimitadorAntecipado(entrada.samplerate, entrada.channels, teto_db,
+                                        dtype=precisao)
+        reserva = np.empty((tamanho_bloco, entrada.channels), dtype=precisao)
+        quadros = entrada.frames + processador.maior_atraso
+        with _abrir_saida(caminho_saida, entrada, subtipo=subtipo, mapear=mapear,
+                          quadros=quadros) as saida, \
+                _etapa_gravacao(saida, medicao, profundidade) as gravacao, \
+                _etapa_leitura(entrada, tamanho_bloco, medicao, precisao, profundidade,
+                               picos_entrada) as blocos:
+            for bloco in blocos:
+                with medicao.medir('dsp'):
+                    destino = processador.processar(bloco, saida=_destino(saida, bloco, reserva))
+                    destino = limitador.processar(destino, saida=destino)
+                _escrever(gravacao, destino, medicao, picos_saida)
+                controle.avancar(len(bloco))
+            with medicao.medir('dsp'):
+                resultado = processador.finalizar()
+                resultado = limitador.processar(resultado, saida=resultado)
+            _escrever(gravacao, resultado, medicao, picos_saida)
+            with medicao.medir('dsp'):
+                resultado = limitador.finalizar()
+            _escrever(gravacao, resultado, medicao, picos_saida)
+        _salvar_picos(picos, picos_entrada, picos_saida, caminho_entrada, caminho_saida,
+                      entrada)
+    controle.concluir()
+    return medicao.finalizar()
+
+
+def _processar_eco_normalizado(caminho_entrada, caminho_saida, derivacoes, realimentacao,
+                               tamanho_bloco, medicao, precisao, subtipo, mapear, profundidade,
+                               normalizacao, alvo_lufs, teto_db, controle, picos):
+    """Eco com normalização por pico ou sonoridade (ver processar_eco_fluxo)."""
+    with _abrir_entrada(caminho_entrada, medicao, mapear) as entrada:
+        controle.iniciar(quadros_trabalho(entrada.frames, normalizacao=normalizacao))
+        picos_entrada, picos_saida = _construtores_picos(picos, entrada)
+        processador = ProcessadorAtraso(entrada.samplerate, derivacoes, entrada.channels,
+                                        realimentacao=realimentacao, dtype=precisao)
+        with _SaidaNormalizada(caminho_saida, entrada.channels, precisao, medicao,
+                               entrada.samplerate, normalizacao, alvo_lufs,
+                               teto_db, picos_saida) as normalizada:
+            with _etapa_leitura(entrada, tamanho_bloco, medicao, precisao, profundidade,
+                                picos_entrada) as blocos:
+                for bloco in blocos:
+                    with medicao.medir('dsp'):
+                        if not bloco.flags.writeable:
+                            bloco = bloco.copy()
+                        resultado = processador.processar(bloco, saida=bloco)
+                    normalizada.acumular(resultado)
+                    controle.avancar(len(resultado))
+            with medicao.medir('dsp'):
+                resultado = processador.finalizar()
+            normalizada.acumular(resultado)
+            normalizada.gravar(entrada, subtipo, mapear, tamanho_bloco, profundidade, controle)
+        _salvar_picos(picos, picos_entrada, picos_saida, caminho_entrada, caminho_saida,
+                      entrada)
+    controle.concluir()
+    return medicao.finalizar()
+
+
+def processar_impulso_fluxo(caminho_entrada, caminho_saida, caminho_ir, banco=None,
+                            tamanho_bloco=TAMANHO_BLOCO_FLUXO, medicao=None, precisao='float64',
+                            subtipo=None, mapear=True, profundidade=PROFUNDIDADE_PIPELINE,
+                            normalizacao=None, alvo_lufs=ALVO_SONORIDADE_PADRAO,
+                            teto_db=TETO_PADRAO_DB, controle=None, picos=False):
+    """
+    Convolve o arquivo com uma resposta de impulso lendo e gravando em blocos.
+
+    Por padrão o resultado é normalizado pelo pico em duas passadas, por um
+    arquivo temporário (ver _SaidaNormalizada); com normalizacao='nenhuma'
+    ele é gravado numa passada só, pelo limitador com antecipação. A memória
+    usada é limitada pelo tamanho do bloco somado ao comprimento do IR. Se
+    profundidade > 0, a decodificação e a gravação final rodam em threads
+    próprias, como em processar_eco_fluxo; o progresso, o cancelamento e os
+    arquivos de picos também seguem processar_eco_fluxo.
+
+    IRs multicanal são aplicados conforme mapa_canais; a saída pode ter mais
+    canais que a entrada (por exemplo, fonte mono com IR estéreo).
+
+    Args:
+        caminho_entrada (str): Arquivo de áudio de origem
+        caminho_saida (str): Arquivo de áudio a ser criado
+        caminho_ir (str): Arquivo da resposta de impulso
+        banco (BancoIR, optional): Banco de IRs. Se None, usa o banco do processo.
+        tamanho_bloco (int): Quadros lidos por vez
+        medicao (MedicaoArquivo, optional): Medição a ser preenchida
+        precisao (str): 'float64' ou 'float32', usada da leitura à gravação
+        subtipo (str, optional): Formato de amostra da saída (ver SUBTIPOS_SAIDA)
+        mapear (bool): Se True, WAVs sem compressão são lidos e gravados por
+            mapeamento de memória; os demais formatos usam o soundfile
+        profundidade (int): Blocos em cada fila entre decodificação, DSP e
+            gravação (0 desativa as threads de leitura e gravação)
+        normalizacao (str, optional): 'nenhuma', 'pico' ou 'sonoridade'. Se
+            None, usa 'pico'.
+        alvo_lufs (float): Sonoridade alvo da normalização 'sonoridade'
+        teto_db (float): Pico máximo da saída, em dBFS
+        controle (ControleTrabalho, optional): Progresso e cancelamento
+        picos (bool or str): Se True, grava os arquivos de picos da entrada e
+            da saída ao lado deles; se for uma pasta, grava-os nela
+
+    Returns:
+        MedicaoArquivo: Tempos por etapa e volume de dados
+
+    Raises:
+        ProcessamentoCancelado: Se o controle for cancelado
+    """
+    validar_formato(precisao, subtipo)
+    normalizacao = normalizacao or 'pico'
+    validar_normalizacao(normalizacao)
+    medicao = medicao or MedicaoArquivo(caminho_entrada, caminho_saida)
+    banco = banco or banco_padrao()
+    controle = controle or ControleTrabalho()
+    with _abrir_entrada(caminho_entrada, medicao, mapear) as entrada:
+        controle.iniciar(quadros_trabalho(entrada.frames, caminho_ir, normalizacao))
+        picos_entrada, picos_saida = _construtores_picos(picos, entrada)
+        with medicao.medir('decodificacao'):
+            impulso = banco.obter(caminho_ir, entrada.samplerate, precisao)
+        tamanho_particao, espectros = impulso.espectros(dtype=precisao)
+        convolvedor = ConvolvedorParticionado(impulso.dados, entrada.channels, tamanho_particao,
+                                              dtype=precisao, espectros=espectros)
+        if normalizacao == 'nenhuma':
+            _gravar_impulso_limitado(entrada, convolvedor, len(impulso.dados), caminho_saida,
+                                     tamanho_bloco, medicao, precisao, subtipo, mapear,
+                                     profundidade, teto_db, controle, picos_entrada, picos_saida)
+            _salvar_picos(picos, picos_entrada, picos_saida, caminho_entrada, caminho_saida,
+                          entrada)
+            controle.concluir()
+            return medicao.finalizar()
+
+        with _SaidaNormalizada(caminho_saida, convolvedor.canais_saida, precisao, medicao,
+                               entrada.samplerate, normalizacao, alvo_lufs,
+                               teto_db, picos_saida) as normalizada:
+            with _etapa_leitura(entrada, tamanho_bloco, medicao, precisao, profundidade,
+                                picos_entrada) as blocos:
+                for bloco in blocos:
+                    with medicao.medir('dsp'):
+                        resultado = convolvedor.processar(bloco)
+                    normalizada.acumular(resultado)
+                    controle.avancar(len(bloco))
+            with medicao.medir('dsp'):
+                resultado = convolvedor.finalizar()
+            normalizada.acumular(resultado)
+            normalizada.gravar(entrada, subtipo, mapear, tamanho_bloco, profundidade, controle)
+        _salvar_picos(picos, picos_entrada, picos_saida, caminho_entrada, caminho_saida,
+                      entrada)
+    controle.concluir()
+    return medicao.finalizar()
+
+
+def _gravar_impulso_limitado(entrada, convolvedor, comprimento_ir, caminho_saida, tamanho_bloco,
+                             medicao, precisao, subtipo, mapear, profundidade, teto_db,
+                             controle, picos_entrada, picos_saida):
+    """Convolução gravada numa passada só, pelo limitador (normalizacao='nenhuma')."""
+    limitador = LimitadorAntecipado(entrada.samplerate, convolvedor.canais_saida, teto_db,
+                                    dtype=precisao)
+    quadros = entrada.frames + comprimento_ir - 1
+    with _abrir_saida(caminho_saida, entrada, convolvedor.canais_saida, subtipo, mapear,
+                      quadros) as saida, \
+            _etapa_gravacao(saida, medicao, profundidade) as gravacao, \
+            _etapa_leitura(entrada, tamanho_bloco, medicao, precisao, profundidade,
+                           picos_entrada) as blocos:
+        for bloco in blocos:
+            with medicao.medir('dsp'):
+                resultado = convolvedor.processar(bloco)
+                resultado = limitador.processar(resultado, saida=resultado)
+            _escrever(gravacao, resultado, medicao, picos_saida)
+            controle.avancar(len(bloco))
+        with medicao.medir('dsp'):
+            resultado = convolvedor.finalizar()
+            resultado = limitador.processar(resultado, saida=resultado)
+        _escrever(gravacao, resultado, medicao, picos_saida)
+        with medicao.medir('dsp'):
+            resultado = limitador.finalizar()
+        _escrever(gravacao, resultado, medicao, picos_saida)
+
+
+def processar_arquivo(caminho_entrada, caminho_saida, atraso_ms, decaimento,
+                      realimentacao=False, caminho_ir=None, banco=None,
+                      tamanho_bloco=TAMANHO_BLOCO_FLUXO, medicao=None, precisao='float64',
+                      subtipo=None, mapear=True, profundidade=PROFUNDIDADE_PIPELINE,
+                      normalizacao=None, alvo_lufs=ALVO_SONORIDADE_PADRAO,
+                      teto_db=TETO_PADRAO_DB, controle=None, picos=False):
+    """
+    Processa um arquivo com eco ou resposta de impulso, em modo contínuo.
+
+    Args:
+        caminho_entrada (str): Arquivo de áudio de origem
+        caminho_saida (str): Arquivo de áudio a ser criado
+        atraso_ms (int): Atraso do eco em milissegundos
+        decaimento (float): Fator de decaimento do eco (0.0 a 1.0)
+        realimentacao (bool): Se True, o eco se repete até decair abaixo do limiar
+        caminho_ir (str, optional): Se informado, aplica esta resposta de impulso
+            em vez do eco
+        banco (BancoIR, optional): Banco de IRs usado com caminho_ir
+        tamanho_bloco (int): Quadros lidos por vez
+        medicao (MedicaoArquivo, optional): Medição a ser preenchida
+        precisao (str): 'float64' ou 'float32', usada da leitura à gravação
+        subtipo (str, optional): Formato de amostra da saída (ver SUBTIPOS_SAIDA)
+        mapear (bool): Se True, WAVs sem compressão usam mapeamento de memória
+        profundidade (int): Blocos em cada fila entre decodificação, DSP e
+            gravação (0 desativa as threads de leitura e gravação)
+        normalizacao (str, optional): 'nenhuma', 'pico' ou 'sonoridade'. Se
+            None, o eco só passa pelo limitador e o IR é normalizado pelo pico.
+        alvo_lufs (float): Sonoridade alvo da normalização 'sonoridade'
+        teto_db (float): Pico máximo da saída, em dBFS
+        controle (ControleTrabalho, optional): Recebe o progresso a cada bloco
+            e permite cancelar o processamento (a saída parcial é removida)
+        picos (bool or str): Se True, monta na mesma passada as pirâmides de
+            picos da entrada e da saída e as grava ao lado dos arquivos; se for
+            uma pasta, grava-as nela, sem tocar na pasta dos arquivos (ver
+            picos_arquivo e pasta_cache_picos)
+
+    Returns:
+        MedicaoArquivo: Tempos por etapa e volume de dados
+
+    Raises:
+        ProcessamentoCancelado: Se o controle for cancelado
+    """
+    dinamica = dict(normalizacao=normalizacao, alvo_lufs=alvo_lufs, teto_db=teto_db,
+                    controle=controle, picos=picos)
+    if caminho_ir:
+        return processar_impulso_fluxo(caminho_entrada, caminho_saida, caminho_ir, banco,
+                                       tamanho_bloco, medicao, precisao, subtipo, mapear,
+                                       profundidade, **dinamica)
+    return processar_eco_fluxo(caminho_entrada, caminho_saida, [Derivacao(atraso_ms, decaimento)],
+                               realimentacao, tamanho_bloco, medicao, precisao, subtipo, mapear,
+                               profundidade, **dinamica)
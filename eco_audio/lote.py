@@ -0,0 +1,385 @@
+"""Processamento em lote com pool de processos, orçamento de memória e prioridade por tamanho."""
+
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import soundfile as sf
+
+from .atraso import ms_para_amostras
+from .controle import ControleTrabalho, ProcessamentoCancelado
+from .convolucao import QUADROS_POR_LOTE, escolher_tamanho_bloco
+from .fluxo import PROFUNDIDADE_PIPELINE, TAMANHO_BLOCO_FLUXO, processar_arquivo, quadros_trabalho
+from .metricas import MedicaoArquivo
+
+# Um arquivo a ser processado e o arquivo de saída correspondente
+Tarefa = namedtuple('Tarefa', ['caminho_entrada', 'caminho_saida'])
+
+# Orçamento usado quando não é possível consultar a memória física
+LIMITE_MEMORIA_PADRAO = 1024 * 1024 * 1024
+
+# Bytes por amostra das amostras do IR em cache (sempre float64)
+_BYTES_IR = 8
+
+# Controle do processo trabalhador, definido por _iniciar_trabalhador
+_controle_trabalhador = None
+
+
+def memoria_disponivel():
+    """
+    Estima a memória que o lote pode usar: metade da memória física.
+
+    Returns:
+        int: Orçamento de memória em bytes
+    """
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // 2
+    except (AttributeError, ValueError, OSError):
+        return LIMITE_MEMORIA_PADRAO
+
+
+def estimar_memoria(info, parametros, info_ir=None, tamanho_bloco=TAMANHO_BLOCO_FLUXO):
+    """
+    Estima o pico de memória do processamento contínuo de um arquivo.
+
+    Args:
+        info: Resultado de soundfile.info para o arquivo de entrada
+        parametros (dict): Parâmetros passados a processar_arquivo
+        info_ir: Resultado de soundfile.info para o IR, se houver
+        tamanho_bloco (int): Quadros lidos por vez
+
+    Returns:
+        int: Estimativa em bytes
+    """
+    canais = info.channels
+    # Bytes por amostra e por bin complexo na precisão do processamento
+    bytes_real = np.dtype(parametros.get('precisao', 'float64')).itemsize
+    bytes_complexo = 2 * bytes_real
+    # Bloco lido (processado no lugar), linha de atraso e buffer auxiliar
+    total = 3 * tamanho_bloco * canais * bytes_real
+    # Anel de buffers das threads de leitura e gravação (ver fluxo._LeitorAntecipado)
+    profundidade = parametros.get('profundidade', PROFUNDIDADE_PIPELINE)
+    if profundidade > 0:
+        total += (2 * profundidade + 3) * tamanho_bloco * canais * bytes_real
+
+    if info_ir is None:
+        atraso = ms_para_amostras(parametros['atraso_ms'], info.samplerate)
+        total += 2 * atraso * canais * bytes_real
+        return total
+
+    tamanho_ir = int(info_ir.frames * info.samplerate / info_ir.samplerate) + 1
+    canais_ir = info_ir.channels
+    # Limite superior dos canais de saída (ver mapa_canais)
+    canais_saida = max(canais, canais_ir)
+    particao = escolher_tamanho_bloco(tamanho_ir)
+    particoes = -(-tamanho_ir // particao)
+    # IR em cache e espectros das partições (compartilhados entre tarefas do processo)
+    total += (tamanho_ir * _BYTES_IR + particoes * (particao + 1) * bytes_complexo) * canais_ir
+    # Linha de atraso de espectros da entrada
+    total += particoes * (particao + 1) * canais * bytes_complexo
+    # Quadros e espectros de um lote de blocos da convolução
+    quadros_lote = max(QUADROS_POR_LOTE, particao * max(canais, canais_saida))
+    total += 2 * quadros_lote * bytes_real + 2 * quadros_lote * bytes_complexo
+    return total
+
+
+class _ControleTrabalhador(ControleTrabalho):
+    """
+    Controle usado dentro do processo trabalhador.
+
+    Soma os quadros concluídos em um contador compartilhado com o processo
+    principal e consulta um evento de cancelamento compartilhado, de modo
+    que o lote acompanha e cancela os arquivos em andamento bloco a bloco.
+    """
+
+    def __init__(self, cancelamento, contador):
+        super().__init__()
+        self._cancelamento = cancelamento
+        self._contador = contador
+
+    def iniciar(self, total):
+        self.total = total
+
+    def registrar(self, quadros):
+        with self._contador.get_lock():
+            self._contador.value += quadros
+
+    def concluir(self):
+        pass
+
+
+def _iniciar_trabalhador(cancelamento, contador):
+    """Inicializador do pool: cria o controle compartilhado do processo."""
+    global _controle_trabalhador
+    _controle_trabalhador = _ControleTrabalhador(cancelamento, contador)
+
+
+def _processar_tarefa(tarefa, parametros, enfileirada_em):
+    """Processa uma tarefa no processo trabalhador e retorna sua medição."""
+    medicao = MedicaoArquivo(tarefa.caminho_entrada, tarefa.caminho_saida)
+    # Relógio de parede, comparável entre processos
+    medicao.espera_fila_s = max(0.0, time.time() - enfileirada_em)
+    processar_arquivo(tarefa.caminho_entrada, tarefa.caminho_saida, medicao=medicao,
+                      controle=_controle_trabalhador, **parametros)
+    return medicao.como_dict()
+
+
+class ProgressoLote:
+    """Contadores de progresso do lote, seguros para leitura de outras threads."""
+
+    def __init__(self, total):
+        self._trava = threading.Lock()
+        self.total = total
+        self.processados = 0
+        self.reaproveitados = 0
+        self.cancelados = 0
+        self.erros = []
+
+    def registrar(self, erro=None, reaproveitado=False, cancelado=False):
+        """Conta um arquivo concluído, com ou sem erro (ou restaurado do cache, ou cancelado)."""
+        with self._trava:
+            self.processados += 1
+            if reaproveitado:
+                self.reaproveitados += 1
+            if cancelado:
+                self.cancelados += 1
+            if erro:
+                self.erros.append(erro)
+
+    def abortar(self, erro):
+        """Marca todos os arquivos restantes como concluídos com o erro informado."""
+        with self._trava:
+            self.processados = self.total
+            self.erros.append(erro)
+
+    def resumo(self):
+        """
+        Returns:
+            dict: Cópia de total, processados, reaproveitados do cache,
+                cancelados e erros
+        """
+        with self._trava:
+            return {
+                'total': self.total,
+                'processados': self.processados,
+                'reaproveitados': self.reaproveitados,
+                'cancelados': self.cancelados,
+                'erros': list(self.erros),
+            }
+
+
+class MotorLote:
+    """
+    Executa tarefas em um pool de processos respeitando um orçamento de memória.
+
+    As tarefas são ordenadas da maior para a menor duração, para que o lote não
+    termine esperando um único arquivo longo, e só são enviadas ao pool enquanto
+    a soma das estimativas de memória das tarefas em andamento couber no limite.
+    """
+
+    def __init__(self, trabalhadores=None, limite_memoria=None):
+        """
+        Args:
+            trabalhadores (int, optional): Número de processos. Se None, usa o
+                número de CPUs.
+            limite_memoria (int, optional): Orçamento em bytes. Se None, usa
+                metade da memória física.
+        """
+        self.trabalhadores = trabalhadores or os.cpu_count() or 1
+        self.limite_memoria = limite_memoria or memoria_disponivel()
+
+    def planejar(self, tarefas, parametros, progresso):
+        """
+        Lê o cabeçalho de cada arquivo e ordena as tarefas da maior para a menor.
+
+        Arquivos que não podem ser lidos são registrados como erro no progresso;
+        se o IR não puder ser lido, todas as tarefas são.
+
+        Returns:
+            list: Triplas (memória estimada, quadros de trabalho, tarefa), do
+                maior arquivo para o menor
+        """
+        info_ir = None
+        if parametros.get('caminho_ir'):
+            try:
+                info_ir = sf.info(parametros['caminho_ir'])
+            except Exception as e:
+                erro = f"IR ilegível ({os.path.basename(parametros['caminho_ir'])}): {e}"
+                for tarefa in tarefas:
+                    progresso.registrar(_mensagem_erro(tarefa, erro))
+                return []
+        planejadas = []
+        for tarefa in tarefas:
+            try:
+                info = sf.info(tarefa.caminho_entrada)
+            except Exception as e:
+                progresso.registrar(_mensagem_erro(tarefa, e))
+                continue
+            memoria = estimar_memoria(info, parametros, info_ir)
+            quadros = quadros_trabalho(info.frames, parametros.get('caminho_ir'),
+                                       parametros.get('normalizacao'))
+            planejadas.append((info.frames * info.channels, memoria, quadros, tarefa))
+        planejadas.sort(key=lambda item: item[0], reverse=True)
+        return [(memoria, quadros, tarefa) for _, memoria, quadros, tarefa in planejadas]
+
+    def executar(self, tarefas, parametros, progresso=None, ao_medir=None, cache=None,
+                 controle=None):
+        """
+        Processa as tarefas e aguarda a conclusão de todas.
+
+        Com um cache, as tarefas cujo resultado já está guardado são
+        restauradas dele sem passar pelo pool, e as saídas novas são guardadas.
+
+        Com um controle, o progresso é informado em quadros de trabalho dos
+        arquivos a processar, somando os blocos concluídos em cada processo.
+        Cancelar o controle interrompe os arquivos em andamento no bloco
+        seguinte (suas saídas parciais são removidas) e descarta os que ainda
+        não começaram; todos são contados como cancelados no progresso.
+
+        Args:
+            tarefas (list): Lista de Tarefa
+            parametros (dict): Argumentos nomeados de processar_arquivo
+                (atraso_ms, decaimento, realimentacao, caminho_ir)
+            progresso (ProgressoLote, optional): Contadores atualizados durante
+                a execução. Se None, um novo é criado.
+            ao_medir (callable, optional): Recebe o dict de medição de cada
+                arquivo concluído com sucesso (ver MedicaoArquivo.como_dict),
+                incluindo o tempo de espera na fila.
+            cache (CacheResultados, optional): Cache de resultados
+            controle (ControleTrabalho, optional): Progresso e cancelamento
+
+        Returns:
+            ProgressoLote: Progresso final, com os erros de cada arquivo
+        """
+        tarefas = [Tarefa(*tarefa) for tarefa in tarefas]
+        progresso = progresso or ProgressoLote(len(tarefas))
+        controle = controle or ControleTrabalho()
+        if cache is not None:
+            tarefas = [tarefa for tarefa in tarefas
+                       if not restaurar_do_cache(cache, tarefa, parametros, progresso)]
+        try:
+            self._executar_pool(tarefas, parametros, progresso, ao_medir, cache, controle)
+        finally:
+            if cache is not None:
+                cache.salvar()
+        if not controle.cancelado:
+            controle.concluir()
+        return progresso
+
+    def _executar_pool(self, tarefas, parametros, progresso, ao_medir, cache, controle):
+        """Envia as tarefas ao pool de processos respeitando o orçamento de memória."""
+        enfileiradas_em = time.time()
+        pendentes = deque(self.planejar(tarefas, parametros, progresso))
+        controle.iniciar(sum(quadros for _, quadros, _ in pendentes))
+        if not pendentes:
+            return
+
+        # 'spawn' evita herdar threads e estado da interface gráfica no fork
+        contexto = multiprocessing.get_context('spawn')
+        # Compartilhados com os trabalhadores: pedido de cancelamento e quadros concluídos
+        cancelamento = contexto.Event()
+        contador = contexto.Value('d', 0.0)
+        informados = 0.0
+        trabalhadores = min(self.trabalhadores, len(pendentes))
+        em_andamento = {}
+        memoria_em_uso = 0
+        executor = self._criar_pool(contexto, trabalhadores, cancelamento, contador)
+        try:
+            while pendentes or em_andamento:
+                if controle.cancelado and not cancelamento.is_set():
+                    # Os trabalhadores param no próximo bloco; o resto nem começa
+                    cancelamento.set()
+                    while pendentes:
+                        pendentes.popleft()
+                        progresso.registrar(cancelado=True)
+
+                # Admite a próxima tarefa enquanto houver vaga e memória; sem nada
+                # em andamento, admite mesmo acima do limite para não travar
+                while pendentes and len(em_andamento) < trabalhadores:
+                    memoria, _, tarefa = pendentes[0]
+                    if em_andamento and memoria_em_uso + memoria > self.limite_memoria:
+                        break
+                    pendentes.popleft()
+                    try:
+                        futuro = executor.submit(_processar_tarefa, tarefa, parametros,
+                                                 enfileiradas_em)
+                    except BrokenProcessPool as e:
+                        # As tarefas em andamento no pool quebrado falham pelos futuros
+                        progresso.registrar(_mensagem_erro(tarefa, e))
+                        executor = self._recriar_pool(executor, contexto, trabalhadores,
+                                                      cancelamento, contador)
+                        continue
+                    em_andamento[futuro] = (memoria, tarefa, executor)
+                    memoria_em_uso += memoria
+
+                # Acorda a cada intervalo de progresso para repassar os quadros
+                # concluídos e atender a um cancelamento
+                concluidos, _ = wait(em_andamento, timeout=controle.intervalo_s,
+                                     return_when=FIRST_COMPLETED)
+                with contador.get_lock():
+                    feitos = contador.value
+                controle.registrar(feitos - informados)
+                informados = feitos
+                for futuro in concluidos:
+                    memoria, tarefa, origem = em_andamento.pop(futuro)
+                    memoria_em_uso -= memoria
+                    erro = futuro.exception()
+                    if origem is executor and isinstance(erro, BrokenProcessPool):
+                        executor = self._recriar_pool(executor, contexto, trabalhadores,
+                                                      cancelamento, contador)
+                    if isinstance(erro, ProcessamentoCancelado):
+                        progresso.registrar(cancelado=True)
+                        continue
+                    if erro is None and cache is not None:
+                        guardar_no_cache(cache, tarefa, parametros)
+                    progresso.registrar(_mensagem_erro(tarefa, erro) if erro else None)
+                    if erro is None and ao_medir is not None:
+                        ao_medir(futuro.result())
+        finally:
+            executor.shutdown(wait=True)
+
+    @staticmethod
+    def _criar_pool(contexto, trabalhadores, cancelamento, contador):
+        """Cria o pool de processos ligado ao cancelamento e ao contador compartilhados."""
+        return ProcessPoolExecutor(max_workers=trabalhadores, mp_context=contexto,
+                                   initializer=_iniciar_trabalhador,
+                                   initargs=(cancelamento, contador))
+
+    def _recriar_pool(self, executor, contexto, trabalhadores, cancelamento, contador):
+        """
+        Substitui um pool quebrado.
+
+        Um processo trabalhador que morre (por exemplo, pelo OOM killer)
+        inutiliza o pool inteiro: as tarefas que estavam nele falham e as
+        restantes seguem em um pool novo.
+        """
+        executor.shutdown(wait=False, cancel_futures=True)
+        return self._criar_pool(contexto, trabalhadores, cancelamento, contador)
+
+def restaurar_do_cache(cache, tarefa, parametros, progresso):
+    """Restaura a saída da tarefa do cache; falhas de leitura ficam para o processamento."""
+    try:
+        restaurada = cache.restaurar(tarefa, parametros)
+    except OSError:
+        return False
+    if restaurada:
+        progresso.registrar(reaproveitado=True)
+    return restaurada
+
+
+def guardar_no_cache(cache, tarefa, parametros):
+    """Guarda a saída no cache; um erro do cache não invalida o arquivo já gerado."""
+    try:
+        cache.guardar(tarefa, parametros)
+    except OSError:
+        pass
+
+
+def _mensagem_erro(tarefa, erro):
+    """Formata a mensagem de erro de uma tarefa."""
+    return f"Erro ao processar {os.path.basename(tarefa.caminho_entrada)}: {str(erro)}"
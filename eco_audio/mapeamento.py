@@ -0,0 +1,321 @@
+"""Leitura e gravação de WAV/RF64 sem compressão por mapeamento de memória."""
+
+import mmap
+import os
+import struct
+
+import numpy as np
+
+# Códigos de formato do chunk 'fmt '
+_FORMATO_PCM = 0x0001
+_FORMATO_FLOAT = 0x0003
+_FORMATO_EXTENSIVEL = 0xFFFE
+
+# Tipos de amostra mapeáveis: (código de formato, bits) -> (dtype, subtipo do soundfile)
+_TIPOS = {
+    (_FORMATO_PCM, 8): ('u1', 'PCM_U8'),
+    (_FORMATO_PCM, 16): ('<i2', 'PCM_16'),
+    (_FORMATO_PCM, 32): ('<i4', 'PCM_32'),
+    (_FORMATO_FLOAT, 32): ('<f4', 'FLOAT'),
+    (_FORMATO_FLOAT, 64): ('<f8', 'DOUBLE'),
+}
+
+# Subtipos que a saída mapeada sabe gravar: subtipo -> (código de formato, bits, dtype)
+SUBTIPOS_MAPEAVEIS = {
+    'PCM_16': (_FORMATO_PCM, 16, '<i2'),
+    'PCM_32': (_FORMATO_PCM, 32, '<i4'),
+    'FLOAT': (_FORMATO_FLOAT, 32, '<f4'),
+    'DOUBLE': (_FORMATO_FLOAT, 64, '<f8'),
+}
+
+# RIFF (12) + JUNK/ds64 (8 + 28) + fmt (8 + 16) + cabeçalho do data (8)
+_TAMANHO_CABECALHO = 80
+_LIMITE_RIFF = 0xFFFFFFFF
+
+
+def _escala_inteiro(dtype):
+    """Fator que leva o inteiro com sinal a [-1.0, 1.0), como o soundfile faz na leitura."""
+    return float(1 << (8 * np.dtype(dtype).itemsize - 1))
+
+
+def _ler_cabecalho(arquivo, tamanho_arquivo):
+    """
+    Localiza o formato e o chunk de dados de um WAV/RF64.
+
+    Returns:
+        tuple: (código, canais, taxa, bits, início dos dados, bytes de dados),
+        ou None se o arquivo não for um WAV/RF64 reconhecido
+    """
+    inicio = arquivo.read(12)
+    if len(inicio) < 12 or inicio[:4] not in (b'RIFF', b'RF64') or inicio[8:12] != b'WAVE':
+        return None
+    tamanho_ds64 = None
+    formato = None
+    posicao = 12
+    while posicao + 8 <= tamanho_arquivo:
+        arquivo.seek(posicao)
+        identificador, tamanho = struct.unpack('<4sI', arquivo.read(8))
+        if identificador == b'ds64':
+            _, tamanho_ds64 = struct.unpack('<QQ', arquivo.read(16))
+        elif identificador == b'fmt ':
+            codigo, canais, taxa, _, _, bits = struct.unpack('<HHIIHH', arquivo.read(16))
+            if codigo == _FORMATO_EXTENSIVEL and tamanho >= 40:
+                arquivo.read(8)
+                codigo = struct.unpack('<H', arquivo.read(2))[0]
+            formato = (codigo, canais, taxa, bits)
+        elif identificador == b'data':
+            if formato is None:
+                return None
+            if tamanho == _LIMITE_RIFF and tamanho_ds64 is not None:
+                tamanho = tamanho_ds64
+            # Arquivos gravados em fluxo podem ter o tamanho zerado ou maior que o real
+            disponivel = tamanho_arquivo - (posicao + 8)
+            if tamanho == 0 or tamanho > disponivel:
+                tamanho = disponivel
+            return formato + (posicao + 8, tamanho)
+        posicao += 8 + tamanho + (tamanho & 1)
+    return None
+
+
+class EntradaMapeada:
+    """
+    WAV/RF64 sem compressão com as amostras mapeadas em memória.
+
+    Oferece o subconjunto da interface de soundfile.SoundFile usado pelo
+    processamento contínuo. Quando o tipo das amostras já é o tipo pedido,
+    read() retorna uma visão somente leitura do próprio mapa, sem cópia; nos
+    demais casos converte direto do mapa para o buffer informado. As páginas
+    já lidas ficam no cache do sistema e podem ser descartadas a qualquer
+    momento, então arquivos maiores que a memória não usam swap.
+    """
+
+    def __init__(self, caminho, cabecalho):
+        codigo, canais, taxa, bits, inicio, tamanho = cabecalho
+        self.name = caminho
+        self.samplerate = taxa
+        self.channels = canais
+        self.dtype, self.subtype = _TIPOS[(codigo, bits)]
+        largura = np.dtype(self.dtype).itemsize * canais
+        self.frames = tamanho // largura
+        self._posicao = 0
+        if self.frames:
+            self._mapa = np.memmap(caminho, dtype=self.dtype, mode='r', offset=inicio,
+                                   shape=(self.frames, canais))
+            if hasattr(self._mapa, '_mmap') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                self._mapa._mmap.madvise(mmap.MADV_SEQUENTIAL)
+        else:
+            self._mapa = np.zeros((0, canais), dtype=self.dtype)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.close()
+
+    def close(self):
+        """Libera o mapeamento."""
+        self._mapa = None
+
+    def seek(self, quadro):
+        """Posiciona a leitura no quadro informado."""
+        self._posicao = min(max(int(quadro), 0), self.frames)
+        return self._posicao
+
+    def read(self, frames=-1, dtype='float64', always_2d=True, out=None):
+        """
+        Lê os próximos quadros convertidos para ponto flutuante.
+
+        Args:
+            frames (int): Quadros a ler (-1 lê até o fim ou até encher out)
+            dtype (str): 'float64' ou 'float32'
+            always_2d (bool): Mantido por compatibilidade; o resultado é sempre 2-D
+            out (numpy.ndarray, optional): Buffer (quadros, canais) para a conversão
+
+        Returns:
+            numpy.ndarray: Quadros lidos; uma visão somente leitura do mapa
+            quando não há conversão a fazer
+        """
+        if frames < 0:
+            frames = len(out) if out is not None else self.frames - self._posicao
+        quantidade = min(frames, self.frames - self._posicao)
+        origem = self._mapa[self._posicao:self._posicao + quantidade]
+        self._posicao += quantidade
+
+        dtype = np.dtype(dtype)
+        if origem.dtype == dtype:
+            visao = np.asarray(origem).view(np.ndarray)
+            visao.flags.writeable = False
+            return visao
+        destino = out[:quantidade] if out is not None else np.empty((quantidade, self.channels), dtype)
+        if origem.dtype.kind == 'f':
+            destino[:] = origem
+        elif origem.dtype.kind == 'u':
+            np.subtract(origem, 128, out=destino, dtype=dtype)
+            destino *= 1.0 / 128
+        else:
+            np.multiply(origem, 1.0 / _escala_inteiro(origem.dtype), out=destino, dtype=dtype)
+        return destino
+
+
+def abrir_entrada_mapeada(caminho):
+    """
+    Abre um WAV/RF64 sem compressão por mapeamento de memória.
+
+    Args:
+        caminho (str): Arquivo de áudio
+
+    Returns:
+        EntradaMapeada: Arquivo mapeado, ou None se o formato não puder ser
+        mapeado (compressão, PCM de 24 bits, outro contêiner)
+    """
+    try:
+        tamanho_arquivo = os.path.getsize(caminho)
+        with open(caminho, 'rb') as arquivo:
+            cabecalho = _ler_cabecalho(arquivo, tamanho_arquivo)
+    except (OSError, struct.error):
+        return None
+    if cabecalho is None or (cabecalho[0], cabecalho[3]) not in _TIPOS or not cabecalho[1]:
+        return None
+    return EntradaMapeada(caminho, cabecalho)
+
+
+class SaidaMapeada:
+    """
+    WAV gravado diretamente em um arquivo mapeado em memória.
+
+    O arquivo é criado já com o tamanho reservado e as amostras são escritas
+    no mapa, em ordem. O cabeçalho reserva espaço (chunk JUNK) para que o
+    arquivo vire RF64 ao fechar se passar de 4 GiB; o tamanho final é
+    ajustado em close().
+    """
+
+    def __init__(self, caminho, samplerate, channels, subtype=None, quadros_reservados=0):
+        """
+        Args:
+            caminho (str): Arquivo a ser criado
+            samplerate (int): Taxa de amostragem
+            channels (int): Número de canais
+            subtype (str, optional): Um de SUBTIPOS_MAPEAVEIS (padrão PCM_16)
+            quadros_reservados (int): Tamanho inicial do arquivo, em quadros;
+                o arquivo cresce se forem gravados mais quadros
+        """
+        self.name = caminho
+        self.samplerate = int(samplerate)
+        self.channels = int(channels)
+        self.subtype = subtype or 'PCM_16'
+        self._codigo, self._bits, self.dtype = SUBTIPOS_MAPEAVEIS[self.subtype]
+        self._largura = np.dtype(self.dtype).itemsize * self.channels
+        self.frames = 0
+        self._arquivo = open(caminho, 'w+b')
+        self._arquivo.write(self._cabecalho(0))
+        self._mapa = None
+        self._capacidade = 0
+        # Um buffer auxiliar por tipo: write() converte em float64 mesmo quando
+        # o processamento em float32 também pede buffers
+        self._auxiliares = {}
+        self._reservar(max(int(quadros_reservados), 1))
+
+    def _cabecalho(self, quadros):
+        """Monta o cabeçalho para a quantidade de quadros informada."""
+        bytes_dados = quadros * self._largura
+        tamanho_riff = _TAMANHO_CABECALHO - 8 + bytes_dados
+        alinhamento = self._largura
+        fmt = struct.pack('<4sIHHIIHH', b'fmt ', 16, self._codigo, self.channels, self.samplerate,
+                          self.samplerate * alinhamento, alinhamento, self._bits)
+        if tamanho_riff <= _LIMITE_RIFF and bytes_dados <= _LIMITE_RIFF:
+            return (struct.pack('<4sI4s', b'RIFF', tamanho_riff, b'WAVE')
+                    + struct.pack('<4sI', b'JUNK', 28) + bytes(28) + fmt
+                    + struct.pack('<4sI', b'data', bytes_dados))
+        ds64 = struct.pack('<4sIQQQI', b'ds64', 28, tamanho_riff, bytes_dados, quadros, 0)
+        return (struct.pack('<4sI4s', b'RF64', _LIMITE_RIFF, b'WAVE') + ds64 + fmt
+                + struct.pack('<4sI', b'data', _LIMITE_RIFF))
+
+    def _reservar(self, quadros):
+        """Garante espaço no arquivo e no mapa para `quadros` quadros."""
+        if quadros <= self._capacidade:
+            return
+        capacidade = max(quadros, 2 * self._capacidade)
+        if self._mapa is not None:
+            self._mapa.flush()
+            self._mapa = None
+        self._arquivo.truncate(_TAMANHO_CABECALHO + capacidade * self._largura)
+        self._mapa = np.memmap(self._arquivo, dtype=self.dtype, mode='r+',
+                               offset=_TAMANHO_CABECALHO, shape=(capacidade, self.channels))
+        self._capacidade = capacidade
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.close()
+
+    def buffer(self, quantidade, dtype):
+        """
+        Retorna onde o próximo bloco deve ser calculado.
+
+        Se o tipo da saída for o tipo do processamento, é a própria região do
+        mapa em que o bloco será gravado, e write() não copia nada.
+
+        Args:
+            quantidade (int): Quadros do bloco
+            dtype: Tipo de ponto flutuante do processamento
+
+        Returns:
+            numpy.ndarray: Buffer gravável (quantidade, canais)
+        """
+        if np.dtype(dtype) == np.dtype(self.dtype):
+            self._reservar(self.frames + quantidade)
+            return self._mapa[self.frames:self.frames + quantidade].view(np.ndarray)
+        dtype = np.dtype(dtype)
+        auxiliar = self._auxiliares.get(dtype)
+        if auxiliar is None or len(auxiliar) < quantidade:
+            auxiliar = np.empty((quantidade, self.channels), dtype=dtype)
+            self._auxiliares[dtype] = auxiliar
+        return auxiliar[:quantidade]
+
+    def write(self, dados):
+        """
+        Grava o próximo bloco, já limitado a [-1.0, 1.0].
+
+        Args:
+            dados (numpy.ndarray): Quadros (quantidade, canais) ou (quantidade,)
+        """
+        dados = dados.reshape(len(dados), -1)
+        quantidade = len(dados)
+        self._reservar(self.frames + quantidade)
+        destino = self._mapa[self.frames:self.frames + quantidade]
+        if dados.ctypes.data != destino.ctypes.data:
+            if destino.dtype.kind == 'f':
+                destino[:] = dados
+            else:
+                # Mesma conversão do libsndfile: arredonda para o inteiro de 32 bits
+                # mais próximo, satura no maior deles e, para 16 bits, descarta os
+                # 16 bits de baixo (deslocamento aritmético, ou seja, para baixo).
+                # Em float64, que representa exatamente todo inteiro de 32 bits.
+                escala = _escala_inteiro(np.int32)
+                auxiliar = self.buffer(quantidade, np.float64)
+                np.multiply(dados, escala, out=auxiliar)
+                np.rint(auxiliar, out=auxiliar)
+                np.minimum(auxiliar, escala - 1, out=auxiliar)
+                if destino.dtype.itemsize < 4:
+                    auxiliar *= _escala_inteiro(destino.dtype) / escala
+                    np.floor(auxiliar, out=auxiliar)
+                destino[:] = auxiliar
+        self.frames += quantidade
+
+    def close(self):
+        """Grava o cabeçalho final e ajusta o arquivo ao tamanho gravado."""
+        if self._arquivo.closed:
+            return
+        if self._mapa is not None:
+            self._mapa.flush()
+            self._mapa = None
+        self._arquivo.truncate(_TAMANHO_CABECALHO + self.frames * self._largura)
+        self._arquivo.seek(0)
+        self._arquivo.write(self._cabecalho(self.frames))
+        self._arquivo.close()
+
+
+def pode_mapear_saida(caminho, subtipo=None):
+    """Indica se a saída pode ser gravada por SaidaMapeada (WAV em um subtipo mapeável)."""
+    return caminho.lower().endswith('.wav') and (subtipo or 'PCM_16') in SUBTIPOS_MAPEAVEIS
@@ -0,0 +1,149 @@
+"""Metadados de arquivos de áudio lidos só do cabeçalho, com cache e varredura em segundo plano."""
+
+import os
+import threading
+from collections import namedtuple
+
+import soundfile as sf
+
+from .controle import ControleTrabalho, ProcessamentoCancelado
+
+# Informações do cabeçalho de um arquivo de áudio (duração em segundos)
+Metadados = namedtuple('Metadados', ['caminho', 'taxa', 'canais', 'quadros', 'duracao',
+                                     'tamanho_bytes', 'formato', 'subtipo'])
+
+
+def ler_metadados(caminho):
+    """
+    Lê taxa, canais e duração do cabeçalho, sem decodificar as amostras.
+
+    Args:
+        caminho (str): Arquivo de áudio
+
+    Returns:
+        Metadados: Informações do arquivo
+    """
+    info = sf.info(caminho)
+    duracao = info.frames / info.samplerate if info.samplerate else 0.0
+    return Metadados(caminho, info.samplerate, info.channels, info.frames, duracao,
+                     os.path.getsize(caminho), info.format, info.subtype)
+
+
+def _assinatura(caminho):
+    """Identifica a versão do arquivo pelo tamanho e pela data de modificação."""
+    estado = os.stat(caminho)
+    return estado.st_size, estado.st_mtime_ns
+
+
+class CatalogoMetadados:
+    """
+    Cache de metadados por caminho, seguro para uso de várias threads.
+
+    Uma entrada vale enquanto o tamanho e a data de modificação do arquivo não
+    mudarem. Ler os metadados custa uma chamada a soundfile.info, de modo que
+    seleções com milhares de arquivos e pastas de IRs de vários GB podem ser
+    catalogadas em segundo plano sem decodificar nenhuma amostra.
+    """
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self._itens = {}
+
+    def __len__(self):
+        with self._trava:
+            return len(self._itens)
+
+    def consultar(self, caminho):
+        """
+        Retorna os metadados já catalogados, sem acessar o arquivo.
+
+        Returns:
+            Metadados: Metadados em cache, ou None se o arquivo não foi lido
+        """
+        with self._trava:
+            item = self._itens.get(caminho)
+        return item[1] if item else None
+
+    def obter(self, caminho):
+        """
+        Retorna os metadados do arquivo, lendo o cabeçalho se o cache estiver desatualizado.
+
+        Args:
+            caminho (str): Arquivo de áudio
+
+        Returns:
+            Metadados: Informações do arquivo
+
+        Raises:
+            OSError: Se o arquivo não existir
+            soundfile.LibsndfileError: Se o arquivo não for um áudio legível
+        """
+        assinatura = _assinatura(caminho)
+        with self._trava:
+            item = self._itens.get(caminho)
+        if item and item[0] == assinatura:
+            return item[1]
+        metadados = ler_metadados(caminho)
+        with self._trava:
+            self._itens[caminho] = (assinatura, metadados)
+        return metadados
+
+    def varrer(self, caminhos, ao_concluir=None, controle=None):
+        """
+        Lê os metadados dos arquivos em uma thread em segundo plano.
+
+        O progresso é informado ao controle em arquivos lidos; cancelar o
+        controle interrompe a varredura (ao_concluir não é chamado).
+
+        Args:
+            caminhos (iterable): Arquivos a catalogar
+            ao_concluir (callable, optional): Recebe (lista de Metadados dos
+                arquivos legíveis, dict caminho -> mensagem de erro), na thread
+                da varredura
+            controle (ControleTrabalho, optional): Progresso e cancelamento
+
+        Returns:
+            threading.Thread: Thread da varredura, já iniciada
+        """
+        caminhos = list(caminhos)
+        controle = controle or ControleTrabalho()
+
+        def executar():
+            lidos = []
+            erros = {}
+            controle.iniciar(len(caminhos))
+            try:
+                for caminho in caminhos:
+                    try:
+                        lidos.append(self.obter(caminho))
+                    except Exception as e:
+                        erros[caminho] = str(e)
+                    controle.avancar(1)
+            except ProcessamentoCancelado:
+                return
+            controle.concluir()
+            if ao_concluir is not None:
+                ao_concluir(lidos, erros)
+
+        thread = threading.Thread(target=executar, name='eco-metadados', daemon=True)
+        thread.start()
+        return thread
+
+
+def resumir_metadados(metadados):
+    """
+    Soma os metadados de uma seleção.
+
+    Args:
+        metadados (list): Lista de Metadados
+
+    Returns:
+        dict: Quantidade de arquivos, duração total em segundos, bytes e as
+            taxas de amostragem encontradas
+    """
+    return {
+        'arquivos': len(metadados),
+        'duracao': sum(m.duracao for m in metadados),
+        'tamanho_bytes': sum(m.tamanho_bytes for m in metadados),
+        'taxas': sorted({m.taxa for m in metadados}),
+    }
@@ -0,0 +1,239 @@
+"""Medições por etapa (decodificação, DSP, gravação), registro em JSON lines e perfilamento."""
+
+import collections
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+ETAPAS = ('decodificacao', 'dsp', 'codificacao')
+
+
+class MedicaoArquivo:
+    """Tempos por etapa e volume de dados do processamento de um arquivo."""
+
+    def __init__(self, caminho_entrada, caminho_saida=None):
+        """
+        Args:
+            caminho_entrada (str): Arquivo de origem
+            caminho_saida (str, optional): Arquivo gerado
+        """
+        self.caminho_entrada = caminho_entrada
+        self.caminho_saida = caminho_saida
+        self.etapas = dict.fromkeys(ETAPAS, 0.0)
+        self.quadros = 0
+        self.canais = 0
+        self.taxa_amostragem = 0
+        self.bytes_lidos = 0
+        self.bytes_escritos = 0
+        self.espera_fila_s = None
+        self.total_s = None
+        self._inicio = time.perf_counter()
+        # As etapas podem ser medidas por threads diferentes (ver fluxo)
+        self._trava = threading.Lock()
+
+    @contextmanager
+    def medir(self, etapa):
+        """Soma ao total da etapa o tempo gasto dentro do bloco with."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            duracao = time.perf_counter() - inicio
+            with self._trava:
+                self.etapas[etapa] += duracao
+
+    def finalizar(self):
+        """Registra o tempo total e o tamanho dos arquivos envolvidos."""
+        self.total_s = time.perf_counter() - self._inicio
+        for atributo, caminho in (('bytes_lidos', self.caminho_entrada),
+                                  ('bytes_escritos', self.caminho_saida)):
+            if caminho and os.path.exists(caminho):
+                setattr(self, atributo, os.path.getsize(caminho))
+        return self
+
+    @property
+    def duracao_audio_s(self):
+        """Duração do áudio de entrada em segundos."""
+        return self.quadros / self.taxa_amostragem if self.taxa_amostragem else 0.0
+
+    def como_dict(self):
+        """
+        Returns:
+            dict: Medição serializável em JSON
+        """
+        total = self.total_s if self.total_s is not None else time.perf_counter() - self._inicio
+        return {
+            'entrada': self.caminho_entrada,
+            'saida': self.caminho_saida,
+            'quadros': self.quadros,
+            'canais': self.canais,
+            'taxa_amostragem': self.taxa_amostragem,
+            'duracao_audio_s': round(self.duracao_audio_s, 4),
+            'etapas_s': {etapa: round(tempo, 6) for etapa, tempo in self.etapas.items()},
+            'total_s': round(total, 6),
+            'fator_tempo_real': round(self.duracao_audio_s / total, 2) if total > 0 else None,
+            'bytes_lidos': self.bytes_lidos,
+            'bytes_escritos': self.bytes_escritos,
+            'espera_fila_s': None if self.espera_fila_s is None else round(self.espera_fila_s, 6),
+        }
+
+
+class RegistroMetricas:
+    """Acrescenta medições a um arquivo JSON lines (uma medição por linha)."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._trava = threading.Lock()
+
+    def escrever(self, medicao):
+        """Grava uma medição (MedicaoArquivo ou dict)."""
+        if isinstance(medicao, MedicaoArquivo):
+            medicao = medicao.como_dict()
+        linha = json.dumps(medicao, ensure_ascii=False)
+        with self._trava:
+            with open(self.caminho, 'a', encoding='utf-8') as arquivo:
+                arquivo.write(linha + "\n")
+
+
+class EstatisticasMetricas:
+    """Acumula medições no próprio processo e oferece um resumo agregado."""
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self.limpar()
+
+    def limpar(self):
+        """Zera os acumuladores."""
+        with self._trava:
+            self.arquivos = 0
+            self.etapas = dict.fromkeys(ETAPAS, 0.0)
+            self.total_s = 0.0
+            self.duracao_audio_s = 0.0
+            self.bytes_lidos = 0
+            self.bytes_escritos = 0
+            self.espera_fila_s = 0.0
+            self.ultima = None
+
+    def registrar(self, medicao):
+        """Soma uma medição (MedicaoArquivo ou dict) aos acumuladores."""
+        if isinstance(medicao, MedicaoArquivo):
+            medicao = medicao.como_dict()
+        with self._trava:
+            self.arquivos += 1
+            for etapa, tempo in medicao['etapas_s'].items():
+                self.etapas[etapa] = self.etapas.get(etapa, 0.0) + tempo
+            self.total_s += medicao['total_s']
+            self.duracao_audio_s += medicao['duracao_audio_s']
+            self.bytes_lidos += medicao['bytes_lidos']
+            self.bytes_escritos += medicao['bytes_escritos']
+            self.espera_fila_s += medicao.get('espera_fila_s') or 0.0
+            self.ultima = medicao
+
+    def resumo(self):
+        """
+        Returns:
+            dict: Totais por etapa, fator de tempo real agregado e volume de dados
+        """
+        with self._trava:
+            return {
+                'arquivos': self.arquivos,
+                'etapas_s': {etapa: round(tempo, 4) for etapa, tempo in self.etapas.items()},
+                'total_s': round(self.total_s, 4),
+                'duracao_audio_s': round(self.duracao_audio_s, 4),
+                'fator_tempo_real': round(self.duracao_audio_s / self.total_s, 2) if self.total_s else None,
+                'bytes_lidos': self.bytes_lidos,
+                'bytes_escritos': self.bytes_escritos,
+                'espera_fila_s': round(self.espera_fila_s, 4),
+            }
+
+
+_estatisticas_processo = EstatisticasMetricas()
+
+
+def estatisticas():
+    """Retorna as estatísticas acumuladas no processo atual."""
+    return _estatisticas_processo
+
+
+class AmostradorPilhas:
+    """
+    Perfilador por amostragem: registra periodicamente a pilha de uma thread e
+    conta as pilhas no formato "collapsed" (uma linha por pilha, quadros
+    separados por ';'), aceito por ferramentas de flame graph.
+    """
+
+    def __init__(self, intervalo_s=0.005, thread_id=None):
+        """
+        Args:
+            intervalo_s (float): Intervalo entre amostras
+            thread_id (int, optional): Thread amostrada. Se None, a que chamar iniciar().
+        """
+        self.intervalo_s = intervalo_s
+        self.thread_id = thread_id
+        self.contagens = collections.Counter()
+        self._parar = threading.Event()
+        self._thread = None
+
+    def _amostrar(self):
+        while not self._parar.wait(self.intervalo_s):
+            quadro = sys._current_frames().get(self.thread_id)
+            pilha = []
+            while quadro is not None:
+                codigo = quadro.f_code
+                pilha.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{quadro.f_lineno})")
+                quadro = quadro.f_back
+            if pilha:
+                self.contagens[';'.join(reversed(pilha))] += 1
+
+    def iniciar(self):
+        """Começa a amostrar em uma thread de fundo."""
+        self.thread_id = self.thread_id or threading.get_ident()
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._amostrar, daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        """Interrompe a amostragem."""
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def gravar(self, caminho):
+        """Grava as pilhas contadas no formato collapsed."""
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            for pilha, contagem in self.contagens.most_common():
+                arquivo.write(f"{pilha} {contagem}\n")
+
+
+def perfilar(funcao, destino, modo='cprofile'):
+    """
+    Executa a função sob um perfilador e grava o resultado.
+
+    Args:
+        funcao (callable): Função sem argumentos a ser perfilada
+        destino (str): Arquivo de saída (.prof do pstats no modo 'cprofile',
+            pilhas collapsed no modo 'amostragem')
+        modo (str): 'cprofile' (determinístico) ou 'amostragem'
+
+    Returns:
+        O valor retornado pela função
+    """
+    if modo == 'cprofile':
+        import cProfile
+        perfilador = cProfile.Profile()
+        try:
+            return perfilador.runcall(funcao)
+        finally:
+            perfilador.dump_stats(destino)
+    if modo == 'amostragem':
+        amostrador = AmostradorPilhas()
+        amostrador.iniciar()
+        try:
+            return funcao()
+        finally:
+            amostrador.parar()
+            amostrador.gravar(destino)
+    raise ValueError(f"Modo de perfilamento inválido: {modo}")
@@ -0,0 +1,351 @@
+"""Pirâmide de picos mínimo/máximo em vários níveis de zoom, para desenhar formas de onda."""
+
+import hashlib
+import os
+
+import numpy as np
+import soundfile as sf
+
+# Quadros resumidos por par mínimo/máximo no nível mais detalhado
+AMOSTRAS_POR_PICO = 256
+
+# Quantos pares de um nível formam um par do nível seguinte
+FATOR_NIVEL = 4
+
+# Extensão do arquivo auxiliar gravado ao lado do áudio
+EXTENSAO_PICOS = '.picos.npz'
+
+# Versão do formato do arquivo auxiliar; arquivos de outra versão são refeitos
+VERSAO_PICOS = 1
+
+# Quadros lidos por vez ao gerar a pirâmide de um arquivo
+_TAMANHO_BLOCO_PICOS = 65536
+
+
+class PiramidePicos:
+    """
+    Resumo de um sinal em pares (mínimo, máximo) por canal, em vários níveis.
+
+    O nível 0 tem um par a cada amostras_por_pico quadros e cada nível
+    seguinte junta `fator` pares do anterior, até restar um só. Desenhar uma
+    janela com N colunas lê no máximo N·fator pares do nível adequado, de
+    modo que o custo não depende da duração do arquivo.
+    """
+
+    def __init__(self, minimos, maximos, taxa, quadros, amostras_por_pico=AMOSTRAS_POR_PICO,
+                 fator=FATOR_NIVEL):
+        """
+        Args:
+            minimos (list): Por nível, array (pares, canais) dos mínimos
+            maximos (list): Por nível, array (pares, canais) dos máximos
+            taxa (int): Taxa de amostragem do sinal
+            quadros (int): Quadros do sinal
+            amostras_por_pico (int): Quadros por par no nível 0
+            fator (int): Pares de um nível por par do nível seguinte
+        """
+        self.minimos = minimos
+        self.maximos = maximos
+        self.taxa = taxa
+        self.quadros = quadros
+        self.amostras_por_pico = amostras_por_pico
+        self.fator = fator
+
+    @property
+    def canais(self):
+        """Número de canais do sinal."""
+        return self.minimos[0].shape[1]
+
+    @property
+    def niveis(self):
+        """Número de níveis de zoom."""
+        return len(self.minimos)
+
+    @property
+    def duracao(self):
+        """Duração do sinal em segundos."""
+        return self.quadros / self.taxa if self.taxa else 0.0
+
+    def quadros_por_par(self, nivel):
+        """Quadros resumidos por um par do nível."""
+        return self.amostras_por_pico * self.fator ** nivel
+
+    def janela(self, inicio, fim, colunas):
+        """
+        Retorna os picos de um trecho resumidos em até `colunas` pares.
+
+        Usa o nível mais grosso que ainda tenha ao menos um par por coluna;
+        se nem o nível 0 tiver, retorna os pares do nível 0 (menos colunas
+        que o pedido).
+
+        Args:
+            inicio (int): Primeiro quadro do trecho
+            fim (int): Quadro seguinte ao último do trecho
+            colunas (int): Colunas disponíveis para o desenho
+
+        Returns:
+            tuple: (mínimos, máximos), arrays (colunas, canais) float32
+        """
+        inicio = max(0, int(inicio))
+        fim = min(self.quadros, int(fim))
+        colunas = max(1, int(colunas))
+        if fim <= inicio:
+            vazio = np.empty((0, self.canais), dtype=np.float32)
+            return vazio, vazio
+
+        nivel = 0
+        while (nivel + 1 < self.niveis
+               and (fim - inicio) / self.quadros_por_par(nivel + 1) >= colunas):
+            nivel += 1
+        passo = self.quadros_por_par(nivel)
+        primeiro = inicio // passo
+        ultimo = -(-fim // passo)
+        minimos = self.minimos[nivel][primeiro:ultimo]
+        maximos = self.maximos[nivel][primeiro:ultimo]
+        if len(minimos) <= colunas:
+            return minimos, maximos
+        limites = np.linspace(0, len(minimos), colunas, endpoint=False).astype(np.intp)
+        return (np.minimum.reduceat(minimos, limites, axis=0),
+                np.maximum.reduceat(maximos, limites, axis=0))
+
+    def salvar(self, caminho, origem=None):
+        """
+        Grava a pirâmide em um arquivo .npz (substituído atomicamente).
+
+        Args:
+            caminho (str): Arquivo auxiliar de destino
+            origem (str, optional): Arquivo de áudio resumido; seu tamanho e
+                data de modificação são guardados para detectar alterações
+        """
+        tamanho, modificacao = _assinatura(origem) if origem else (-1, -1)
+        arrays = {}
+        for nivel, (minimos, maximos) in enumerate(zip(self.minimos, self.maximos)):
+            arrays[f'minimos_{nivel}'] = minimos
+            arrays[f'maximos_{nivel}'] = maximos
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        try:
+            with open(temporario, 'wb') as arquivo:
+                np.savez(arquivo, versao=VERSAO_PICOS, taxa=self.taxa, quadros=self.quadros,
+                         amostras_por_pico=self.amostras_por_pico, fator=self.fator,
+                         niveis=self.niveis, origem_tamanho=tamanho,
+                         origem_modificacao=modificacao, **arrays)
+            os.replace(temporario, caminho)
+        except BaseException:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+
+    @classmethod
+    def carregar(cls, caminho, origem=None):
+        """
+        Lê uma pirâmide gravada por salvar().
+
+        Args:
+            caminho (str): Arquivo auxiliar
+            origem (str, optional): Se informado, o arquivo só é aceito se o
+                áudio não mudou desde que a pirâmide foi gravada
+
+        Returns:
+            PiramidePicos: A pirâmide, ou None se o arquivo não existir, for de
+                outra versão ou estiver desatualizado
+        """
+        try:
+            with np.load(caminho, allow_pickle=False) as dados:
+                if int(dados['versao']) != VERSAO_PICOS:
+                    return None
+                if origem is not None:
+                    guardada = (int(dados['origem_tamanho']), int(dados['origem_modificacao']))
+                    if guardada != _assinatura(origem):
+                        return None
+                niveis = int(dados['niveis'])
+                return cls([dados[f'minimos_{n}'] for n in range(niveis)],
+                           [dados[f'maximos_{n}'] for n in range(niveis)],
+                           int(dados['taxa']), int(dados['quadros']),
+                           int(dados['amostras_por_pico']), int(dados['fator']))
+        except (OSError, KeyError, ValueError):
+            return None
+
+
+class ConstrutorPicos:
+    """
+    Monta a pirâmide de picos em uma passada, recebendo o sinal em blocos.
+
+    Os blocos podem ter qualquer tamanho; os quadros que não completam um par
+    ficam guardados para o bloco seguinte.
+    """
+
+    def __init__(self, taxa, amostras_por_pico=AMOSTRAS_POR_PICO, fator=FATOR_NIVEL):
+        """
+        Args:
+            taxa (int): Taxa de amostragem do sinal
+            amostras_por_pico (int): Quadros por par no nível 0
+            fator (int): Pares de um nível por par do nível seguinte
+        """
+        if amostras_por_pico < 1 or fator < 2:
+            raise ValueError("amostras_por_pico deve ser positivo e fator, no mínimo 2")
+        self.taxa = taxa
+        self.amostras_por_pico = amostras_por_pico
+        self.fator = fator
+        self.quadros = 0
+        self._minimos = []
+        self._maximos = []
+        self._resto = None
+        self._quadros_resto = 0
+
+    def acumular(self, bloco):
+        """
+        Resume um bloco do sinal.
+
+        Args:
+            bloco (numpy.ndarray): Bloco (quadros,) ou (quadros, canais)
+        """
+        bloco = np.asarray(bloco)
+        if bloco.ndim == 1:
+            bloco = bloco[:, np.newaxis]
+        if not len(bloco):
+            return
+        if self._resto is None:
+            self._resto = np.empty((self.amostras_por_pico, bloco.shape[1]), dtype=np.float32)
+        self.quadros += len(bloco)
+
+        # Completa o par iniciado no bloco anterior
+        if self._quadros_resto:
+            usados = min(len(bloco), self.amostras_por_pico - self._quadros_resto)
+            self._resto[self._quadros_resto:self._quadros_resto + usados] = bloco[:usados]
+            self._quadros_resto += usados
+            bloco = bloco[usados:]
+            if self._quadros_resto == self.amostras_por_pico:
+                self._emitir(self._resto)
+                self._quadros_resto = 0
+
+        inteiros = len(bloco) // self.amostras_por_pico * self.amostras_por_pico
+        if inteiros:
+            pares = bloco[:inteiros].reshape(-1, self.amostras_por_pico, bloco.shape[1])
+            self._minimos.append(pares.min(axis=1).astype(np.float32))
+            self._maximos.append(pares.max(axis=1).astype(np.float32))
+        restante = len(bloco) - inteiros
+        if restante:
+            self._resto[:restante] = bloco[inteiros:]
+            self._quadros_resto = restante
+
+    def _emitir(self, quadros):
+        """Guarda o par (mínimo, máximo) de um grupo de quadros."""
+        self._minimos.append(quadros.min(axis=0, keepdims=True).astype(np.float32))
+        self._maximos.append(quadros.max(axis=0, keepdims=True).astype(np.float32))
+
+    def finalizar(self, canais=1):
+        """
+        Fecha o último par e monta os níveis superiores.
+
+        Args:
+            canais (int): Canais do resultado se nenhum quadro foi recebido
+
+        Returns:
+            PiramidePicos: Pirâmide do sinal recebido
+        """
+        if self._quadros_resto:
+            self._emitir(self._resto[:self._quadros_resto])
+            self._quadros_resto = 0
+        if self._minimos:
+            minimos = [np.concatenate(self._minimos)]
+            maximos = [np.concatenate(self._maximos)]
+        else:
+            minimos = [np.zeros((0, canais), dtype=np.float32)]
+            maximos = [np.zeros((0, canais), dtype=np.float32)]
+        while len(minimos[-1]) > 1:
+            limites = np.arange(0, len(minimos[-1]), self.fator)
+            minimos.append(np.minimum.reduceat(minimos[-1], limites, axis=0))
+            maximos.append(np.maximum.reduceat(maximos[-1], limites, axis=0))
+        return PiramidePicos(minimos, maximos, self.taxa, self.quadros,
+                             self.amostras_por_pico, self.fator)
+
+
+def _assinatura(caminho):
+    """Tamanho e data de modificação do arquivo."""
+    estado = os.stat(caminho)
+    return estado.st_size, estado.st_mtime_ns
+
+
+def pasta_cache_picos():
+    """Retorna a pasta de picos da interface ($XDG_CACHE_HOME/eco_audio/picos ou ~/.cache/...)."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'eco_audio', 'picos')
+
+
+def caminho_picos(caminho_audio, pasta=None):
+    """
+    Caminho do arquivo auxiliar de picos de um arquivo de áudio.
+
+    Sem pasta, o auxiliar fica ao lado do áudio. Com uma pasta (por exemplo,
+    pasta_cache_picos()), fica nela, com o nome derivado do caminho absoluto
+    do áudio; o tamanho e a data de modificação gravados no auxiliar (ver
+    PiramidePicos.salvar) descartam a pirâmide de um arquivo que mudou.
+    """
+    if pasta is None:
+        return caminho_audio + EXTENSAO_PICOS
+    chave = hashlib.sha256(os.path.abspath(caminho_audio).encode('utf-8')).hexdigest()
+    return os.path.join(pasta, chave[:2], chave + EXTENSAO_PICOS)
+
+
+def carregar_picos(caminho_audio, pasta=None):
+    """
+    Retorna a pirâmide guardada de um arquivo de áudio, se estiver atualizada.
+
+    Procura ao lado do áudio e, se houver pasta, também nela.
+
+    Returns:
+        PiramidePicos: A pirâmide, ou None se não houver uma atualizada
+    """
+    piramide = PiramidePicos.carregar(caminho_picos(caminho_audio), caminho_audio)
+    if piramide is None and pasta is not None:
+        piramide = PiramidePicos.carregar(caminho_picos(caminho_audio, pasta), caminho_audio)
+    return piramide
+
+
+def salvar_picos(piramide, caminho_audio, pasta=None):
+    """
+    Grava a pirâmide ao lado do arquivo de áudio ou, se informada, na pasta.
+
+    Uma pasta sem permissão de escrita não é erro: a pirâmide só deixa de
+    ficar guardada.
+
+    Returns:
+        bool: True se o arquivo auxiliar foi gravado
+    """
+    try:
+        destino = caminho_picos(caminho_audio, pasta)
+        if pasta is not None:
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+        piramide.salvar(destino, caminho_audio)
+    except OSError:
+        return False
+    return True
+
+
+def picos_arquivo(caminho_audio, salvar=True, tamanho_bloco=_TAMANHO_BLOCO_PICOS, pasta=None):
+    """
+    Retorna a pirâmide de picos de um arquivo de áudio.
+
+    Usa o arquivo auxiliar se ele estiver atualizado; caso contrário, lê o
+    áudio em blocos, monta a pirâmide e (com salvar=True) grava o auxiliar.
+
+    Args:
+        caminho_audio (str): Arquivo de áudio
+        salvar (bool): Se True, grava o arquivo auxiliar ao montar a pirâmide
+        tamanho_bloco (int): Quadros lidos por vez
+        pasta (str, optional): Pasta dos auxiliares (ver caminho_picos); se
+            None, eles ficam ao lado do áudio
+
+    Returns:
+        PiramidePicos: Pirâmide do arquivo
+    """
+    piramide = carregar_picos(caminho_audio, pasta)
+    if piramide is not None:
+        return piramide
+    with sf.SoundFile(caminho_audio) as entrada:
+        construtor = ConstrutorPicos(entrada.samplerate)
+        for bloco in entrada.blocks(tamanho_bloco, dtype='float32', always_2d=True):
+            construtor.acumular(bloco)
+        piramide = construtor.finalizar(entrada.channels)
+    if salvar:
+        salvar_picos(piramide, caminho_audio, pasta)
+    return piramide
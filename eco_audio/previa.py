@@ -0,0 +1,565 @@
+"""Renderização incremental da pré-visualização, com cache de resultados."""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .atraso import (Derivacao, LIMIAR_PADRAO, ProcessadorAtraso, _normalizar_derivacoes,
+                     duracao_cauda)
+from .banco_ir import BancoIR, banco_padrao
+from .convolucao import QUADROS_POR_LOTE, _multiplicar_acumular, mapa_canais
+from .dinamica import LimitadorAntecipado
+from .processamento import normalizar_pico, pico_absoluto
+
+# Duração da primeira janela renderizada ao tocar, e de cada trecho seguinte
+JANELA_PADRAO_S = 5.0
+
+# Quantidade de resultados (completos ou parciais) mantidos em cache
+ITENS_CACHE_PADRAO = 8
+
+# Tamanho de partição da convolução da prévia. É o mesmo para qualquer IR,
+# de modo que os espectros do sinal seco servem para todos eles
+BLOCO_PREVIA = 4096
+
+# Memória máxima ocupada pelos espectros do sinal seco
+LIMITE_ESPECTROS_PADRAO = 256 * 1024 * 1024
+
+
+class _EspectrosSeco:
+    """
+    Espectros dos blocos do sinal original (overlap-save), calculados sob demanda.
+
+    O bloco k é a FFT dos quadros [(k - 1)·B, (k + 1)·B) do sinal, como na
+    linha de atraso de convolucao.ConvolvedorMultiplo. Os espectros são
+    guardados em lotes, com remoção LRU acima do limite de memória, e
+    reaproveitados por todos os IRs e trechos da prévia.
+    """
+
+    def __init__(self, matriz, tamanho_bloco, limite_bytes):
+        """
+        Args:
+            matriz (numpy.ndarray): Sinal original (quadros, canais)
+            tamanho_bloco (int): Tamanho de partição B
+            limite_bytes (int): Memória máxima dos lotes guardados
+        """
+        self.matriz = matriz
+        self.tamanho_bloco = tamanho_bloco
+        self.limite_bytes = limite_bytes
+        self.dtype = np.result_type(matriz.dtype, np.float32)
+        self.tipo_complexo = np.result_type(self.dtype, np.complex64)
+        # Depois do último, os blocos só teriam zeros
+        self.blocos = -(-len(matriz) // tamanho_bloco) + 1
+        self.por_lote = max(1, QUADROS_POR_LOTE // (tamanho_bloco * matriz.shape[1]))
+        self._lotes = OrderedDict()
+        self._bytes = 0
+        self._trava = threading.Lock()
+
+    def _calcular_lote(self, lote):
+        """Transforma os blocos de um lote."""
+        bloco = self.tamanho_bloco
+        primeiro = lote * self.por_lote
+        quantidade = min(self.por_lote, self.blocos - primeiro)
+        inicio = (primeiro - 1) * bloco
+        trecho = np.zeros(((quantidade + 1) * bloco, self.matriz.shape[1]), dtype=self.dtype)
+        origem, fim = max(inicio, 0), min(inicio + len(trecho), len(self.matriz))
+        if fim > origem:
+            trecho[origem - inicio:fim - inicio] = self.matriz[origem:fim]
+        quadros = np.empty((quantidade, 2 * bloco, self.matriz.shape[1]), dtype=self.dtype)
+        quadros[:, :bloco] = trecho[:-bloco].reshape(quantidade, bloco, -1)
+        quadros[:, bloco:] = trecho[bloco:].reshape(quantidade, bloco, -1)
+        return np.fft.rfft(quadros, axis=1).astype(self.tipo_complexo, copy=False)
+
+    def _lote(self, lote):
+        """Retorna os espectros de um lote, calculando-os se necessário."""
+        with self._trava:
+            espectros = self._lotes.get(lote)
+            if espectros is not None:
+                self._lotes.move_to_end(lote)
+                return espectros
+        espectros = self._calcular_lote(lote)
+        with self._trava:
+            if lote not in self._lotes:
+                self._lotes[lote] = espectros
+                self._bytes += espectros.nbytes
+            while self._bytes > self.limite_bytes and len(self._lotes) > 1:
+                _, removido = self._lotes.popitem(last=False)
+                self._bytes -= removido.nbytes
+        return espectros
+
+    def obter(self, primeiro, ultimo):
+        """
+        Retorna os espectros dos blocos [primeiro, ultimo).
+
+        Blocos antes do início ou depois do fim do sinal são zeros.
+
+        Returns:
+            numpy.ndarray: (ultimo - primeiro, B + 1, canais)
+        """
+        resultado = np.zeros((ultimo - primeiro, self.tamanho_bloco + 1, self.matriz.shape[1]),
+                             dtype=self.tipo_complexo)
+        inicio, fim = max(primeiro, 0), min(ultimo, self.blocos)
+        for lote in range(inicio // self.por_lote, -(-fim // self.por_lote)):
+            base = lote * self.por_lote
+            espectros = self._lote(lote)
+            de, ate = max(inicio, base), min(fim, base + len(espectros))
+            resultado[de - primeiro:ate - primeiro] = espectros[de - base:ate - base]
+        return resultado
+
+
+class _CadeiaEco:
+    """Eco seguido do limitador, em blocos e com o mesmo resultado de aplicar_eco."""
+
+    def __init__(self, taxa_amostragem, parametros, canais, dtype):
+        self.atraso = ProcessadorAtraso(taxa_amostragem,
+                                        [Derivacao(parametros['atraso_ms'],
+                                                   parametros['decaimento'])],
+                                        canais, parametros.get('realimentacao', False),
+                                        dtype=dtype)
+        self.limitador = LimitadorAntecipado(taxa_amostragem, canais, dtype=dtype)
+
+    @property
+    def contexto_limitador(self):
+        """Quadros anteriores que influenciam o ganho do limitador."""
+        return self.limitador.antecipacao + self.limitador.liberacao
+
+    def processar(self, dados):
+        """Processa um bloco; retorna os quadros já liberados pelo limitador."""
+        return np.clip(self.limitador.processar(self.atraso.processar(dados)), -1.0, 1.0)
+
+    def finalizar(self):
+        """Processa a cauda do eco e esvazia o limitador."""
+        cauda = self.limitador.processar(self.atraso.finalizar())
+        return np.clip(np.concatenate((cauda, self.limitador.finalizar())), -1.0, 1.0)
+
+
+class _Resultado:
+    """
+    Trechos já renderizados de um resultado, em uma grade de quadros_trecho quadros.
+
+    No modo de IR os trechos ficam sem normalização; quando todos ficam
+    prontos, o resultado completo é normalizado pelo pico e os trechos
+    passam a ser vistas dele, com `escala` indicando o ganho já aplicado.
+    """
+
+    def __init__(self, quadros_trecho, total=None, normalizar=False):
+        self.quadros_trecho = quadros_trecho
+        self.total = total
+        self.normalizar = normalizar
+        self.trechos = {}
+        self.escala = 1.0
+        self.completo = None
+        self.pico = 0.0
+        # Protege a renderização (e o estado da cadeia de eco) deste resultado
+        self.trava = threading.Lock()
+        self.cadeia = None
+        self.proximo_cadeia = None
+        self.saida_cadeia = []
+        self.inicio_saida_cadeia = 0
+        self.entrada_cadeia = 0
+
+    @property
+    def quantidade(self):
+        """Número de trechos, ou None se o total ainda não é conhecido."""
+        return None if self.total is None else -(-self.total // self.quadros_trecho)
+
+    def pendente(self, primeiro):
+        """Primeiro trecho a partir de `primeiro` ainda não renderizado, ou None."""
+        indice = primeiro
+        while indice in self.trechos:
+            indice += 1
+        quantidade = self.quantidade
+        return None if quantidade is not None and indice >= quantidade else indice
+
+    def guardar(self, indice, trecho):
+        """Guarda um trecho e, se for o último que faltava, monta o resultado completo."""
+        if indice in self.trechos:
+            return
+        self.trechos[indice] = trecho
+        self.pico = max(self.pico, pico_absoluto(trecho))
+        if self.completo is None and len(self.trechos) == self.quantidade:
+            completo = np.concatenate([self.trechos[i] for i in range(self.quantidade)])
+            if self.normalizar:
+                self.escala = 1.0 / self.pico if self.pico > 0 else 1.0
+                completo = normalizar_pico(completo)
+            passo = self.quadros_trecho
+            self.trechos = {i: completo[i * passo:(i + 1) * passo]
+                            for i in range(self.quantidade)}
+            self.completo = completo
+
+
+class _Renderizacao:
+    """Renderização em segundo plano de um resultado, a partir da posição tocada."""
+
+    def __init__(self, resultado, parametros):
+        self.resultado = resultado
+        self.parametros = parametros
+        self.cancelada = threading.Event()
+        self.ativa = False
+        self.posicao = 0
+        # (ao_estender, próximo trecho a entregar, ganho em relação ao sinal sem normalização)
+        self.ouvinte = None
+
+
+class RenderizadorPrevia:
+    """
+    Renderiza a pré-visualização de um áudio carregado, começando por uma janela
+    curta na posição de reprodução e continuando, trecho a trecho, em segundo
+    plano.
+
+    Os resultados ficam em cache pela parte dos parâmetros que de fato afeta o
+    som: (atraso, decaimento, realimentação) no modo de eco, ou a identidade do
+    IR no modo de resposta de impulso. O cache guarda trechos de duração
+    janela_s: tocar de novo com os mesmos ajustes, ou mudar um parâmetro que o
+    modo atual ignora, não gera processamento, e depois de uma mudança só os
+    trechos a partir da posição tocada são calculados. Tocar de novo enquanto
+    a renderização anterior com os mesmos ajustes ainda está em andamento
+    reaproveita essa renderização.
+
+    No modo de IR, a convolução usa partições de BLOCO_PREVIA quadros para
+    qualquer IR; os espectros dos blocos do sinal seco são calculados uma vez
+    e reaproveitados por todos os IRs, de modo que trocar de IR custa só a
+    multiplicação-acumulação e a FFT inversa, e qualquer trecho pode ser
+    calculado sem processar os anteriores.
+    """
+
+    def __init__(self, dados_audio, taxa_amostragem, banco=None,
+                 limite_itens=ITENS_CACHE_PADRAO, janela_s=JANELA_PADRAO_S,
+                 limite_espectros=LIMITE_ESPECTROS_PADRAO):
+        """
+        Args:
+            dados_audio (numpy.ndarray): Sinal original carregado
+            taxa_amostragem (int): Taxa de amostragem do sinal
+            banco (BancoIR, optional): Banco de IRs. Se None, usa o banco do processo.
+            limite_itens (int): Resultados mantidos em cache
+            janela_s (float): Duração da primeira janela e de cada trecho seguinte
+            limite_espectros (int): Memória máxima dos espectros do sinal seco
+        """
+        self.dados_audio = dados_audio
+        self.taxa_amostragem = taxa_amostragem
+        self.banco = banco or banco_padrao()
+        self.limite_itens = limite_itens
+        self.janela_s = janela_s
+        self._matriz = dados_audio[:, np.newaxis] if dados_audio.ndim == 1 else dados_audio
+        self._dtype = np.result_type(dados_audio.dtype, np.float32)
+        blocos = -(-int(janela_s * taxa_amostragem) // BLOCO_PREVIA)
+        self.quadros_trecho = max(1, blocos) * BLOCO_PREVIA
+        self._seco = _EspectrosSeco(self._matriz, BLOCO_PREVIA, limite_espectros)
+        self._pico_original = pico_absoluto(dados_audio)
+        self._resultados = OrderedDict()
+        self._em_andamento = {}
+        self._trava = threading.Lock()
+
+    def chave(self, parametros):
+        """
+        Retorna a chave de cache dos parâmetros que afetam o resultado.
+
+        Args:
+            parametros (dict): atraso_ms, decaimento, realimentacao e caminho_ir
+
+        Returns:
+            tuple: Chave de cache
+        """
+        if parametros.get('caminho_ir'):
+            return ('ir',) + BancoIR.chave(parametros['caminho_ir'], self.taxa_amostragem)
+        return ('eco', parametros['atraso_ms'], parametros['decaimento'],
+                bool(parametros.get('realimentacao')))
+
+    def _formatar(self, dados):
+        """Devolve resultados mono no mesmo formato (quadros,) da entrada."""
+        if self.dados_audio.ndim == 1 and dados.shape[1] == 1:
+            return dados[:, 0]
+        return dados
+
+    def resultado(self, parametros):
+        """Retorna o resultado completo em cache, ou None."""
+        chave = self.chave(parametros)
+        with self._trava:
+            resultado = self._resultados.get(chave)
+            if resultado is not None:
+                self._resultados.move_to_end(chave)
+        if resultado is None or resultado.completo is None:
+            return None
+        return self._formatar(resultado.completo)
+
+    def _impulso(self, parametros):
+        # Os espectros usados são os de BLOCO_PREVIA, pedidos em _renderizar_ir
+        return self.banco.obter(parametros['caminho_ir'], self.taxa_amostragem, None)
+
+    def _obter_resultado(self, chave, parametros):
+        """Retorna o registro de trechos da chave, criando-o se necessário."""
+        if parametros.get('caminho_ir'):
+            total = len(self._matriz) + len(self._impulso(parametros)) - 1
+            novo = _Resultado(self.quadros_trecho, total, normalizar=True)
+        else:
+            # O fim da cauda do eco só é conhecido ao processá-la
+            novo = _Resultado(self.quadros_trecho)
+        with self._trava:
+            resultado = self._resultados.setdefault(chave, novo)
+            self._resultados.move_to_end(chave)
+            while len(self._resultados) > self.limite_itens:
+                self._resultados.popitem(last=False)
+            return resultado
+
+    def _contexto(self, parametros):
+        """Quadros anteriores a um trecho de eco que influenciam o resultado dentro dele."""
+        pares = _normalizar_derivacoes([(parametros['atraso_ms'], parametros['decaimento'])],
+                                       self.taxa_amostragem)
+        if parametros.get('realimentacao') and pares[0][1] != 0.0:
+            return duracao_cauda(self._pico_original, pares, LIMIAR_PADRAO)
+        return max(amostras for amostras, _ in pares)
+
+    def _renderizar_ir(self, resultado, parametros, indice):
+        """Convolve um trecho a partir dos espectros do sinal seco."""
+        impulso = self._impulso(parametros)
+        bloco = BLOCO_PREVIA
+        _, espectros = impulso.espectros(bloco, self._dtype)
+        espectros = espectros.astype(self._seco.tipo_complexo, copy=False)
+        canais_saida, matricial = mapa_canais(self._matriz.shape[1], impulso.canais)
+        particoes = len(espectros)
+        primeiro = indice * self.quadros_trecho // bloco
+        ultimo = min(primeiro + self.quadros_trecho // bloco, -(-resultado.total // bloco))
+        quantidade = ultimo - primeiro
+        historico = self._seco.obter(primeiro - particoes + 1, ultimo)
+        acumulado = np.zeros((quantidade, bloco + 1, canais_saida), dtype=historico.dtype)
+        for p in range(particoes):
+            atraso = particoes - 1 - p
+            _multiplicar_acumular(acumulado, historico[atraso:atraso + quantidade], espectros[p],
+                                  matricial)
+        saida = np.fft.irfft(acumulado, 2 * bloco, axis=1)[:, bloco:]
+        saida = saida.reshape(quantidade * bloco, canais_saida).astype(self._dtype, copy=False)
+        resultado.guardar(indice, saida[:resultado.total - primeiro * bloco])
+
+    def _renderizar_eco(self, resultado, parametros, indice):
+        """Processa o eco até completar o trecho, continuando a cadeia se ela estiver nele."""
+        passo = self.quadros_trecho
+        if resultado.cadeia is None or resultado.proximo_cadeia != indice:
+            # Posiciona uma cadeia nova: processa o contexto que precede o trecho
+            cadeia = _CadeiaEco(self.taxa_amostragem, parametros, self._matriz.shape[1],
+                                self._dtype)
+            origem = max(0, min(indice * passo, len(self._matriz))
+                         - self._contexto(parametros) - cadeia.contexto_limitador)
+            resultado.cadeia = cadeia
+            resultado.entrada_cadeia = origem
+            resultado.inicio_saida_cadeia = origem
+            resultado.saida_cadeia = []
+        cadeia = resultado.cadeia
+        fim = (indice + 1) * passo
+        produzidos = resultado.inicio_saida_cadeia + sum(map(len, resultado.saida_cadeia))
+        finalizada = False
+        while produzidos < fim:
+            if resultado.entrada_cadeia < len(self._matriz):
+                de = resultado.entrada_cadeia
+                resultado.entrada_cadeia = min(de + passo, len(self._matriz))
+                saida = cadeia.processar(self._matriz[de:resultado.entrada_cadeia])
+            else:
+                saida = cadeia.finalizar()
+                finalizada = True
+            resultado.saida_cadeia.append(saida)
+            produzidos += len(saida)
+            if finalizada:
+                resultado.total = produzidos
+                break
+
+        # Corta a saída acumulada na grade de trechos, descartando o contexto
+        saida = np.concatenate(resultado.saida_cadeia) if resultado.saida_cadeia else \
+            np.zeros((0, self._matriz.shape[1]), dtype=self._dtype)
+        inicio = resultado.inicio_saida_cadeia
+        atual = max(indice, -(-inicio // passo))
+        while (atual + 1) * passo <= produzidos or (finalizada and atual * passo < produzidos):
+            resultado.guardar(atual, saida[atual * passo - inicio:(atual + 1) * passo - inicio])
+            atual += 1
+        if finalizada:
+            resultado.cadeia = None
+            resultado.saida_cadeia = []
+            return
+        resultado.proximo_cadeia = atual
+        resultado.inicio_saida_cadeia = atual * passo
+        resultado.saida_cadeia = [saida[atual * passo - inicio:]]
+
+    def _garantir(self, resultado, parametros, indice):
+        """Renderiza o trecho, se ainda não estiver pronto."""
+        with resultado.trava:
+            if indice in resultado.trechos:
+                return
+            if resultado.total is not None and indice >= resultado.quantidade:
+                return
+            if parametros.get('caminho_ir'):
+                self._renderizar_ir(resultado, parametros, indice)
+            else:
+                self._renderizar_eco(resultado, parametros, indice)
+
+    def _juntar(self, resultado, primeiro, ultimo, ganho=None):
+        """
+        Junta os trechos prontos de [primeiro, ultimo), sem normalização.
+
+        Args:
+            ganho (float, optional): Se informado, é aplicado e o resultado é
+                limitado a [-1.0, 1.0]
+        """
+        with resultado.trava:
+            partes = [resultado.trechos[indice] for indice in range(primeiro, ultimo)
+                      if indice in resultado.trechos]
+            escala = resultado.escala
+        dados = np.concatenate(partes) if partes else \
+            np.zeros((0, self._matriz.shape[1]), dtype=self._dtype)
+        if ganho is not None or escala != 1.0:
+            dados = dados * ((1.0 if ganho is None else ganho) / escala)
+        if ganho is not None:
+            np.clip(dados, -1.0, 1.0, out=dados)
+        return dados
+
+    def renderizar_completo(self, parametros):
+        """
+        Renderiza (ou obtém do cache) o resultado completo.
+
+        Returns:
+            numpy.ndarray: Resultado equivalente ao de processar_dados
+        """
+        resultado = self._obter_resultado(self.chave(parametros), parametros)
+        indice = resultado.pendente(0)
+        while indice is not None:
+            self._garantir(resultado, parametros, indice)
+            indice = resultado.pendente(indice)
+        return self._formatar(resultado.completo)
+
+    def renderizar_trecho(self, parametros, inicio, fim):
+        """
+        Renderiza apenas os quadros [inicio, fim) do resultado.
+
+        Só os trechos da grade que cobrem a janela e ainda não estão em cache
+        são calculados. No modo de IR, a janela é normalizada pelo próprio pico
+        enquanto o resultado completo não estiver pronto.
+
+        Args:
+            parametros (dict): atraso_ms, decaimento, realimentacao e caminho_ir
+            inicio (int): Primeiro quadro da janela
+            fim (int): Quadro seguinte ao último da janela
+
+        Returns:
+            numpy.ndarray: Quadros da janela
+        """
+        resultado = self._obter_resultado(self.chave(parametros), parametros)
+        if resultado.completo is not None:
+            return self._formatar(resultado.completo[inicio:fim])
+        primeiro = inicio // self.quadros_trecho
+        ultimo = -(-fim // self.quadros_trecho)
+        for indice in range(primeiro, ultimo):
+            self._garantir(resultado, parametros, indice)
+        base = primeiro * self.quadros_trecho
+        trecho = self._juntar(resultado, primeiro, ultimo)[inicio - base:fim - base]
+        if resultado.normalizar and resultado.completo is None:
+            trecho = normalizar_pico(np.array(trecho))
+        return self._formatar(trecho)
+
+    def iniciar(self, parametros, posicao_s=0.0, ao_estender=None):
+        """
+        Renderiza a primeira janela a partir da posição e continua o restante
+        em segundo plano, trecho a trecho.
+
+        Renderizações em andamento com outros ajustes são canceladas; uma em
+        andamento com os mesmos ajustes é reaproveitada e passa a entregar os
+        trechos a este ao_estender.
+
+        Args:
+            parametros (dict): atraso_ms, decaimento, realimentacao e caminho_ir
+            posicao_s (float): Posição inicial da reprodução em segundos
+            ao_estender (callable, optional): Chamado na thread de fundo com
+                (chave, quadros seguintes) para cada parte do restante, em
+                ordem e sem lacunas. Não é chamado se o resultado completo já
+                estava em cache.
+
+        Returns:
+            tuple: (chave, quadros da janela inicial, resultado completo ou None)
+        """
+        chave = self.chave(parametros)
+        inicio = int(posicao_s * self.taxa_amostragem)
+        completo = self.resultado(parametros)
+        if completo is not None:
+            self.parar()
+            return chave, completo[inicio:], completo
+
+        resultado = self._obter_resultado(chave, parametros)
+        with self._trava:
+            for outra, renderizacao in list(self._em_andamento.items()):
+                if outra != chave:
+                    renderizacao.cancelada.set()
+                    del self._em_andamento[outra]
+            renderizacao = self._em_andamento.get(chave)
+            if renderizacao is None:
+                renderizacao = _Renderizacao(resultado, parametros)
+                self._em_andamento[chave] = renderizacao
+            renderizacao.ouvinte = None
+
+        # A primeira janela tem ao menos meio trecho, para que a próxima parte
+        # chegue antes de ela terminar de tocar
+        passo = self.quadros_trecho
+        primeiro = inicio // passo
+        seguinte = -(-(inicio + passo // 2) // passo)
+        for indice in range(primeiro, seguinte):
+            self._garantir(resultado, parametros, indice)
+        if resultado.quantidade is not None:
+            seguinte = min(seguinte, max(resultado.quantidade, primeiro + 1))
+        janela = self._juntar(resultado, primeiro, seguinte)[inicio - primeiro * passo:]
+        ganho = None
+        if resultado.normalizar:
+            # Como em renderizar_trecho, a janela é normalizada pelo próprio
+            # pico; as partes seguintes usam o mesmo ganho, sem salto de volume
+            pico = pico_absoluto(janela) or resultado.pico
+            ganho = 1.0 / pico if pico > 0 else 1.0
+            janela = np.clip(janela * ganho, -1.0, 1.0)
+
+        with self._trava:
+            renderizacao.ouvinte = (ao_estender, seguinte, ganho)
+            renderizacao.posicao = seguinte
+            if not renderizacao.ativa and self._em_andamento.get(chave) is renderizacao:
+                renderizacao.ativa = True
+                threading.Thread(target=self._executar, args=(chave, renderizacao),
+                                 name='eco-previa', daemon=True).start()
+        return chave, self._formatar(janela), None
+
+    def _executar(self, chave, renderizacao):
+        """Renderiza os trechos pendentes a partir da posição, entregando-os ao ouvinte."""
+        resultado = renderizacao.resultado
+        try:
+            while not renderizacao.cancelada.is_set():
+                with self._trava:
+                    indice = resultado.pendente(renderizacao.posicao)
+                    if indice is None:
+                        break
+                    renderizacao.posicao = indice
+                self._garantir(resultado, renderizacao.parametros, indice)
+                self._entregar(chave, renderizacao)
+            self._entregar(chave, renderizacao)
+        finally:
+            with self._trava:
+                renderizacao.ativa = False
+                if self._em_andamento.get(chave) is renderizacao:
+                    del self._em_andamento[chave]
+
+    def _entregar(self, chave, renderizacao):
+        """Entrega ao ouvinte os trechos contíguos já prontos depois do último entregue."""
+        with self._trava:
+            ouvinte = renderizacao.ouvinte
+        if ouvinte is None or renderizacao.cancelada.is_set():
+            return
+        ao_estender, proximo, ganho = ouvinte
+        ultimo = renderizacao.resultado.pendente(proximo)
+        if ultimo is None:
+            ultimo = renderizacao.resultado.quantidade
+        if ultimo <= proximo:
+            return
+        with self._trava:
+            if renderizacao.ouvinte is not ouvinte:
+                return
+            renderizacao.ouvinte = (ao_estender, ultimo, ganho)
+        if ao_estender is not None:
+            ao_estender(chave, self._formatar(
+                self._juntar(renderizacao.resultado, proximo, ultimo, ganho)))
+
+    def parar(self):
+        """Cancela as renderizações em segundo plano em andamento."""
+        with self._trava:
+            for renderizacao in self._em_andamento.values():
+                renderizacao.cancelada.set()
+            self._em_andamento.clear()
@@ -0,0 +1,92 @@
+"""Funções de processamento em memória independentes da interface gráfica."""
+
+import numpy as np
+
+from .atraso import Derivacao, aplicar_eco
+from .banco_ir import banco_padrao
+
+
+def validar_parametros(atraso_ms, decaimento, realimentacao=False):
+    """
+    Converte e valida os parâmetros do eco.
+
+    Args:
+        atraso_ms: Atraso do eco em milissegundos (texto ou número)
+        decaimento: Fator de decaimento do eco (texto ou número)
+        realimentacao (bool): Se True, o eco será usado com realimentação, que
+            só decai com decaimento menor que 1.0
+
+    Returns:
+        tuple: (atraso_ms como int, decaimento como float)
+
+    Raises:
+        ValueError: Se algum parâmetro for inválido
+    """
+    atraso = int(atraso_ms)
+    if atraso <= 0:
+        raise ValueError("O atraso deve ser um número positivo")
+
+    decay = float(decaimento)
+    if not 0.0 <= decay <= 1.0:
+        raise ValueError("O decaimento deve estar entre 0.0 e 1.0")
+    if realimentacao and decay >= 1.0:
+        raise ValueError("Com realimentação, o decaimento deve ser menor que 1.0")
+
+    return atraso, decay
+
+
+def pico_absoluto(dados_audio):
+    """
+    Retorna o maior valor absoluto do sinal sem criar uma cópia de np.abs.
+
+    Args:
+        dados_audio (numpy.ndarray): Sinal de entrada
+
+    Returns:
+        float: Pico absoluto (0.0 para um sinal vazio)
+    """
+    if not dados_audio.size:
+        return 0.0
+    return max(float(np.max(dados_audio)), -float(np.min(dados_audio)))
+
+
+def normalizar_pico(dados_audio):
+    """
+    Normaliza o sinal pelo pico absoluto e limita a [-1.0, 1.0], no próprio array.
+
+    Args:
+        dados_audio (numpy.ndarray): Sinal a ser normalizado
+
+    Returns:
+        numpy.ndarray: O mesmo array, normalizado
+    """
+    pico = pico_absoluto(dados_audio)
+    if pico > 0:
+        dados_audio *= 1.0 / pico
+    return np.clip(dados_audio, -1.0, 1.0, out=dados_audio)
+
+
+def processar_dados(dados_audio, taxa_amostragem, atraso_ms, decaimento, realimentacao=False,
+                    caminho_ir=None, banco=None):
+    """
+    Aplica o eco ou a resposta de impulso a um sinal já carregado.
+
+    Args:
+        dados_audio (numpy.ndarray): Áudio (quadros,) ou (quadros, canais)
+        taxa_amostragem (int): Taxa de amostragem do áudio
+        atraso_ms (int): Atraso do eco em milissegundos
+        decaimento (float): Fator de decaimento do eco (0.0 a 1.0)
+        realimentacao (bool): Se True, o eco se repete até decair abaixo do limiar
+        caminho_ir (str, optional): Se informado, aplica esta resposta de impulso
+            em vez do eco
+        banco (BancoIR, optional): Banco de IRs. Se None, usa o banco do processo.
+
+    Returns:
+        numpy.ndarray: Áudio processado
+    """
+    if caminho_ir:
+        impulso = (banco or banco_padrao()).obter(caminho_ir, taxa_amostragem,
+                                                  np.result_type(dados_audio.dtype, np.float32))
+        return normalizar_pico(impulso.convolver(dados_audio))
+    return aplicar_eco(dados_audio, taxa_amostragem, [Derivacao(atraso_ms, decaimento)],
+                       realimentacao=realimentacao)
@@ -0,0 +1,186 @@
+"""Reprodução de pré-visualização direto da memória, sem arquivos temporários."""
+
+from collections import deque
+
+import numpy as np
+
+# Tamanho do buffer do mixer em quadros; valores menores reduzem a latência
+BUFFER_MIXER = 512
+
+
+def _importar_pygame():
+    """Importa o pygame apenas quando a reprodução é usada."""
+    import pygame
+    return pygame
+
+
+def converter_para_mixer(dados_audio, bits, canais):
+    """
+    Converte o sinal em ponto flutuante para o formato de amostra do mixer.
+
+    Args:
+        dados_audio (numpy.ndarray): Áudio (quadros,) ou (quadros, canais) em [-1.0, 1.0]
+        bits (int): Formato do mixer como retornado por pygame.mixer.get_init()
+            (negativo para inteiros com sinal, 32 para float)
+        canais (int): Número de canais do mixer
+
+    Returns:
+        numpy.ndarray: Array C-contíguo (quadros, canais) no tipo do mixer
+    """
+    entrada = dados_audio[:, np.newaxis] if dados_audio.ndim == 1 else dados_audio
+    if entrada.shape[1] == canais:
+        mapeado = entrada
+    elif canais == 1:
+        mapeado = entrada.mean(axis=1, keepdims=True)
+    elif entrada.shape[1] == 1:
+        mapeado = np.broadcast_to(entrada, (len(entrada), canais))
+    elif entrada.shape[1] > canais:
+        mapeado = entrada[:, :canais]
+    else:
+        mapeado = np.zeros((len(entrada), canais), dtype=entrada.dtype)
+        mapeado[:, :entrada.shape[1]] = entrada
+
+    if bits == 32:
+        return np.ascontiguousarray(np.clip(mapeado, -1.0, 1.0), dtype=np.float32)
+
+    tamanho = abs(bits)
+    escala = float(2 ** (tamanho - 1) - 1)
+    convertido = np.empty(mapeado.shape, dtype=np.float32)
+    np.clip(mapeado, -1.0, 1.0, out=convertido)
+    convertido *= escala
+    if bits > 0:
+        # Formatos sem sinal são deslocados para o meio da escala
+        convertido += escala + 1
+        return convertido.astype(np.dtype(f'u{tamanho // 8}'))
+    return convertido.astype(np.dtype(f'i{tamanho // 8}'))
+
+
+class ReprodutorPrevia:
+    """
+    Toca buffers NumPy por um mixer do pygame que permanece aberto.
+
+    O mixer só é reiniciado quando a taxa de amostragem muda; cada buffer é
+    convertido uma única vez para o formato do mixer e entregue diretamente a
+    um pygame.mixer.Sound, sem passar pelo disco.
+
+    Buffers enfileirados esperam em uma fila própria: o canal do pygame só
+    aceita um som agendado por vez, então atualizar() deve ser chamado
+    periodicamente (por exemplo, com root.after) para passar o próximo ao
+    canal assim que a vaga abrir.
+    """
+
+    def __init__(self, buffer=BUFFER_MIXER):
+        """
+        Args:
+            buffer (int): Tamanho do buffer do mixer em quadros
+        """
+        self.buffer = buffer
+        self._som = None
+        self._canal = None
+        self._chave = None
+        self._som_chave = None
+        self._pendentes = deque()
+
+    def _garantir_mixer(self, taxa_amostragem):
+        """Inicializa o mixer na taxa pedida, reaproveitando-o se já estiver nela."""
+        pygame = _importar_pygame()
+        atual = pygame.mixer.get_init()
+        if atual is None or atual[0] != taxa_amostragem:
+            if atual is not None:
+                pygame.mixer.quit()
+            # Sons criados para o mixer anterior não servem mais
+            self._chave = None
+            self._som_chave = None
+            pygame.mixer.init(frequency=int(taxa_amostragem), size=-16, channels=2,
+                              buffer=self.buffer)
+            atual = pygame.mixer.get_init()
+        return pygame, atual
+
+    def preparar(self, dados_audio, taxa_amostragem):
+        """
+        Converte o buffer para o mixer e cria o som correspondente.
+
+        Returns:
+            pygame.mixer.Sound: Som pronto para tocar
+        """
+        pygame, (_, bits, canais) = self._garantir_mixer(taxa_amostragem)
+        return pygame.mixer.Sound(buffer=converter_para_mixer(dados_audio, bits, canais))
+
+    def tocar(self, dados_audio, taxa_amostragem, chave=None):
+        """
+        Interrompe a reprodução atual e toca o buffer informado.
+
+        Args:
+            dados_audio (numpy.ndarray): Áudio (quadros,) ou (quadros, canais)
+            taxa_amostragem (int): Taxa de amostragem do áudio
+            chave (optional): Identifica o conteúdo do buffer; se for igual à
+                da última chamada, o som já convertido é reaproveitado.
+        """
+        self.parar()
+        if chave is None or chave != self._chave or self._som_chave is None:
+            som = self.preparar(dados_audio, taxa_amostragem)
+            self._chave, self._som_chave = chave, (som if chave is not None else None)
+        else:
+            som = self._som_chave
+        self._som = som
+        self._canal = som.play()
+
+    def enfileirar(self, dados_audio, taxa_amostragem):
+        """
+        Agenda um buffer para tocar depois dos que já foram tocados ou agendados.
+
+        Se o som anterior terminar antes de o buffer chegar, a reprodução
+        recomeça por ele.
+
+        Args:
+            dados_audio (numpy.ndarray): Áudio (quadros,) ou (quadros, canais)
+            taxa_amostragem (int): Taxa de amostragem do áudio
+
+        Returns:
+            bool: False se a reprodução foi parada (nada foi agendado)
+        """
+        if self._canal is None:
+            return False
+        if len(dados_audio):
+            self._pendentes.append(self.preparar(dados_audio, taxa_amostragem))
+            self.atualizar()
+        return True
+
+    def atualizar(self):
+        """
+        Passa o próximo buffer pendente ao canal, se houver vaga.
+
+        Returns:
+            bool: True enquanto houver buffers esperando
+        """
+        if self._canal is None or not self._pendentes:
+            return False
+        if not self._canal.get_busy():
+            canal = self._pendentes[0].play()
+            if canal is not None:
+                self._som = self._pendentes.popleft()
+                self._canal = canal
+        elif self._canal.get_queue() is None:
+            self._canal.queue(self._pendentes.popleft())
+        return bool(self._pendentes)
+
+    def tocando(self):
+        """Indica se há som em reprodução."""
+        return self._canal is not None and self._canal.get_busy()
+
+    def parar(self):
+        """Para a reprodução atual, se houver, e descarta os buffers agendados."""
+        if self._canal is not None:
+            self._canal.stop()
+        self._canal = None
+        self._som = None
+        self._pendentes.clear()
+
+    def encerrar(self):
+        """Para a reprodução e fecha o mixer."""
+        self.parar()
+        self._chave = None
+        self._som_chave = None
+        pygame = _importar_pygame()
+        if pygame.mixer.get_init() is not None:
+            pygame.mixer.quit()
@@ -0,0 +1,677 @@
+"""Serviço que observa pastas de entrada e processa os arquivos novos por uma fila persistente."""
+
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import soundfile as sf
+
+from .banco_ir import banco_padrao
+from .cache_resultados import LIMITE_CACHE_PADRAO, CacheResultados
+from .dinamica import ALVO_SONORIDADE_PADRAO, NORMALIZACOES, TETO_PADRAO_DB
+from .cli import ATRASO_PADRAO, DECAIMENTO_PADRAO, EXTENSOES_AUDIO, SUFIXO_SAIDA
+from .fluxo import PRECISOES, SUBTIPOS_SAIDA
+from .lote import Tarefa, _processar_tarefa
+from .metricas import RegistroMetricas
+from .processamento import validar_parametros
+
+ESTADOS = ('pendente', 'executando', 'concluido', 'erro')
+
+# Tentativas de um trabalho antes de marcá-lo como erro definitivo
+TENTATIVAS_PADRAO = 3
+
+# Espera antes da primeira nova tentativa; dobra a cada falha
+ESPERA_NOVA_TENTATIVA_S = 5.0
+
+# Intervalo entre varreduras das pastas observadas
+INTERVALO_VARREDURA_S = 2.0
+
+# Entradas pendentes consultadas para descobrir as taxas em que o IR é pré-carregado
+AMOSTRA_TAXAS = 32
+
+# Idade mínima (desde a última modificação) para um arquivo ser considerado
+# completo; evita processar arquivos que ainda estão sendo copiados
+IDADE_MINIMA_S = 2.0
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS trabalhos (
+    id INTEGER PRIMARY KEY,
+    entrada TEXT NOT NULL UNIQUE,
+    saida TEXT NOT NULL,
+    parametros TEXT NOT NULL,
+    prioridade INTEGER NOT NULL DEFAULT 0,
+    estado TEXT NOT NULL DEFAULT 'pendente',
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    max_tentativas INTEGER NOT NULL,
+    tamanho INTEGER,
+    mtime_ns INTEGER,
+    erro TEXT,
+    medicao TEXT,
+    criado_em REAL NOT NULL,
+    atualizado_em REAL NOT NULL,
+    disponivel_em REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS trabalhos_fila
+    ON trabalhos (estado, prioridade DESC, disponivel_em, id);
+"""
+
+
+class FilaTrabalhos:
+    """
+    Fila de trabalhos persistida em SQLite.
+
+    Cada arquivo de entrada tem no máximo um trabalho; se o arquivo mudar
+    (tamanho ou data de modificação), o trabalho volta para 'pendente'. O
+    banco usa journal WAL e cada mudança de estado é uma transação, então
+    uma queda do serviço não perde trabalhos: ao reabrir, recuperar() devolve
+    à fila os que estavam em execução.
+    """
+
+    def __init__(self, caminho):
+        """
+        Args:
+            caminho (str): Arquivo do banco de dados (criado se não existir)
+        """
+        self.caminho = caminho
+        pasta = os.path.dirname(os.path.abspath(caminho))
+        os.makedirs(pasta, exist_ok=True)
+        self._conexao = sqlite3.connect(caminho, isolation_level=None, check_same_thread=False)
+        self._conexao.row_factory = sqlite3.Row
+        self._trava = threading.Lock()
+        with self._trava:
+            self._conexao.execute("PRAGMA journal_mode=WAL")
+            self._conexao.execute("PRAGMA synchronous=NORMAL")
+            self._conexao.executescript(_ESQUEMA)
+
+    def fechar(self):
+        """Fecha a conexão com o banco."""
+        with self._trava:
+            self._conexao.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.fechar()
+
+    def _transacao(self, funcao, *args):
+        """Executa funcao(conexao, *args) em uma transação exclusiva de escrita."""
+        with self._trava:
+            self._conexao.execute("BEGIN IMMEDIATE")
+            try:
+                resultado = funcao(self._conexao, *args)
+            except BaseException:
+                self._conexao.execute("ROLLBACK")
+                raise
+            self._conexao.execute("COMMIT")
+            return resultado
+
+    def enfileirar(self, caminho_entrada, caminho_saida, parametros, prioridade=0,
+                   max_tentativas=TENTATIVAS_PADRAO):
+        """
+        Enfileira o arquivo, ou o reenfileira se ele mudou desde o último trabalho.
+
+        Args:
+            caminho_entrada (str): Arquivo de áudio de origem
+            caminho_saida (str): Arquivo a ser gerado
+            parametros (dict): Argumentos nomeados de processar_arquivo
+            prioridade (int): Trabalhos de maior prioridade são executados antes
+            max_tentativas (int): Execuções permitidas antes de desistir
+
+        Returns:
+            bool: True se um trabalho foi criado ou reiniciado
+        """
+        caminho_entrada = os.path.abspath(caminho_entrada)
+        info = os.stat(caminho_entrada)
+        agora = time.time()
+
+        def gravar(conexao):
+            atual = conexao.execute(
+                "SELECT tamanho, mtime_ns, estado FROM trabalhos WHERE entrada = ?",
+                (caminho_entrada,)).fetchone()
+            if atual is not None and atual['tamanho'] == info.st_size and \
+                    atual['mtime_ns'] == info.st_mtime_ns:
+                return False
+            conexao.execute(
+                """INSERT INTO trabalhos (entrada, saida, parametros, prioridade, estado,
+                       tentativas, max_tentativas, tamanho, mtime_ns, criado_em,
+                       atualizado_em, disponivel_em)
+                   VALUES (?, ?, ?, ?, 'pendente', 0, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (entrada) DO UPDATE SET
+                       saida = excluded.saida, parametros = excluded.parametros,
+                       prioridade = excluded.prioridade, estado = 'pendente', tentativas = 0,
+                       max_tentativas = excluded.max_tentativas, tamanho = excluded.tamanho,
+                       mtime_ns = excluded.mtime_ns, erro = NULL, medicao = NULL,
+                       criado_em = excluded.criado_em, atualizado_em = excluded.atualizado_em,
+                       disponivel_em = excluded.disponivel_em""",
+                (caminho_entrada, caminho_saida, json.dumps(parametros), prioridade,
+                 max_tentativas, info.st_size, info.st_mtime_ns, agora, agora, agora))
+            return True
+
+        return self._transacao(gravar)
+
+    def assinaturas(self):
+        """
+        Returns:
+            dict: Caminho de entrada -> (tamanho, mtime_ns) de todos os trabalhos
+        """
+        with self._trava:
+            linhas = self._conexao.execute(
+                "SELECT entrada, tamanho, mtime_ns FROM trabalhos").fetchall()
+        return {linha['entrada']: (linha['tamanho'], linha['mtime_ns']) for linha in linhas}
+
+    def pendentes(self, limite=AMOSTRA_TAXAS):
+        """
+        Returns:
+            list: Caminhos de entrada dos próximos trabalhos pendentes, na ordem da fila
+        """
+        with self._trava:
+            linhas = self._conexao.execute(
+                "SELECT entrada FROM trabalhos WHERE estado = 'pendente' "
+                "ORDER BY prioridade DESC, disponivel_em, id LIMIT ?", (limite,)).fetchall()
+        return [linha['entrada'] for linha in linhas]
+
+    def recuperar(self):
+        """
+        Devolve à fila os trabalhos que ficaram em execução (queda do serviço).
+
+        Returns:
+            int: Número de trabalhos recuperados
+        """
+        def gravar(conexao):
+            return conexao.execute(
+                "UPDATE trabalhos SET estado = 'pendente', atualizado_em = ? "
+                "WHERE estado = 'executando'", (time.time(),)).rowcount
+
+        return self._transacao(gravar)
+
+    def proximo(self):
+        """
+        Reserva o próximo trabalho disponível (maior prioridade, mais antigo).
+
+        Returns:
+            sqlite3.Row: O trabalho, já marcado como 'executando', ou None
+        """
+        def reservar(conexao):
+            agora = time.time()
+            linha = conexao.execute(
+                "SELECT * FROM trabalhos WHERE estado = 'pendente' AND disponivel_em <= ? "
+                "ORDER BY prioridade DESC, disponivel_em, id LIMIT 1", (agora,)).fetchone()
+            if linha is None:
+                return None
+            conexao.execute(
+                "UPDATE trabalhos SET estado = 'executando', tentativas = tentativas + 1, "
+                "atualizado_em = ? WHERE id = ?", (agora, linha['id']))
+            return linha
+
+        return self._transacao(reservar)
+
+    def concluir(self, id_trabalho, medicao=None):
+        """Marca o trabalho como concluído, guardando sua medição."""
+        def gravar(conexao):
+            conexao.execute(
+                "UPDATE trabalhos SET estado = 'concluido', erro = NULL, medicao = ?, "
+                "atualizado_em = ? WHERE id = ?",
+                (json.dumps(medicao) if medicao else None, time.time(), id_trabalho))
+
+        self._transacao(gravar)
+
+    def falhar(self, id_trabalho, erro, espera_s=ESPERA_NOVA_TENTATIVA_S):
+        """
+        Registra uma falha; o trabalho volta à fila com espera exponencial até
+        esgotar as tentativas, quando passa para 'erro'.
+
+        Returns:
+            bool: True se haverá nova tentativa
+        """
+        def gravar(conexao):
+            linha = conexao.execute("SELECT tentativas, max_tentativas FROM trabalhos WHERE id = ?",
+                                    (id_trabalho,)).fetchone()
+            agora = time.time()
+            repetir = linha is not None and linha['tentativas'] < linha['max_tentativas']
+            espera = espera_s * 2 ** (linha['tentativas'] - 1) if repetir else 0.0
+            conexao.execute(
+                "UPDATE trabalhos SET estado = ?, erro = ?, atualizado_em = ?, disponivel_em = ? "
+                "WHERE id = ?",
+                ('pendente' if repetir else 'erro', erro, agora, agora + espera, id_trabalho))
+            return repetir
+
+        return self._transacao(gravar)
+
+    def repetir_erros(self):
+        """
+        Devolve à fila todos os trabalhos em erro, com as tentativas zeradas.
+
+        Returns:
+            int: Número de trabalhos reenfileirados
+        """
+        def gravar(conexao):
+            agora = time.time()
+            return conexao.execute(
+                "UPDATE trabalhos SET estado = 'pendente', tentativas = 0, atualizado_em = ?, "
+                "disponivel_em = ? WHERE estado = 'erro'", (agora, agora)).rowcount
+
+        return self._transacao(gravar)
+
+    def status(self, limite_erros=20):
+        """
+        Resume o estado da fila.
+
+        Args:
+            limite_erros (int): Quantos erros recentes incluir
+
+        Returns:
+            dict: Contagem por estado, trabalhos em execução e erros recentes
+        """
+        with self._trava:
+            contagens = dict.fromkeys(ESTADOS, 0)
+            for linha in self._conexao.execute(
+                    "SELECT estado, COUNT(*) AS n FROM trabalhos GROUP BY estado"):
+                contagens[linha['estado']] = linha['n']
+            executando = [linha['entrada'] for linha in self._conexao.execute(
+                "SELECT entrada FROM trabalhos WHERE estado = 'executando' ORDER BY atualizado_em")]
+            erros = [
+                {'entrada': linha['entrada'], 'tentativas': linha['tentativas'],
+                 'erro': linha['erro'], 'estado': linha['estado']}
+                for linha in self._conexao.execute(
+                    "SELECT entrada, tentativas, erro, estado FROM trabalhos "
+                    "WHERE erro IS NOT NULL ORDER BY atualizado_em DESC LIMIT ?", (limite_erros,))
+            ]
+        return {'trabalhos': contagens, 'executando': executando, 'erros': erros}
+
+
+def _aquecer_trabalhador(caminho_ir, taxas, precisao):
+    """
+    Inicializa um processo do pool já com o IR decodificado e transformado.
+
+    O banco guarda o IR pela taxa de destino, então ele é preparado em cada
+    taxa das entradas que os trabalhos vão processar, com os espectros na
+    precisão em que eles processam.
+    """
+    if not caminho_ir:
+        return
+    for taxa in taxas:
+        try:
+            banco_padrao().obter(caminho_ir, taxa, precisao)
+        except Exception:
+            # Um IR ilegível é reportado pelos próprios trabalhos
+            return
+
+
+class ServicoEco:
+    """
+    Observa pastas de entrada e processa arquivos novos ou alterados.
+
+    As pastas são varridas periodicamente; um arquivo entra na fila quando
+    está há IDADE_MINIMA_S sem ser modificado. O pool de processos é criado
+    uma única vez e mantido entre trabalhos, então cada processo conserva o
+    banco de IRs (decodificados e já transformados) e os módulos carregados.
+    """
+
+    def __init__(self, pastas, pasta_destino, parametros, fila, trabalhadores=None,
+                 recursivo=False, intervalo_s=INTERVALO_VARREDURA_S, idade_minima_s=IDADE_MINIMA_S,
+                 max_tentativas=TENTATIVAS_PADRAO, cache=None, ao_medir=None, ao_evento=None,
+                 taxas=None):
+        """
+        Args:
+            pastas (dict): Pasta observada -> prioridade dos seus arquivos
+            pasta_destino (str): Pasta das saídas; a estrutura de subpastas é mantida
+            parametros (dict): Argumentos nomeados de processar_arquivo
+            fila (FilaTrabalhos): Fila persistente
+            trabalhadores (int, optional): Processos do pool (padrão: número de CPUs)
+            recursivo (bool): Se True, observa também as subpastas
+            intervalo_s (float): Intervalo entre varreduras
+            idade_minima_s (float): Tempo sem modificação para enfileirar um arquivo
+            max_tentativas (int): Execuções de cada trabalho antes de desistir
+            cache (CacheResultados, optional): Cache de resultados
+            ao_medir (callable, optional): Recebe o dict de medição de cada trabalho
+            ao_evento (callable, optional): Recebe uma linha de texto por evento
+            taxas (list, optional): Taxas de amostragem das entradas, em que o IR
+                é preparado ao iniciar cada processo. Se None, usa as taxas das
+                entradas na fila quando o pool é criado.
+        """
+        self.pastas = {os.path.abspath(pasta): prioridade for pasta, prioridade in pastas.items()}
+        self.pasta_destino = os.path.abspath(pasta_destino)
+        self.parametros = parametros
+        self.fila = fila
+        self.trabalhadores = trabalhadores or os.cpu_count() or 1
+        self.recursivo = recursivo
+        self.intervalo_s = intervalo_s
+        self.idade_minima_s = idade_minima_s
+        self.max_tentativas = max_tentativas
+        self.cache = cache
+        self.ao_medir = ao_medir
+        self.ao_evento = ao_evento or (lambda mensagem: None)
+        self.taxas = taxas
+        self._parar = threading.Event()
+        self._conhecidos = {}
+
+    def parar(self):
+        """Pede o encerramento; os trabalhos em andamento terminam antes."""
+        self._parar.set()
+
+    def caminho_saida(self, caminho_entrada, pasta):
+        """Monta a saída em pasta_destino, mantendo o caminho relativo à pasta observada."""
+        relativo = os.path.relpath(os.path.dirname(caminho_entrada), pasta)
+        nome_base = os.path.splitext(os.path.basename(caminho_entrada))[0]
+        return os.path.normpath(os.path.join(self.pasta_destino, relativo,
+                                             f"{nome_base}{SUFIXO_SAIDA}"))
+
+    def _arquivos(self, pasta):
+        """Percorre os arquivos de áudio da pasta, sem entrar na pasta de destino."""
+        for raiz, subpastas, arquivos in os.walk(pasta):
+            if not self.recursivo:
+                subpastas[:] = []
+            subpastas[:] = [nome for nome in subpastas
+                            if os.path.join(raiz, nome) != self.pasta_destino]
+            for nome in sorted(arquivos):
+                if nome.lower().endswith(EXTENSOES_AUDIO) and not nome.endswith(SUFIXO_SAIDA):
+                    yield os.path.join(raiz, nome)
+
+    def varrer(self):
+        """
+        Enfileira os arquivos novos ou alterados das pastas observadas.
+
+        Returns:
+            int: Número de trabalhos criados ou reiniciados
+        """
+        agora = time.time()
+        enfileirados = 0
+        for pasta, prioridade in self.pastas.items():
+            for caminho in self._arquivos(pasta):
+                try:
+                    info = os.stat(caminho)
+                except OSError:
+                    continue
+                assinatura = (info.st_size, info.st_mtime_ns)
+                if self._conhecidos.get(caminho) == assinatura:
+                    continue
+                if agora - info.st_mtime < self.idade_minima_s:
+                    continue
+                saida = self.caminho_saida(caminho, pasta)
+                if self.fila.enfileirar(caminho, saida, self.parametros, prioridade,
+                                        self.max_tentativas):
+                    enfileirados += 1
+                    self.ao_evento(f"Enfileirado: {caminho}")
+                self._conhecidos[caminho] = assinatura
+        return enfileirados
+
+    def _restaurar(self, trabalho, parametros):
+        """Conclui o trabalho pelo cache de resultados, se possível."""
+        if self.cache is None:
+            return False
+        tarefa = Tarefa(trabalho['entrada'], trabalho['saida'])
+        try:
+            if not self.cache.restaurar(tarefa, parametros):
+                return False
+        except OSError:
+            return False
+        self.fila.concluir(trabalho['id'])
+        self.ao_evento(f"Reaproveitado do cache: {trabalho['entrada']}")
+        return True
+
+    def executar(self, uma_vez=False):
+        """
+        Executa o serviço até parar() ser chamado.
+
+        Args:
+            uma_vez (bool): Se True, varre as pastas, processa a fila e retorna
+        """
+        recuperados = self.fila.recuperar()
+        if recuperados:
+            self.ao_evento(f"{recuperados} trabalhos interrompidos voltaram à fila")
+        self._conhecidos = {caminho: assinatura
+                            for caminho, assinatura in self.fila.assinaturas().items()}
+
+        # 'spawn' evita herdar threads e estado do processo principal no fork
+        contexto = multiprocessing.get_context('spawn')
+        em_andamento = {}
+        # Varre antes de criar o pool para aquecê-lo nas taxas das entradas já na fila
+        self.varrer()
+        proxima_varredura = time.monotonic() + self.intervalo_s
+        executor = self._criar_pool(contexto)
+        try:
+            while not self._parar.is_set() or em_andamento:
+                if not self._parar.is_set() and time.monotonic() >= proxima_varredura:
+                    self.varrer()
+                    proxima_varredura = time.monotonic() + self.intervalo_s
+
+                while not self._parar.is_set() and len(em_andamento) < self.trabalhadores:
+                    trabalho = self.fila.proximo()
+                    if trabalho is None:
+                        break
+                    parametros = json.loads(trabalho['parametros'])
+                    if self._restaurar(trabalho, parametros):
+                        continue
+                    os.makedirs(os.path.dirname(trabalho['saida']), exist_ok=True)
+                    tarefa = Tarefa(trabalho['entrada'], trabalho['saida'])
+                    try:
+                        futuro = executor.submit(_processar_tarefa, tarefa, parametros,
+                                                 trabalho['criado_em'])
+                    except BrokenProcessPool as e:
+                        # Os trabalhos em andamento no pool quebrado falham pelos futuros
+                        self._falhar(trabalho, e)
+                        executor = self._recriar_pool(executor, contexto)
+                        continue
+                    em_andamento[futuro] = (trabalho, tarefa, parametros, executor)
+
+                if not em_andamento:
+                    if uma_vez:
+                        break
+                    self._parar.wait(self.intervalo_s)
+                    continue
+
+                concluidos, _ = wait(em_andamento, timeout=self.intervalo_s,
+                                     return_when=FIRST_COMPLETED)
+                for futuro in concluidos:
+                    trabalho, tarefa, parametros, origem = em_andamento.pop(futuro)
+                    self._registrar(futuro, trabalho, tarefa, parametros)
+                    if origem is executor and isinstance(futuro.exception(), BrokenProcessPool):
+                        executor = self._recriar_pool(executor, contexto)
+        finally:
+            executor.shutdown(wait=True)
+
+    def _criar_pool(self, contexto):
+        """Cria o pool de processos, já com o IR carregado em cada processo."""
+        caminho_ir = self.parametros.get('caminho_ir')
+        taxas = self._taxas_aquecimento() if caminho_ir else []
+        return ProcessPoolExecutor(max_workers=self.trabalhadores, mp_context=contexto,
+                                   initializer=_aquecer_trabalhador,
+                                   initargs=(caminho_ir, taxas,
+                                             self.parametros.get('precisao', 'float64')))
+
+    def _taxas_aquecimento(self):
+        """
+        Taxas em que o IR é preparado: as informadas ou as das próximas entradas
+        da fila; sem nenhuma das duas, a do próprio IR.
+        """
+        if self.taxas:
+            return sorted(set(self.taxas))
+        taxas = set()
+        for caminho in self.fila.pendentes():
+            try:
+                taxas.add(sf.info(caminho).samplerate)
+            except Exception:
+                continue
+        if not taxas:
+            try:
+                taxas.add(sf.info(self.parametros['caminho_ir']).samplerate)
+            except Exception:
+                pass
+        return sorted(taxas)
+
+    def _recriar_pool(self, executor, contexto):
+        """
+        Substitui um pool quebrado.
+
+        Um processo trabalhador que morre (por exemplo, pelo OOM killer)
+        inutiliza o pool inteiro; o serviço segue com um pool novo e os
+        trabalhos afetados voltam à fila como falhas.
+        """
+        self.ao_evento("Um processo trabalhador terminou inesperadamente; recriando o pool")
+        executor.shutdown(wait=False, cancel_futures=True)
+        return self._criar_pool(contexto)
+
+    def _falhar(self, trabalho, erro):
+        """Registra a falha de um trabalho, agendando nova tentativa se houver."""
+        repetir = self.fila.falhar(trabalho['id'], str(erro))
+        situacao = "nova tentativa agendada" if repetir else "desistindo"
+        self.ao_evento(f"Erro em {trabalho['entrada']}: {erro} ({situacao})")
+
+    def _registrar(self, futuro, trabalho, tarefa, parametros):
+        """Grava na fila o resultado de um trabalho concluído."""
+        erro = futuro.exception()
+        if erro is not None:
+            self._falhar(trabalho, erro)
+            return
+        medicao = futuro.result()
+        if self.cache is not None:
+            try:
+                self.cache.guardar(tarefa, parametros)
+                self.cache.salvar()
+            except OSError:
+                pass
+        self.fila.concluir(trabalho['id'], medicao)
+        self.ao_evento(f"Concluído: {trabalho['saida']}")
+        if self.ao_medir is not None:
+            self.ao_medir(medicao)
+
+
+def _pasta_com_prioridade(valor):
+    """Separa 'PASTA' ou 'PASTA:PRIORIDADE'."""
+    pasta, separador, prioridade = valor.rpartition(':')
+    if separador and prioridade.lstrip('-').isdigit() and pasta:
+        return pasta, int(prioridade)
+    return valor, 0
+
+
+def criar_parser():
+    """Cria o parser dos argumentos do serviço."""
+    parser = argparse.ArgumentParser(
+        prog='eco_audio.servico',
+        description="Observa pastas e processa os arquivos de áudio novos ou alterados.")
+    parser.add_argument('pastas', nargs='*',
+                        help="Pastas observadas, opcionalmente PASTA:PRIORIDADE (maior primeiro)")
+    parser.add_argument('-o', '--saida', help="Pasta de destino")
+    parser.add_argument('--fila', default='fila_eco.sqlite3',
+                        help="Banco SQLite da fila de trabalhos (padrão: fila_eco.sqlite3)")
+    parser.add_argument('--status', action='store_true',
+                        help="Mostra o estado da fila em JSON e sai")
+    parser.add_argument('--repetir-erros', action='store_true',
+                        help="Devolve à fila os trabalhos que esgotaram as tentativas")
+    parser.add_argument('--uma-vez', action='store_true',
+                        help="Varre as pastas, processa a fila e sai")
+    parser.add_argument('-a', '--atraso', default=ATRASO_PADRAO,
+                        help="Atraso do eco em milissegundos (padrão: 200)")
+    parser.add_argument('-d', '--decaimento', default=DECAIMENTO_PADRAO,
+                        help="Decaimento do eco, de 0.0 a 1.0 (padrão: 0.5)")
+    parser.add_argument('--realimentacao', action='store_true',
+                        help="Repete o eco até decair (realimentação)")
+    parser.add_argument('--ir', help="Arquivo de resposta de impulso (substitui o eco)")
+    parser.add_argument('--precisao', choices=PRECISOES, default='float64',
+                        help="Precisão do processamento (padrão: float64)")
+    parser.add_argument('--formato', choices=SUBTIPOS_SAIDA,
+                        help="Formato de amostra da saída")
+    parser.add_argument('--normalizacao', choices=NORMALIZACOES,
+                        help="Normalização da saída (padrão: nenhuma para o eco, pico para IR)")
+    parser.add_argument('--alvo-lufs', type=float, default=ALVO_SONORIDADE_PADRAO,
+                        help="Sonoridade alvo de --normalizacao sonoridade (padrão: -16)")
+    parser.add_argument('--teto-db', type=float, default=TETO_PADRAO_DB,
+                        help="Pico máximo da saída em dBFS (padrão: 0)")
+    parser.add_argument('-j', '--trabalhadores', type=int,
+                        help="Número de processos (padrão: número de CPUs)")
+    parser.add_argument('--taxa', type=int, action='append',
+                        help="Taxa de amostragem das entradas em que o IR é preparado ao "
+                             "iniciar os processos; pode ser repetida (padrão: as das entradas "
+                             "na fila)")
+    parser.add_argument('-r', '--recursivo', action='store_true',
+                        help="Observa também as subpastas")
+    parser.add_argument('--intervalo', type=float, default=INTERVALO_VARREDURA_S,
+                        help="Segundos entre varreduras (padrão: 2)")
+    parser.add_argument('--tentativas', type=int, default=TENTATIVAS_PADRAO,
+                        help="Tentativas por trabalho (padrão: 3)")
+    parser.add_argument('--cache', nargs='?', const='', metavar='PASTA',
+                        help="Reaproveita resultados guardados no cache de resultados")
+    parser.add_argument('--cache-limite', type=int,
+                        help="Espaço máximo do cache, em MiB (padrão: 10240)")
+    parser.add_argument('--metricas',
+                        help="Acrescenta a medição de cada arquivo a este arquivo JSON lines")
+    return parser
+
+
+def main(argv=None):
+    """
+    Ponto de entrada do serviço.
+
+    Returns:
+        int: 0 ao encerrar normalmente, 2 se os argumentos forem inválidos
+    """
+    parser = criar_parser()
+    args = parser.parse_args(argv)
+    with FilaTrabalhos(args.fila) as fila:
+        if args.status or args.repetir_erros:
+            if args.repetir_erros:
+                fila.repetir_erros()
+            json.dump(fila.status(), sys.stdout, ensure_ascii=False, indent=2)
+            sys.stdout.write("\n")
+            return 0
+
+        if not args.pastas or not args.saida:
+            parser.error("Informe as pastas observadas e a pasta de destino (-o)")
+        pastas = dict(_pasta_com_prioridade(valor) for valor in args.pastas)
+        for pasta in pastas:
+            if not os.path.isdir(pasta):
+                parser.error(f"Pasta não encontrada: {pasta}")
+        try:
+            atraso_ms, decaimento = validar_parametros(args.atraso, args.decaimento,
+                                                       args.realimentacao and not args.ir)
+        except ValueError as e:
+            parser.error(str(e))
+        if args.teto_db > 0:
+            parser.error("O teto não pode passar de 0 dBFS")
+        parametros = {
+            'atraso_ms': atraso_ms,
+            'decaimento': decaimento,
+            'realimentacao': args.realimentacao,
+            'caminho_ir': os.path.abspath(args.ir) if args.ir else None,
+            'precisao': args.precisao,
+            'subtipo': args.formato,
+            'normalizacao': args.normalizacao,
+            'alvo_lufs': args.alvo_lufs,
+            'teto_db': args.teto_db,
+        }
+        cache = None
+        if args.cache is not None:
+            limite = args.cache_limite * 1024 * 1024 if args.cache_limite else LIMITE_CACHE_PADRAO
+            cache = CacheResultados(args.cache or None, limite)
+        registro = RegistroMetricas(args.metricas) if args.metricas else None
+
+        def ao_evento(mensagem):
+            print(time.strftime('%Y-%m-%d %H:%M:%S'), mensagem, file=sys.stderr, flush=True)
+
+        servico = ServicoEco(
+            pastas, args.saida, parametros, fila, trabalhadores=args.trabalhadores,
+            recursivo=args.recursivo, intervalo_s=args.intervalo, max_tentativas=args.tentativas,
+            cache=cache, ao_medir=registro.escrever if registro else None, ao_evento=ao_evento,
+            taxas=args.taxa)
+
+        def encerrar(sinal, quadro):
+            ao_evento("Encerrando após os trabalhos em andamento")
+            servico.parar()
+
+        signal.signal(signal.SIGINT, encerrar)
+        signal.signal(signal.SIGTERM, encerrar)
+        servico.executar(uma_vez=args.uma_vez)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
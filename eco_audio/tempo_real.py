@@ -0,0 +1,601 @@
+"""
+Processador em tempo real: blocos de tamanho fixo, latência constante e
+nenhum buffer de dados alocado por bloco.
+
+Uso do simulador de fluxo:
+    python -m eco_audio.tempo_real --bloco 128 --canais 2
+    python -m eco_audio.tempo_real --bloco 256 --ir irs/hall.wav --decaimento 0
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from .atraso import ms_para_amostras
+from .convolucao import _como_impulso, mapa_canais, particionar_impulso
+
+# Tamanhos de bloco aceitos (quadros por chamada, como em um driver de áudio)
+BLOCO_MINIMO_TEMPO_REAL = 64
+BLOCO_MAXIMO_TEMPO_REAL = 1024
+TAMANHO_BLOCO_TEMPO_REAL = 256
+
+# Maior atraso do eco aceito por padrão; define o tamanho da linha de atraso
+ATRASO_MAXIMO_PADRAO_MS = 2000.0
+
+# Constante de tempo da suavização dos parâmetros entre blocos
+SUAVIZACAO_PADRAO_MS = 20.0
+
+# Diferença abaixo da qual um parâmetro suavizado é considerado no alvo
+_TOLERANCIA_SUAVIZACAO = 1e-6
+
+# Memória que simular_fluxo ainda aceita por bloco: só os objetos pequenos do
+# Python criados e destruídos a cada chamada (views, números, argumentos das
+# ufuncs). Qualquer buffer de dados de um bloco passa deste valor.
+LIMITE_ALOCACAO_BYTES = 4096
+
+# O argumento `out` das FFTs do numpy existe a partir da versão 2.0
+_FFT_COM_SAIDA = np.lib.NumpyVersion(np.__version__) >= '2.0.0'
+
+# As duas FFTs usam a norma 'ortho' (1/sqrt(n) em cada sentido, o mesmo
+# produto que a convenção padrão): com ela o numpy passa o fator na precisão
+# do sinal, enquanto o padrão passa o inteiro 1 e faz a FFT em float64, com
+# cópias temporárias, quando o sinal é float32
+_NORMA = 'ortho'
+
+
+def _rfft(origem, destino):
+    """FFT real de origem (ao longo do último eixo, contíguo) gravada em destino."""
+    if _FFT_COM_SAIDA:
+        np.fft.rfft(origem, axis=-1, norm=_NORMA, out=destino)
+    else:
+        destino[:] = np.fft.rfft(origem, axis=-1, norm=_NORMA)
+
+
+def _irfft(origem, destino):
+    """FFT inversa de origem gravada em destino (destino.shape[-1] pontos)."""
+    if _FFT_COM_SAIDA:
+        np.fft.irfft(origem, destino.shape[-1], axis=-1, norm=_NORMA, out=destino)
+    else:
+        destino[:] = np.fft.irfft(origem, destino.shape[-1], axis=-1, norm=_NORMA)
+
+
+def _aproximar(atual, alvo, coeficiente):
+    """Um passo da suavização exponencial de um parâmetro em direção ao alvo."""
+    if abs(alvo - atual) <= _TOLERANCIA_SUAVIZACAO:
+        return alvo
+    return atual + (alvo - atual) * coeficiente
+
+
+class ProcessadorTempoReal:
+    """
+    Eco e convolução para uso ao vivo, em blocos de tamanho fixo.
+
+    O sinal passa pelo eco (uma linha de atraso em anel, com ou sem
+    realimentação) e, se houver impulso, por uma convolução uniformemente
+    particionada com partições do tamanho do bloco. Para só a convolução, use
+    decaimento=0.
+
+    A latência é constante e igual a `latencia` (zero): cada bloco de saída
+    corresponde ao bloco de entrada da mesma chamada, qualquer que seja o
+    impulso ou o atraso. A latência total de entrada e saída é a do
+    hospedeiro, que acumula um bloco antes de chamar processar().
+
+    Todos os buffers são alocados na construção; processar() não aloca
+    memória para dados, só os objetos pequenos do Python de cada chamada
+    (views, números). Para isso, toda operação usa operandos contíguos do
+    mesmo formato, sem broadcasting nem views transpostas (o numpy criaria
+    buffers temporários), e o estado da convolução fica com os canais
+    primeiro, para as FFTs correrem sobre o último eixo. Mudanças de parâmetros
+    (ver ajustar) não são aplicadas de uma vez: a cada bloco o valor anda uma
+    fração do caminho até o alvo, e dentro do bloco o ganho varia em rampa e
+    a troca de atraso é feita com uma transição cruzada entre as duas
+    leituras, sem cliques.
+
+    Diferente do processamento de arquivos, a convolução não é normalizada
+    pelo pico (o resultado ainda não existe); ajuste a mistura ou o nível do
+    impulso.
+    """
+
+    def __init__(self, taxa_amostragem, canais, tamanho_bloco=TAMANHO_BLOCO_TEMPO_REAL,
+                 atraso_ms=200, decaimento=0.5, realimentacao=False, impulso=None, mistura=1.0,
+                 atraso_maximo_ms=ATRASO_MAXIMO_PADRAO_MS, suavizacao_ms=SUAVIZACAO_PADRAO_MS,
+                 dtype=np.float64):
+        """
+        Args:
+            taxa_amostragem (int): Taxa de amostragem do sinal
+            canais (int): Canais da entrada
+            tamanho_bloco (int): Quadros por chamada de processar(), de 64 a 1024
+            atraso_ms (float): Atraso inicial do eco
+            decaimento (float): Ganho inicial do eco (0.0 a 1.0)
+            realimentacao (bool): Se True, o eco se repete (a saída volta à
+                linha de atraso)
+            impulso (numpy.ndarray, optional): Resposta de impulso (quadros,)
+                ou (quadros, canais), já na taxa do sinal; ver mapa_canais
+            mistura (float): Proporção do sinal convolvido (0.0 a 1.0); o
+                restante é o sinal antes da convolução
+            atraso_maximo_ms (float): Maior atraso aceito por ajustar()
+            suavizacao_ms (float): Constante de tempo da suavização dos
+                parâmetros (0 aplica cada mudança em um único bloco)
+            dtype: Tipo de ponto flutuante usado no processamento
+
+        Raises:
+            ValueError: Se o bloco ou algum parâmetro for inválido
+        """
+        if not BLOCO_MINIMO_TEMPO_REAL <= tamanho_bloco <= BLOCO_MAXIMO_TEMPO_REAL:
+            raise ValueError(f"O tamanho do bloco deve estar entre {BLOCO_MINIMO_TEMPO_REAL} "
+                             f"e {BLOCO_MAXIMO_TEMPO_REAL} quadros")
+        self.taxa_amostragem = taxa_amostragem
+        self.canais = canais
+        self.tamanho_bloco = tamanho_bloco
+        self.realimentacao = realimentacao
+        self.dtype = np.dtype(dtype)
+        self.atraso_maximo_ms = atraso_maximo_ms
+        self.latencia = 0
+        constante = suavizacao_ms / 1000 * taxa_amostragem
+        self._coeficiente = 1.0 - math.exp(-tamanho_bloco / constante) if constante > 0 else 1.0
+
+        # Linha de atraso: um número inteiro de blocos seguido de uma cópia do
+        # primeiro bloco, para que toda leitura de até um bloco seja contígua
+        bloco = tamanho_bloco
+        atraso_maximo = ms_para_amostras(atraso_maximo_ms, taxa_amostragem)
+        self._tamanho_anel = -(-(atraso_maximo + bloco) // bloco) * bloco
+        self._anel = np.zeros((self._tamanho_anel + bloco, canais), dtype=self.dtype)
+        self._posicao = 0
+        # A rampa termina em 1: o último quadro do bloco já usa o novo valor.
+        # Repetida em cada canal, para os produtos não fazerem broadcasting
+        self._rampa = self._criar_rampa(canais)
+        self._ganhos = np.empty((bloco, canais), dtype=self.dtype)
+        self._eco = np.empty((bloco, canais), dtype=self.dtype)
+        self._diferenca = np.empty((bloco, canais), dtype=self.dtype)
+
+        self._impulso = impulso is not None
+        self.canais_saida = canais
+        if self._impulso:
+            self._preparar_convolucao(_como_impulso(impulso))
+        self._intermediario = np.empty((bloco, canais), dtype=self.dtype)
+        self._saida = np.empty((bloco, self.canais_saida), dtype=self.dtype)
+        # Rampa da mistura, na largura da saída, e o sinal seco já nessa
+        # largura quando uma entrada mono vira uma saída multicanal
+        if self.canais_saida == canais:
+            self._rampa_saida, self._ganhos_saida = self._rampa, self._ganhos
+            self._seco = None
+        else:
+            self._rampa_saida = self._criar_rampa(self.canais_saida)
+            self._ganhos_saida = np.empty((bloco, self.canais_saida), dtype=self.dtype)
+            self._seco = np.empty((bloco, self.canais_saida), dtype=self.dtype)
+
+        self._validar(atraso_ms, decaimento, mistura)
+        self._atraso = self._alvo_atraso = float(ms_para_amostras(atraso_ms, taxa_amostragem))
+        self._ganho = self._alvo_ganho = float(decaimento)
+        self._mistura = self._alvo_mistura = float(mistura)
+
+    @property
+    def latencia_ms(self):
+        """Latência introduzida pelo processador, em milissegundos."""
+        return 1000.0 * self.latencia / self.taxa_amostragem
+
+    @property
+    def prazo_ms(self):
+        """Duração de um bloco: o tempo máximo de processamento por chamada."""
+        return 1000.0 * self.tamanho_bloco / self.taxa_amostragem
+
+    def _criar_rampa(self, canais):
+        """Rampa de 1/bloco até 1, contígua, com uma coluna por canal."""
+        rampa = np.arange(1, self.tamanho_bloco + 1, dtype=self.dtype) / self.tamanho_bloco
+        return np.ascontiguousarray(np.repeat(rampa[:, np.newaxis], canais, axis=1))
+
+    def _preparar_convolucao(self, impulso):
+        """Aloca o estado da convolução particionada com partições de um bloco."""
+        bloco = self.tamanho_bloco
+        self.canais_saida, self._matricial = mapa_canais(self.canais, impulso.shape[1])
+        tipo_complexo = np.result_type(self.dtype, np.complex64)
+        # Partições em ordem inversa, para casar com a linha de espectros da
+        # mais antiga para a mais recente; (canais do impulso, partições, bins)
+        espectros = particionar_impulso(impulso, bloco, self.dtype)[::-1]
+        self._espectros_impulso = np.ascontiguousarray(espectros.transpose(2, 0, 1),
+                                                       dtype=tipo_complexo)
+        # Produtos feitos canal a canal: com broadcasting, o numpy passaria por
+        # buffers temporários a cada bloco. Para cada canal de saída, o canal
+        # da entrada e o do impulso (ver mapa_canais; na matriz, os canais do
+        # impulso são ordenados por entrada, depois por saída)
+        if self._matricial:
+            self._canais_produto = [[(entrada, entrada * self.canais_saida + saida)
+                                     for saida in range(self.canais_saida)]
+                                    for entrada in range(self.canais)]
+        else:
+            self._canais_produto = [[(min(saida, self.canais - 1),
+                                      min(saida, impulso.shape[1] - 1))
+                                     for saida in range(self.canais_saida)]]
+        self._particoes = len(espectros)
+        # Janela de 2 blocos da entrada (overlap-save), canais primeiro. São
+        # duas, alternadas: deslocar a janela sobre si mesma faria o numpy
+        # copiar por um temporário, já que as metades se intercalam na memória
+        self._quadros = [np.zeros((self.canais, 2 * bloco), dtype=self.dtype) for _ in range(2)]
+        self._atual = 0
+        self._espectro = np.empty((self.canais, bloco + 1), dtype=tipo_complexo)
+        # Linha de espectros duplicada: as últimas `particoes` entradas ficam
+        # sempre contíguas em _linha[canal, indice + 1:indice + 1 + particoes]
+        self._linha = np.zeros((self.canais, 2 * self._particoes, bloco + 1), dtype=tipo_complexo)
+        self._indice = 0
+        self._produtos = np.empty((self.canais_saida, self._particoes, bloco + 1),
+                                  dtype=tipo_complexo)
+        self._acumulado = np.empty((self.canais_saida, bloco + 1), dtype=tipo_complexo)
+        self._parcial = np.empty((self.canais_saida, bloco + 1), dtype=tipo_complexo)
+        self._tempo = np.empty((self.canais_saida, 2 * bloco), dtype=self.dtype)
+        self._molhado = np.empty((bloco, self.canais_saida), dtype=self.dtype)
+
+    def _validar(self, atraso_ms, decaimento, mistura):
+        """Valida os parâmetros de ajustar()."""
+        if atraso_ms is not None:
+            if not 0 <= atraso_ms <= self.atraso_maximo_ms:
+                raise ValueError(f"O atraso deve estar entre 0 e {self.atraso_maximo_ms:g} ms")
+            if self.realimentacao and ms_para_amostras(atraso_ms, self.taxa_amostragem) < 1:
+                raise ValueError("O atraso deve ser positivo no modo de realimentação")
+        if decaimento is not None:
+            if not 0.0 <= decaimento <= 1.0:
+                raise ValueError("O decaimento deve estar entre 0.0 e 1.0")
+            if self.realimentacao and decaimento >= 1.0:
+                raise ValueError("O decaimento deve ser menor que 1.0 no modo de realimentação")
+        if mistura is not None:
+            if not 0.0 <= mistura <= 1.0:
+                raise ValueError("A mistura deve estar entre 0.0 e 1.0")
+            if mistura < 1.0 and self.canais_saida != self.canais and self.canais != 1:
+                raise ValueError("A mistura exige que a saída tenha os canais da entrada")
+
+    def ajustar(self, atraso_ms=None, decaimento=None, mistura=None):
+        """
+        Muda os parâmetros; a mudança é suavizada ao longo dos próximos blocos.
+
+        Pode ser chamado entre duas chamadas de processar() (por exemplo, da
+        thread da interface, protegido pelo hospedeiro).
+
+        Args:
+            atraso_ms (float, optional): Novo atraso do eco
+            decaimento (float, optional): Novo ganho do eco
+            mistura (float, optional): Nova proporção do sinal convolvido
+
+        Raises:
+            ValueError: Se algum parâmetro for inválido
+        """
+        self._validar(atraso_ms, decaimento, mistura)
+        if atraso_ms is not None:
+            self._alvo_atraso = float(ms_para_amostras(atraso_ms, self.taxa_amostragem))
+        if decaimento is not None:
+            self._alvo_ganho = float(decaimento)
+        if mistura is not None:
+            self._alvo_mistura = float(mistura)
+
+    def reiniciar(self):
+        """Zera a linha de atraso e o estado da convolução, mantendo os parâmetros."""
+        self._anel.fill(0)
+        self._posicao = 0
+        if self._impulso:
+            for quadro in self._quadros:
+                quadro.fill(0)
+            self._linha.fill(0)
+            self._indice = 0
+
+    def _rampa_ganho(self, inicio, quantidade, ganho_inicial, ganho_final, saida=False):
+        """
+        Ganho de cada quadro de [inicio, inicio + quantidade) do bloco, nos
+        canais da entrada ou, com saida=True, nos da saída.
+        """
+        rampa, ganhos = ((self._rampa_saida, self._ganhos_saida) if saida
+                         else (self._rampa, self._ganhos))
+        ganhos = ganhos[inicio:inicio + quantidade]
+        np.multiply(rampa[inicio:inicio + quantidade], ganho_final - ganho_inicial, out=ganhos)
+        ganhos += ganho_inicial
+        return ganhos
+
+    def _ler_eco(self, inicio, quantidade, atraso_inicial, atraso_final, ganho_inicial,
+                 ganho_final):
+        """
+        Lê da linha de atraso os quadros [inicio, inicio + quantidade) do eco
+        do bloco atual, com a transição de atraso e a rampa de ganho aplicadas.
+        """
+        tamanho = self._tamanho_anel
+        leitura = (self._posicao + inicio - atraso_inicial) % tamanho
+        eco = self._eco[:quantidade]
+        np.copyto(eco, self._anel[leitura:leitura + quantidade])
+        if atraso_final != atraso_inicial:
+            # (1 - r) * anterior + r * nova = anterior + r * (nova - anterior)
+            leitura = (self._posicao + inicio - atraso_final) % tamanho
+            diferenca = self._diferenca[:quantidade]
+            np.subtract(self._anel[leitura:leitura + quantidade], eco, out=diferenca)
+            diferenca *= self._rampa[inicio:inicio + quantidade]
+            eco += diferenca
+        if ganho_final != ganho_inicial:
+            eco *= self._rampa_ganho(inicio, quantidade, ganho_inicial, ganho_final)
+        else:
+            eco *= ganho_inicial
+        return eco
+
+    def _gravar_anel(self, inicio, dados):
+        """Grava quadros do bloco atual na linha de atraso (e na cópia do início)."""
+        posicao = self._posicao + inicio
+        self._anel[posicao:posicao + len(dados)] = dados
+        if self._posicao == 0:
+            fim = self._tamanho_anel + inicio
+            self._anel[fim:fim + len(dados)] = dados
+
+    def _processar_eco(self, entrada, saida):
+        """Aplica o eco a um bloco, com os parâmetros suavizados."""
+        atraso_inicial = int(round(self._atraso))
+        ganho_inicial = self._ganho
+        self._atraso = _aproximar(self._atraso, self._alvo_atraso, self._coeficiente)
+        self._ganho = _aproximar(self._ganho, self._alvo_ganho, self._coeficiente)
+        atraso_final = int(round(self._atraso))
+        ganho_final = self._ganho
+        bloco = self.tamanho_bloco
+
+        if not self.realimentacao:
+            # A linha guarda a entrada
+            self._gravar_anel(0, entrada)
+            eco = self._ler_eco(0, bloco, atraso_inicial, atraso_final, ganho_inicial, ganho_final)
+            np.add(entrada, eco, out=saida)
+        else:
+            # A linha guarda a saída; a recursão é resolvida em trechos menores
+            # que o atraso, como em ProcessadorAtraso
+            passo = min(atraso_inicial, atraso_final, bloco)
+            for inicio in range(0, bloco, passo):
+                quantidade = min(passo, bloco - inicio)
+                eco = self._ler_eco(inicio, quantidade, atraso_inicial, atraso_final,
+                                    ganho_inicial, ganho_final)
+                destino = saida[inicio:inicio + quantidade]
+                np.add(entrada[inicio:inicio + quantidade], eco, out=destino)
+                self._gravar_anel(inicio, destino)
+        self._posicao = (self._posicao + bloco) % self._tamanho_anel
+
+    def _processar_convolucao(self, entrada):
+        """Convolve um bloco; retorna a parte válida do buffer interno."""
+        bloco = self.tamanho_bloco
+        anterior = self._quadros[self._atual]
+        self._atual = 1 - self._atual
+        quadro = self._quadros[self._atual]
+        np.copyto(quadro[:, :bloco], anterior[:, bloco:])
+        np.copyto(quadro[:, bloco:], entrada.T)
+        _rfft(quadro, self._espectro)
+
+        indice = self._indice
+        self._linha[:, indice] = self._espectro
+        self._linha[:, indice + self._particoes] = self._espectro
+        inicio, fim = indice + 1, indice + 1 + self._particoes
+        self._indice = (indice + 1) % self._particoes
+
+        # Com matriz de canais, um grupo por canal de entrada, somados em seguida
+        for grupo, canais in enumerate(self._canais_produto):
+            for saida, (entrada, canal_impulso) in enumerate(canais):
+                np.multiply(self._linha[entrada, inicio:fim],
+                            self._espectros_impulso[canal_impulso], out=self._produtos[saida])
+            if grupo == 0:
+                np.add.reduce(self._produtos, axis=1, out=self._acumulado)
+            else:
+                np.add.reduce(self._produtos, axis=1, out=self._parcial)
+                self._acumulado += self._parcial
+        _irfft(self._acumulado, self._tempo)
+        np.copyto(self._molhado, self._tempo[:, bloco:].T)
+        return self._molhado
+
+    def _misturar(self, seco, molhado, saida):
+        """Combina o sinal antes e depois da convolução, com a mistura suavizada."""
+        mistura_inicial = self._mistura
+        self._mistura = _aproximar(self._mistura, self._alvo_mistura, self._coeficiente)
+        if mistura_inicial == self._mistura == 1.0:
+            np.copyto(saida, molhado)
+            return
+        # seco + m * (molhado - seco); `molhado` é um buffer interno e pode ser alterado
+        if self._seco is not None:
+            np.copyto(self._seco, seco)
+            seco = self._seco
+        molhado -= seco
+        molhado *= self._rampa_ganho(0, self.tamanho_bloco, mistura_inicial, self._mistura,
+                                     saida=True)
+        np.add(seco, molhado, out=saida)
+
+    def processar(self, entrada, saida=None):
+        """
+        Processa um bloco.
+
+        Args:
+            entrada (numpy.ndarray): Exatamente tamanho_bloco quadros
+                (tamanho_bloco, canais)
+            saida (numpy.ndarray, optional): Destino (tamanho_bloco,
+                canais_saida); pode ser a própria entrada se os canais forem
+                os mesmos. Se None, usa um buffer interno, sobrescrito na
+                próxima chamada.
+
+        Returns:
+            numpy.ndarray: O bloco processado, sem atraso (ver latencia)
+
+        Raises:
+            ValueError: Se o bloco não tiver o tamanho configurado
+        """
+        if len(entrada) != self.tamanho_bloco:
+            raise ValueError(f"O bloco deve ter {self.tamanho_bloco} quadros "
+                             f"(recebido: {len(entrada)})")
+        entrada = entrada.reshape(self.tamanho_bloco, self.canais)
+        if saida is None:
+            saida = self._saida
+        if not self._impulso:
+            self._processar_eco(entrada, saida)
+            return saida
+        self._processar_eco(entrada, self._intermediario)
+        molhado = self._processar_convolucao(self._intermediario)
+        self._misturar(self._intermediario, molhado, saida)
+        return saida
+
+
+def simular_fluxo(processador, duracao_s=10.0, sinal=None, ajustes=(), aquecimento=16,
+                  blocos_memoria=256, semente=0):
+    """
+    Alimenta o processador bloco a bloco, como um driver de áudio, e compara
+    o tempo de cada chamada com o prazo (a duração de um bloco).
+
+    Os blocos são processados em sequência, sem esperar o relógio: o que
+    importa é o pior tempo por chamada, que precisa caber no prazo com folga
+    para o resto da cadeia do hospedeiro. Depois, alguns blocos são
+    repetidos sob o tracemalloc para medir a memória alocada: o pico e o
+    saldo ao final, ambos acima do que já estava alocado. Os dois precisam
+    ficar abaixo de LIMITE_ALOCACAO_BYTES, o que só os objetos pequenos do
+    Python de cada chamada cabem; qualquer buffer de dados passa do limite.
+
+    Args:
+        processador (ProcessadorTempoReal): Processador a ser medido
+        duracao_s (float): Duração do fluxo simulado
+        sinal (numpy.ndarray, optional): Entrada (quadros, canais). Se None,
+            usa ruído com amplitude em torno de 0.1.
+        ajustes (list): Pares (instante em s, dict de argumentos de ajustar())
+            aplicados durante o fluxo
+        aquecimento (int): Blocos processados antes da medição
+        blocos_memoria (int): Blocos processados sob o tracemalloc
+        semente (int): Semente do ruído de entrada
+
+    Returns:
+        dict: Prazo, tempos por bloco (pior, p99, mediana, média), carga
+        média, blocos fora do prazo e bytes alocados (pico e saldo)
+    """
+    bloco = processador.tamanho_bloco
+    taxa = processador.taxa_amostragem
+    if sinal is None:
+        gerador = np.random.default_rng(semente)
+        sinal = 0.1 * gerador.standard_normal((int(duracao_s * taxa), processador.canais))
+    sinal = np.ascontiguousarray(sinal, dtype=processador.dtype).reshape(-1, processador.canais)
+    quantidade = len(sinal) // bloco
+    if quantidade == 0:
+        raise ValueError("O sinal é menor que um bloco")
+    blocos = sinal[:quantidade * bloco].reshape(quantidade, bloco, processador.canais)
+    saida = np.empty((bloco, processador.canais_saida), dtype=processador.dtype)
+    pendentes = sorted(((round(instante * taxa / bloco), parametros)
+                        for instante, parametros in ajustes), key=lambda item: item[0])
+
+    for indice in range(min(aquecimento, quantidade)):
+        processador.processar(blocos[indice], saida)
+    processador.reiniciar()
+
+    tempos = np.empty(quantidade)
+    proximo = 0
+    relogio = time.perf_counter
+    for indice in range(quantidade):
+        while proximo < len(pendentes) and pendentes[proximo][0] <= indice:
+            processador.ajustar(**pendentes[proximo][1])
+            proximo += 1
+        inicio = relogio()
+        processador.processar(blocos[indice], saida)
+        tempos[indice] = relogio() - inicio
+
+    # Memória: pico e saldo rastreados durante os blocos, acima do que já
+    # estava alocado (os blocos acima já serviram de aquecimento)
+    rastreando = tracemalloc.is_tracing()
+    if not rastreando:
+        tracemalloc.start()
+    try:
+        antes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        for indice in range(min(blocos_memoria, quantidade)):
+            processador.processar(blocos[indice], saida)
+        depois, pico = tracemalloc.get_traced_memory()
+    finally:
+        if not rastreando:
+            tracemalloc.stop()
+    alocado = max(0, pico - antes)
+    saldo = depois - antes
+
+    prazo_ms = processador.prazo_ms
+    tempos_ms = tempos * 1000.0
+    pior_ms = float(np.max(tempos_ms))
+    return {
+        'tamanho_bloco': bloco,
+        'taxa_amostragem': taxa,
+        'canais': processador.canais,
+        'canais_saida': processador.canais_saida,
+        'latencia_quadros': processador.latencia,
+        'blocos': quantidade,
+        'prazo_ms': round(prazo_ms, 4),
+        'pior_ms': round(pior_ms, 4),
+        'p99_ms': round(float(np.percentile(tempos_ms, 99)), 4),
+        'mediana_ms': round(float(np.median(tempos_ms)), 4),
+        'media_ms': round(float(np.mean(tempos_ms)), 4),
+        'carga_media': round(float(np.mean(tempos_ms)) / prazo_ms, 4),
+        'folga_pior': round(prazo_ms / pior_ms, 2) if pior_ms else None,
+        'fora_do_prazo': int(np.count_nonzero(tempos_ms > prazo_ms)),
+        'alocado_bytes': alocado,
+        'saldo_alocado_bytes': saldo,
+        'sem_alocacao': alocado <= LIMITE_ALOCACAO_BYTES and saldo <= LIMITE_ALOCACAO_BYTES,
+    }
+
+
+def main(argv=None):
+    """
+    Ponto de entrada do simulador de fluxo.
+
+    Imprime o resultado de simular_fluxo em JSON.
+
+    Returns:
+        int: 0 se nenhum bloco passou do prazo e não houve alocação por bloco,
+        1 caso contrário
+    """
+    parser = argparse.ArgumentParser(
+        prog='eco_audio.tempo_real',
+        description="Simula um fluxo ao vivo e verifica o tempo de cada bloco contra o prazo.")
+    parser.add_argument('--taxa', type=int, default=48000,
+                        help="Taxa de amostragem (padrão: 48000)")
+    parser.add_argument('--canais', type=int, default=2, help="Canais da entrada (padrão: 2)")
+    parser.add_argument('--bloco', type=int, default=TAMANHO_BLOCO_TEMPO_REAL,
+                        help="Quadros por bloco, de 64 a 1024 (padrão: 256)")
+    parser.add_argument('--duracao', type=float, default=10.0,
+                        help="Duração do fluxo simulado em segundos (padrão: 10)")
+    parser.add_argument('-a', '--atraso', type=float, default=200,
+                        help="Atraso do eco em milissegundos (padrão: 200)")
+    parser.add_argument('-d', '--decaimento', type=float, default=0.5,
+                        help="Decaimento do eco, de 0.0 a 1.0 (padrão: 0.5)")
+    parser.add_argument('--realimentacao', action='store_true',
+                        help="Repete o eco até decair (realimentação)")
+    grupo = parser.add_mutually_exclusive_group()
+    grupo.add_argument('--ir', help="Arquivo de resposta de impulso aplicado depois do eco")
+    grupo.add_argument('--duracao-ir', type=float,
+                       help="Usa um IR sintético com esta duração em segundos")
+    parser.add_argument('--precisao', choices=('float64', 'float32'), default='float64',
+                        help="Precisão do processamento (padrão: float64)")
+    parser.add_argument('--sem-ajustes', action='store_true',
+                        help="Não muda os parâmetros durante o fluxo")
+    args = parser.parse_args(argv)
+
+    impulso = None
+    if args.ir:
+        from .banco_ir import banco_padrao
+        impulso = banco_padrao().obter(args.ir, args.taxa, None).dados
+    elif args.duracao_ir:
+        from .desempenho import gerar_impulso
+        impulso = gerar_impulso(args.duracao_ir) * 0.1
+    try:
+        processador = ProcessadorTempoReal(
+            args.taxa, args.canais, args.bloco, args.atraso, args.decaimento,
+            realimentacao=args.realimentacao, impulso=impulso, dtype=args.precisao)
+    except ValueError as e:
+        parser.error(str(e))
+
+    # Por padrão, varia atraso e decaimento a cada meio segundo, para medir
+    # também os blocos com transição
+    ajustes = []
+    if not args.sem_ajustes:
+        atrasos = (args.atraso, args.atraso * 0.5, args.atraso * 1.5)
+        decaimentos = (args.decaimento, args.decaimento * 0.5)
+        for indice in range(int(args.duracao * 2)):
+            ajustes.append((indice * 0.5, {
+                'atraso_ms': min(atrasos[indice % len(atrasos)], ATRASO_MAXIMO_PADRAO_MS),
+                'decaimento': decaimentos[indice % len(decaimentos)],
+            }))
+
+    resultado = simular_fluxo(processador, args.duracao, ajustes=ajustes)
+    json.dump(resultado, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+    return 0 if resultado['fora_do_prazo'] == 0 and resultado['sem_alocacao'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""Varredura de parâmetros: várias renderizações de uma mesma entrada em uma passada."""
+
+import itertools
+import os
+from collections import OrderedDict
+from contextlib import ExitStack
+
+import numpy as np
+
+from .atraso import Derivacao, ProcessadorAtraso
+from .banco_ir import banco_padrao
+from .convolucao import ConvolvedorMultiplo
+from .dinamica import LimitadorAntecipado
+from .fluxo import (
+    PROFUNDIDADE_PIPELINE,
+    TAMANHO_BLOCO_FLUXO,
+    _SaidaNormalizada,
+    _abrir_entrada,
+    _abrir_saida,
+    _destino,
+    _escrever,
+    _etapa_leitura,
+    validar_formato,
+)
+from .metricas import MedicaoArquivo
+from .processamento import validar_parametros
+
+# Variantes processadas por passada sobre a entrada (limita arquivos abertos e memória)
+LOTE_VARIANTES = 32
+
+
+def montar_variantes(atrasos_ms=(), decaimentos=(), realimentacao=False, caminhos_ir=()):
+    """
+    Monta a grade de variantes de uma varredura.
+
+    As variantes de eco são todas as combinações de atraso e decaimento; cada
+    IR gera mais uma variante (o modo de IR ignora atraso e decaimento).
+
+    Args:
+        atrasos_ms (list): Atrasos do eco em milissegundos
+        decaimentos (list): Fatores de decaimento (0.0 a 1.0)
+        realimentacao (bool): Se True, as variantes de eco usam realimentação
+        caminhos_ir (list): Arquivos de resposta de impulso
+
+    Returns:
+        list: Dicionários de parâmetros aceitos por processar_arquivo
+
+    Raises:
+        ValueError: Se algum parâmetro for inválido ou a grade estiver vazia
+    """
+    variantes = []
+    for atraso_ms, decaimento in itertools.product(atrasos_ms, decaimentos):
+        atraso_ms, decaimento = validar_parametros(atraso_ms, decaimento, realimentacao)
+        variantes.append({'atraso_ms': atraso_ms, 'decaimento': decaimento,
+                          'realimentacao': realimentacao, 'caminho_ir': None})
+    for caminho_ir in caminhos_ir:
+        variantes.append({'atraso_ms': None, 'decaimento': None,
+                          'realimentacao': False, 'caminho_ir': caminho_ir})
+    if not variantes:
+        raise ValueError("A varredura precisa de ao menos uma variante")
+    return variantes
+
+
+def nome_variante(parametros):
+    """Descreve a variante em poucos caracteres, para o nome do arquivo."""
+    if parametros.get('caminho_ir'):
+        return "ir-" + os.path.splitext(os.path.basename(parametros['caminho_ir']))[0]
+    nome = f"a{parametros['atraso_ms']}_d{parametros['decaimento']:g}"
+    return nome + "_fb" if parametros.get('realimentacao') else nome
+
+
+def caminho_variante(caminho_entrada, indice, parametros, pasta_destino=None):
+    """Monta o caminho <nome>_v<índice>_<variante>.wav na pasta de destino (ou na da entrada)."""
+    nome_base = os.path.splitext(os.path.basename(caminho_entrada))[0]
+    pasta = pasta_destino or os.path.dirname(os.path.abspath(caminho_entrada))
+    return os.path.join(pasta, f"{nome_base}_v{indice:02d}_{nome_variante(parametros)}.wav")
+
+
+def _processar_lote(caminho_entrada, itens, banco, tamanho_bloco, medicao, precisao, subtipo,
+                    mapear, profundidade):
+    """
+    Processa um lote de variantes em uma única passada sobre a entrada.
+
+    Args:
+        itens (list): Pares (parametros, caminho_saida)
+    """
+    with _abrir_entrada(caminho_entrada, medicao, mapear) as entrada:
+        canais = entrada.channels
+        reserva = np.empty((tamanho_bloco, canais), dtype=precisao)
+
+        # Eco: um processador, um limitador e um arquivo de saída por variante
+        ecos = []
+        # IR: variantes agrupadas pelo tamanho de partição, para que cada grupo
+        # transforme cada bloco da entrada uma única vez
+        grupos = OrderedDict()
+        convolvedores = []
+        with ExitStack() as abertos:
+            for parametros, caminho_saida in itens:
+                if parametros.get('caminho_ir'):
+                    with medicao.medir('decodificacao'):
+                        impulso = banco.obter(parametros['caminho_ir'], entrada.samplerate,
+                                              precisao)
+                    tamanho_particao, espectros = impulso.espectros(dtype=precisao)
+                    grupos.setdefault(tamanho_particao, []).append((impulso, espectros, caminho_saida))
+                    continue
+                processador = ProcessadorAtraso(
+                    entrada.samplerate, [Derivacao(parametros['atraso_ms'], parametros['decaimento'])],
+                    canais, realimentacao=parametros.get('realimentacao', False), dtype=precisao)
+                saida = abertos.enter_context(_abrir_saida(
+                    caminho_saida, entrada, subtipo=subtipo, mapear=mapear,
+                    quadros=entrada.frames + processador.maior_atraso))
+                limitador = LimitadorAntecipado(entrada.samplerate, canais, dtype=precisao)
+                ecos.append((processador, limitador, saida))
+
+            for tamanho_particao, membros in grupos.items():
+                convolvedor = ConvolvedorMultiplo(
+                    [impulso.dados for impulso, _, _ in membros], canais, tamanho_particao,
+                    dtype=precisao, espectros=[espectros for _, espectros, _ in membros])
+                normalizadas = [
+                    abertos.enter_context(_SaidaNormalizada(caminho_saida, canais_saida, precisao,
+                                                            medicao, entrada.samplerate))
+                    for (_, _, caminho_saida), (canais_saida, _) in zip(membros, convolvedor.mapas)
+                ]
+                convolvedores.append((convolvedor, normalizadas))
+
+            blocos = abertos.enter_context(
+                _etapa_leitura(entrada, tamanho_bloco, medicao, precisao, profundidade))
+            for bloco in blocos:
+                # O bloco é lido por todas as variantes: nenhuma pode processá-lo no lugar
+                bloco = bloco.view()
+                bloco.flags.writeable = False
+                for processador, limitador, saida in ecos:
+                    with medicao.medir('dsp'):
+                        destino = processador.processar(bloco, saida=_destino(saida, bloco, reserva))
+                        destino = limitador.processar(destino, saida=destino)
+                    _escrever(saida, destino, medicao)
+                for convolvedor, normalizadas in convolvedores:
+                    with medicao.medir('dsp'):
+                        resultados = convolvedor.processar(bloco)
+                    for normalizada, resultado in zip(normalizadas, resultados):
+                        normalizada.acumular(resultado)
+
+            for processador, limitador, saida in ecos:
+                with medicao.medir('dsp'):
+                    resultado = processador.finalizar()
+                    resultado = limitador.processar(resultado, saida=resultado)
+                _escrever(saida, resultado, medicao)
+                with medicao.medir('dsp'):
+                    resultado = limitador.finalizar()
+                _escrever(saida, resultado, medicao)
+            for convolvedor, normalizadas in convolvedores:
+                with medicao.medir('dsp'):
+                    resultados = convolvedor.finalizar()
+                for normalizada, resultado in zip(normalizadas, resultados):
+                    normalizada.acumular(resultado)
+                    normalizada.gravar(entrada, subtipo, mapear, tamanho_bloco, profundidade)
+
+
+def processar_varredura(caminho_entrada, variantes, pasta_destino=None, banco=None,
+                        tamanho_bloco=TAMANHO_BLOCO_FLUXO, medicao=None, precisao='float64',
+                        subtipo=None, mapear=True, lote=LOTE_VARIANTES,
+                        profundidade=PROFUNDIDADE_PIPELINE):
+    """
+    Renderiza várias variantes de parâmetros de uma mesma entrada.
+
+    Cada passada lê a entrada uma única vez para até `lote` variantes. Os
+    blocos decodificados são compartilhados por todas as variantes, e as
+    variantes de IR com o mesmo tamanho de partição compartilham também os
+    espectros da entrada (ver ConvolvedorMultiplo). O resultado de cada
+    variante é igual ao de processar_arquivo com os mesmos parâmetros.
+
+    Args:
+        caminho_entrada (str): Arquivo de áudio de origem
+        variantes (list): Dicionários de parâmetros (ver montar_variantes)
+        pasta_destino (str, optional): Pasta das saídas (padrão: a da entrada)
+        banco (BancoIR, optional): Banco de IRs. Se None, usa o banco do processo.
+        tamanho_bloco (int): Quadros lidos por vez
+        medicao (MedicaoArquivo, optional): Medição de toda a varredura
+        precisao (str): 'float64' ou 'float32', usada da leitura à gravação
+        subtipo (str, optional): Formato de amostra das saídas
+        mapear (bool): Se True, WAVs sem compressão usam mapeamento de memória
+        lote (int): Variantes processadas por passada sobre a entrada
+        profundidade (int): Blocos decodificados à frente do DSP, em thread
+            própria (0 lê na thread atual)
+
+    Returns:
+        list: Um dicionário por variante, com 'parametros' e 'saida'
+    """
+    validar_formato(precisao, subtipo)
+    medicao = medicao or MedicaoArquivo(caminho_entrada)
+    banco = banco or banco_padrao()
+    if pasta_destino:
+        os.makedirs(pasta_destino, exist_ok=True)
+    itens = [(parametros, caminho_variante(caminho_entrada, indice, parametros, pasta_destino))
+             for indice, parametros in enumerate(variantes, start=1)]
+    for inicio in range(0, len(itens), max(1, lote)):
+        _processar_lote(caminho_entrada, itens[inicio:inicio + max(1, lote)], banco,
+                        tamanho_bloco, medicao, precisao, subtipo, mapear, profundidade)
+    medicao.finalizar()
+    return [{'parametros': parametros, 'saida': caminho_saida} for parametros, caminho_saida in itens]
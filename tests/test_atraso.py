@@ -0,0 +1,101 @@
+"""Testes do motor de atraso comparados com os laços amostra a amostra originais."""
+
+import numpy as np
+import pytest
+
+from eco_audio.atraso import (Derivacao, ProcessadorAtraso, aplicar_derivacoes,
+                              aplicar_realimentacao, ms_para_amostras)
+from eco_audio.processamento import validar_parametros
+
+TAXA = 8000
+
+
+def _sinal(quadros, canais=None, semente=0):
+    forma = (quadros,) if canais is None else (quadros, canais)
+    return np.random.RandomState(semente).uniform(-0.5, 0.5, forma)
+
+
+def _derivacoes_laco(dados, pares):
+    """Eco sem realimentação, uma amostra por vez (como o laço original da interface)."""
+    saida = np.zeros((len(dados) + max(d for d, _ in pares),) + dados.shape[1:])
+    saida[:len(dados)] = dados
+    for atraso, ganho in pares:
+        for i in range(len(dados)):
+            saida[i + atraso] += ganho * dados[i]
+    return saida
+
+
+def _realimentacao_laco(dados, pares, quadros):
+    """y[n] = x[n] + soma(g·y[n - d]), uma amostra por vez."""
+    saida = np.zeros((quadros,) + dados.shape[1:])
+    saida[:len(dados)] = dados
+    for n in range(quadros):
+        for atraso, ganho in pares:
+            if n >= atraso:
+                saida[n] += ganho * saida[n - atraso]
+    return saida
+
+
+def _pares(derivacoes):
+    return [(ms_para_amostras(atraso_ms, TAXA), ganho) for atraso_ms, ganho in derivacoes]
+
+
+@pytest.mark.parametrize('canais', [None, 1, 2])
+@pytest.mark.parametrize('derivacoes', [
+    [Derivacao(50, 0.5)],
+    [Derivacao(10, 0.6), Derivacao(37, -0.3), Derivacao(120, 0.25)],
+    [Derivacao(0, 0.5), Derivacao(25, 0.0)],
+])
+def test_derivacoes_igual_ao_laco(canais, derivacoes):
+    dados = _sinal(1500, canais)
+    esperado = _derivacoes_laco(dados, _pares(derivacoes))
+    np.testing.assert_allclose(aplicar_derivacoes(dados, TAXA, derivacoes), esperado, atol=1e-12)
+
+
+@pytest.mark.parametrize('canais', [None, 2])
+@pytest.mark.parametrize('derivacoes', [
+    [Derivacao(20, 0.5)],
+    [Derivacao(7, 0.4), Derivacao(31, -0.35)],
+])
+def test_realimentacao_igual_ao_laco(canais, derivacoes):
+    dados = _sinal(1200, canais)
+    saida = aplicar_realimentacao(dados, TAXA, derivacoes)
+    pares = _pares(derivacoes)
+    esperado = _realimentacao_laco(dados, pares, len(saida))
+    np.testing.assert_allclose(saida, esperado, atol=1e-12)
+    # A cauda só é cortada quando a última janela do maior atraso está abaixo do limiar
+    assert np.max(np.abs(saida[-max(d for d, _ in pares):])) < 1e-3
+
+
+@pytest.mark.parametrize('realimentacao', [False, True])
+@pytest.mark.parametrize('tamanho_bloco', [1, 17, 256, 5000])
+def test_processador_em_blocos_igual_ao_laco(realimentacao, tamanho_bloco):
+    derivacoes = [Derivacao(5, 0.45), Derivacao(12, 0.3)]
+    dados = _sinal(3000, 2, semente=3)
+    processador = ProcessadorAtraso(TAXA, derivacoes, 2, realimentacao=realimentacao)
+    partes = [processador.processar(dados[i:i + tamanho_bloco])
+              for i in range(0, len(dados), tamanho_bloco)]
+    saida = np.concatenate(partes + [processador.finalizar()])
+    if realimentacao:
+        esperado = _realimentacao_laco(dados, _pares(derivacoes), len(saida))
+    else:
+        esperado = _derivacoes_laco(dados, _pares(derivacoes))
+    np.testing.assert_allclose(saida, esperado, atol=1e-12)
+
+
+def test_realimentacao_rejeita_ganho_total_1():
+    with pytest.raises(ValueError):
+        aplicar_realimentacao(_sinal(100), TAXA, [Derivacao(10, 1.0)])
+    with pytest.raises(ValueError):
+        ProcessadorAtraso(TAXA, [Derivacao(10, 1.0)], 1, realimentacao=True)
+
+
+def test_validacao_do_decaimento():
+    assert validar_parametros('250', '1.0') == (250, 1.0)
+    assert validar_parametros(250, 0.99, realimentacao=True) == (250, 0.99)
+    with pytest.raises(ValueError):
+        validar_parametros(250, 1.0, realimentacao=True)
+    with pytest.raises(ValueError):
+        validar_parametros(250, 1.5)
+    with pytest.raises(ValueError):
+        validar_parametros(0, 0.5)
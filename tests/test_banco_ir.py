@@ -0,0 +1,72 @@
+"""Testes do cache de respostas de impulso."""
+
+import threading
+
+import numpy as np
+import soundfile as sf
+
+from eco_audio.banco_ir import BancoIR
+
+
+def _gravar_ir(pasta, nome, quadros=4000, taxa=8000):
+    caminho = str(pasta / nome)
+    sf.write(caminho, np.random.RandomState(0).uniform(-0.5, 0.5, quadros), taxa)
+    return caminho
+
+
+def test_orcamento_conta_espectros_criados_depois(tmp_path):
+    banco = BancoIR()
+    item = banco.obter(_gravar_ir(tmp_path, 'ir.wav'), 8000, dtype=None)
+    assert banco.tamanho_bytes == item.dados.nbytes
+    _, espectros = item.espectros(256, np.float32)
+    _, espectros_64 = item.espectros(512, np.float64)
+    item.espectros(256, np.float32)
+    assert banco.tamanho_bytes == item.dados.nbytes + espectros.nbytes + espectros_64.nbytes
+    assert banco.estatisticas()['bytes'] == banco.tamanho_bytes
+
+
+def test_orcamento_descarta_o_menos_usado_quando_um_ir_cresce(tmp_path):
+    banco = BancoIR()
+    antigo = banco.obter(_gravar_ir(tmp_path, 'a.wav'), 8000, dtype=None)
+    novo = banco.obter(_gravar_ir(tmp_path, 'b.wav'), 8000, dtype=None)
+    banco.limite_bytes = antigo.dados.nbytes + novo.dados.nbytes + 1
+    novo.espectros(256)
+    assert banco.estatisticas()['itens'] == 1
+    assert banco.tamanho_bytes == novo.tamanho_bytes
+
+
+def test_espectros_concorrentes_com_leitura_do_banco(tmp_path):
+    banco = BancoIR(limite_bytes=1 << 40)
+    itens = [banco.obter(_gravar_ir(tmp_path, '%d.wav' % i), 8000, dtype=None)
+             for i in range(4)]
+    erros = []
+
+    def criar(item):
+        try:
+            for tamanho_bloco in (64, 128, 256, 512, 1024, 2048):
+                for dtype in (np.float32, np.float64):
+                    item.espectros(tamanho_bloco, dtype)
+        except Exception as erro:  # pragma: no cover - só em caso de falha
+            erros.append(erro)
+
+    def ler(parar):
+        try:
+            while not parar.is_set():
+                banco.estatisticas()
+        except Exception as erro:  # pragma: no cover - só em caso de falha
+            erros.append(erro)
+
+    parar = threading.Event()
+    leitor = threading.Thread(target=ler, args=(parar,))
+    leitor.start()
+    threads = [threading.Thread(target=criar, args=(item,)) for item in itens]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    parar.set()
+    leitor.join()
+    assert not erros
+    esperado = sum(item.dados.nbytes + sum(e.nbytes for e in item._espectros.values())
+                   for item in itens)
+    assert banco.tamanho_bytes == esperado
@@ -0,0 +1,58 @@
+"""Testes do cache de resultados."""
+
+import os
+import stat
+
+import numpy as np
+import soundfile as sf
+
+from eco_audio.cache_resultados import CacheResultados
+from eco_audio.fluxo import processar_arquivo
+from eco_audio.lote import Tarefa
+from eco_audio.picos import PiramidePicos, caminho_picos
+
+PARAMETROS = {'atraso_ms': 50, 'decaimento': 0.5}
+
+
+def _tarefa_processada(pasta, cache, parametros=PARAMETROS):
+    entrada = str(pasta / 'entrada.wav')
+    sf.write(entrada, np.random.RandomState(0).uniform(-0.5, 0.5, 8000), 8000)
+    tarefa = Tarefa(entrada, str(pasta / 'saida.wav'))
+    processar_arquivo(tarefa.caminho_entrada, tarefa.caminho_saida, **parametros)
+    cache.guardar(tarefa, parametros)
+    return tarefa
+
+
+def test_restaura_copia_gravavel(tmp_path):
+    cache = CacheResultados(str(tmp_path / 'cache'))
+    tarefa = _tarefa_processada(tmp_path, cache)
+    esperado = open(tarefa.caminho_saida, 'rb').read()
+    os.remove(tarefa.caminho_saida)
+    assert cache.restaurar(tarefa, PARAMETROS)
+    info = os.stat(tarefa.caminho_saida)
+    assert info.st_nlink == 1
+    assert info.st_mode & stat.S_IWUSR
+    assert open(tarefa.caminho_saida, 'rb').read() == esperado
+    # Uma nova renderização sobre a saída restaurada não encontra um arquivo somente leitura
+    processar_arquivo(tarefa.caminho_entrada, tarefa.caminho_saida, atraso_ms=80, decaimento=0.3)
+    assert open(tarefa.caminho_saida, 'rb').read() != esperado
+
+
+def test_restaura_por_link_quando_pedido(tmp_path):
+    cache = CacheResultados(str(tmp_path / 'cache'), vincular=True)
+    tarefa = _tarefa_processada(tmp_path, cache)
+    os.remove(tarefa.caminho_saida)
+    assert cache.restaurar(tarefa, PARAMETROS)
+    assert os.stat(tarefa.caminho_saida).st_nlink == 2
+
+
+def test_restauracao_monta_os_picos(tmp_path):
+    cache = CacheResultados(str(tmp_path / 'cache'))
+    parametros = dict(PARAMETROS, picos=True)
+    tarefa = _tarefa_processada(tmp_path, cache, parametros)
+    for caminho in (tarefa.caminho_entrada, tarefa.caminho_saida):
+        os.remove(caminho_picos(caminho))
+    os.remove(tarefa.caminho_saida)
+    assert cache.restaurar(tarefa, parametros)
+    for caminho in (tarefa.caminho_entrada, tarefa.caminho_saida):
+        assert PiramidePicos.carregar(caminho_picos(caminho), caminho) is not None
@@ -0,0 +1,23 @@
+"""Testes da linha de comando."""
+
+import json
+
+import numpy as np
+import soundfile as sf
+
+from eco_audio.cli import main
+
+
+def test_varredura_conta_so_os_arquivos_processados(tmp_path, capsys):
+    valido = str(tmp_path / 'valido.wav')
+    sf.write(valido, np.random.RandomState(0).uniform(-0.5, 0.5, 4000), 8000)
+    invalido = tmp_path / 'invalido.wav'
+    invalido.write_bytes(b'nao e audio')
+    codigo = main([valido, str(invalido), '--varredura', '-a', '50,80', '-d', '0.5',
+                   '-o', str(tmp_path / 'saida')])
+    resumo = json.loads(capsys.readouterr().out)
+    assert codigo == 1
+    assert resumo['total'] == 2
+    assert resumo['processados'] == resumo['sucesso'] == 1
+    assert len(resumo['erros']) == 1
+    assert len(resumo['saidas']) == 2
@@ -0,0 +1,118 @@
+"""Testes do motor de convolução comparados com np.convolve."""
+
+import numpy as np
+import pytest
+
+from eco_audio.convolucao import (ConvolvedorMultiplo, ConvolvedorParticionado, convolver,
+                                  convolver_fft, convolver_particionado, mapa_canais)
+
+
+def _sinal(forma, semente=0):
+    return np.random.RandomState(semente).uniform(-1.0, 1.0, forma)
+
+
+def _referencia(dados, impulso):
+    """Convolução direta, canal a canal, com a regra de canais de mapa_canais."""
+    entrada = dados[:, np.newaxis] if dados.ndim == 1 else dados
+    caminhos = impulso[:, np.newaxis] if impulso.ndim == 1 else impulso
+    canais_saida, matricial = mapa_canais(entrada.shape[1], caminhos.shape[1])
+    saida = np.zeros((len(entrada) + len(caminhos) - 1, canais_saida))
+    for s in range(canais_saida):
+        if matricial:
+            for e in range(entrada.shape[1]):
+                saida[:, s] += np.convolve(entrada[:, e], caminhos[:, e * canais_saida + s])
+        else:
+            e = 0 if entrada.shape[1] == 1 else s
+            c = 0 if caminhos.shape[1] == 1 else s
+            saida[:, s] = np.convolve(entrada[:, e], caminhos[:, c])
+    return saida[:, 0] if dados.ndim == 1 and canais_saida == 1 else saida
+
+
+def _em_blocos(convolvedor, dados, tamanhos):
+    """Alimenta o convolvedor com pedaços de tamanhos variados."""
+    partes, inicio, i = [], 0, 0
+    while inicio < len(dados):
+        fim = inicio + tamanhos[i % len(tamanhos)]
+        partes.append(convolvedor.processar(dados[inicio:fim]))
+        inicio, i = fim, i + 1
+    partes.append(convolvedor.finalizar())
+    return np.concatenate(partes)
+
+
+CASOS_CANAIS = [
+    ((), ()),                # mono x mono
+    ((2,), ()),              # IR mono em cada canal
+    ((), (2,)),              # fonte mono, IR estéreo
+    ((2,), (2,)),            # canal a canal
+    ((2,), (4,)),            # true stereo (LL, LR, RL, RR)
+    ((3,), (6,)),            # matriz 3 x 2
+]
+
+
+@pytest.mark.parametrize('canais_entrada, canais_impulso', CASOS_CANAIS)
+@pytest.mark.parametrize('quadros, tamanho_impulso', [(1000, 37), (50, 300), (1, 64)])
+def test_fft_e_particionado_iguais_a_convolve(canais_entrada, canais_impulso, quadros,
+                                              tamanho_impulso):
+    dados = _sinal((quadros,) + canais_entrada)
+    impulso = _sinal((tamanho_impulso,) + canais_impulso, semente=1)
+    esperado = _referencia(dados, impulso)
+    np.testing.assert_allclose(convolver_fft(dados, impulso), esperado, atol=1e-9)
+    for tamanho_bloco in (None, 16, 64):
+        np.testing.assert_allclose(convolver_particionado(dados, impulso, tamanho_bloco),
+                                   esperado, atol=1e-9)
+
+
+@pytest.mark.parametrize('modo', ['fft', 'particionado', 'auto'])
+@pytest.mark.parametrize('forma', [(0,), (0, 2)])
+def test_entrada_vazia_gera_so_a_cauda(modo, forma):
+    impulso = _sinal(40)
+    resultado = convolver(np.zeros(forma), impulso, modo=modo)
+    assert resultado.shape == (39,) + forma[1:]
+    assert not np.any(resultado)
+
+
+@pytest.mark.parametrize('canais_entrada, canais_impulso', CASOS_CANAIS)
+@pytest.mark.parametrize('tamanhos', [[1], [7, 130, 3], [64], [1000]])
+def test_fluxo_com_pedacos_irregulares(canais_entrada, canais_impulso, tamanhos):
+    dados = _sinal((777,) + canais_entrada, semente=2)
+    impulso = _sinal((200,) + canais_impulso, semente=3)
+    canais = 1 if dados.ndim == 1 else dados.shape[1]
+    convolvedor = ConvolvedorParticionado(impulso, canais, tamanho_bloco=64)
+    saida = _em_blocos(convolvedor, dados.reshape(len(dados), canais), tamanhos)
+    esperado = _referencia(dados, impulso).reshape(len(saida), -1)
+    np.testing.assert_allclose(saida, esperado, atol=1e-9)
+
+
+def test_fluxo_com_impulso_maior_que_a_entrada():
+    dados = _sinal((30, 2))
+    impulso = _sinal((500, 2), semente=4)
+    convolvedor = ConvolvedorParticionado(impulso, 2, tamanho_bloco=32)
+    np.testing.assert_allclose(_em_blocos(convolvedor, dados, [11]),
+                               _referencia(dados, impulso), atol=1e-9)
+
+
+def test_fluxo_float32_mantem_a_precisao():
+    dados = _sinal((2000, 2)).astype(np.float32)
+    impulso = _sinal(300, semente=5)
+    convolvedor = ConvolvedorParticionado(impulso, 2, tamanho_bloco=128, dtype=np.float32)
+    saida = _em_blocos(convolvedor, dados, [128])
+    assert saida.dtype == np.float32
+    np.testing.assert_allclose(saida, _referencia(dados.astype(np.float64), impulso), atol=1e-4)
+
+
+def test_multiplo_igual_a_cada_impulso():
+    dados = _sinal((900, 2))
+    impulsos = [_sinal(100, semente=6), _sinal((150, 2), semente=7), _sinal((60, 4), semente=8)]
+    convolvedor = ConvolvedorMultiplo(impulsos, 2, tamanho_bloco=64)
+    partes = [convolvedor.processar(dados[i:i + 100]) for i in range(0, len(dados), 100)]
+    finais = convolvedor.finalizar()
+    for indice, impulso in enumerate(impulsos):
+        saida = np.concatenate([parte[indice] for parte in partes] + [finais[indice]])
+        np.testing.assert_allclose(saida, _referencia(dados, impulso), atol=1e-9)
+
+
+def test_mapa_canais_invalido():
+    with pytest.raises(ValueError):
+        mapa_canais(2, 3)
+    with pytest.raises(ValueError):
+        convolver_fft(_sinal((10, 2)), _sinal((5, 3)))
@@ -0,0 +1,75 @@
+"""Testes da gravação da saída no processamento de arquivos."""
+
+import os
+import stat
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from eco_audio.controle import ControleTrabalho, ProcessamentoCancelado
+from eco_audio.fluxo import processar_arquivo
+
+PARAMETROS = {'atraso_ms': 50, 'decaimento': 0.5, 'tamanho_bloco': 1024}
+
+
+def _entrada(pasta, quadros=20000):
+    caminho = str(pasta / 'entrada.wav')
+    sf.write(caminho, np.random.RandomState(0).uniform(-0.5, 0.5, (quadros, 2)), 8000)
+    return caminho
+
+
+def _controle_que_falha(erro):
+    """Controle que levanta `erro` depois do primeiro bloco gravado."""
+    def ao_progredir(feitos, total):
+        if feitos:
+            raise erro
+    return ControleTrabalho(ao_progredir=ao_progredir, intervalo_s=0)
+
+
+def _controle_que_cancela():
+    controle = ControleTrabalho(intervalo_s=0)
+    controle.ao_progredir = lambda feitos, total: feitos and controle.cancelar()
+    return controle
+
+
+@pytest.mark.parametrize('mapear', [True, False])
+@pytest.mark.parametrize('normalizacao', [None, 'pico'])
+@pytest.mark.parametrize('interromper, excecao', [
+    (_controle_que_cancela, ProcessamentoCancelado),
+    (lambda: _controle_que_falha(RuntimeError("falha no meio")), RuntimeError),
+])
+def test_interrupcao_mantem_a_saida_anterior(tmp_path, mapear, normalizacao, interromper,
+                                             excecao):
+    entrada = _entrada(tmp_path)
+    saida = str(tmp_path / 'saida.wav')
+    processar_arquivo(entrada, saida, **PARAMETROS)
+    anterior = open(saida, 'rb').read()
+    with pytest.raises(excecao):
+        processar_arquivo(entrada, saida, 120, 0.3, tamanho_bloco=1024, mapear=mapear,
+                          normalizacao=normalizacao, controle=interromper())
+    assert open(saida, 'rb').read() == anterior
+    assert sorted(os.listdir(tmp_path)) == ['entrada.wav', 'saida.wav']
+
+
+def test_interrupcao_sem_saida_anterior_nao_deixa_arquivos(tmp_path):
+    entrada = _entrada(tmp_path)
+    with pytest.raises(ProcessamentoCancelado):
+        processar_arquivo(entrada, str(tmp_path / 'saida.wav'), controle=_controle_que_cancela(),
+                          **PARAMETROS)
+    assert os.listdir(tmp_path) == ['entrada.wav']
+
+
+def test_substitui_saida_ligada_e_somente_leitura(tmp_path):
+    entrada = _entrada(tmp_path)
+    saida = str(tmp_path / 'saida.wav')
+    guardada = str(tmp_path / 'guardada.wav')
+    processar_arquivo(entrada, guardada, **PARAMETROS)
+    os.chmod(guardada, stat.S_IREAD)
+    os.link(guardada, saida)
+    conteudo = open(guardada, 'rb').read()
+    processar_arquivo(entrada, saida, 120, 0.3, tamanho_bloco=1024)
+    assert open(guardada, 'rb').read() == conteudo
+    assert open(saida, 'rb').read() != conteudo
+    assert os.stat(saida).st_nlink == 1
+    assert os.stat(saida).st_mode & stat.S_IWUSR
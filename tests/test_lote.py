@@ -0,0 +1,53 @@
+"""Testes do motor de lote."""
+
+import multiprocessing
+import os
+import signal
+
+import numpy as np
+import soundfile as sf
+
+from eco_audio.controle import ControleTrabalho
+from eco_audio.lote import MotorLote
+
+PARAMETROS = {'atraso_ms': 50, 'decaimento': 0.5}
+
+
+def _tarefas(pasta, quantidade, quadros=8000):
+    tarefas = []
+    for i in range(quantidade):
+        entrada = str(pasta / ('entrada_%d.wav' % i))
+        sf.write(entrada, np.random.RandomState(i).uniform(-0.5, 0.5, quadros), 8000)
+        tarefas.append((entrada, str(pasta / ('saida_%d.wav' % i))))
+    return tarefas
+
+
+def test_ir_ilegivel_falha_todas_as_tarefas(tmp_path):
+    tarefas = _tarefas(tmp_path, 3)
+    caminho_ir = tmp_path / 'ir.wav'
+    caminho_ir.write_bytes(b'nao e audio')
+    progresso = MotorLote(trabalhadores=1).executar(
+        tarefas, dict(PARAMETROS, caminho_ir=str(caminho_ir)))
+    assert progresso.processados == 3
+    assert len(progresso.erros) == 3
+    assert all('ir.wav' in erro for erro in progresso.erros)
+    assert not any(os.path.exists(saida) for _, saida in tarefas)
+
+
+def test_pool_quebrado_e_recriado(tmp_path):
+    tarefas = _tarefas(tmp_path, 4, quadros=8000 * 60)
+    mortos = []
+
+    def matar_trabalhador(feitos, total):
+        # Simula o OOM killer no primeiro arquivo em andamento
+        filhos = multiprocessing.active_children()
+        if not mortos and filhos:
+            os.kill(filhos[0].pid, signal.SIGKILL)
+            mortos.append(filhos[0].pid)
+
+    controle = ControleTrabalho(ao_progredir=matar_trabalhador, intervalo_s=0.01)
+    progresso = MotorLote(trabalhadores=1).executar(tarefas, PARAMETROS, controle=controle)
+    assert mortos
+    assert progresso.processados == 4
+    assert len(progresso.erros) == 1
+    assert sum(os.path.exists(saida) for _, saida in tarefas) >= 3
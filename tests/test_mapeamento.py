@@ -0,0 +1,40 @@
+"""Testes da gravação de WAV por mapeamento de memória."""
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from eco_audio.mapeamento import SaidaMapeada
+
+
+def _sinal(dtype):
+    estado = np.random.RandomState(0)
+    dados = np.concatenate([estado.uniform(-1.0, 1.0, (20000, 2)),
+                            estado.uniform(-1e-3, 1e-3, (20000, 2)),
+                            [[1.0, -1.0], [0.5 / 32768, -0.5 / 32768]]])
+    return dados.astype(dtype)
+
+
+@pytest.mark.parametrize('subtipo', ['PCM_16', 'PCM_32', 'FLOAT', 'DOUBLE'])
+@pytest.mark.parametrize('dtype', [np.float32, np.float64])
+def test_igual_ao_soundfile(tmp_path, subtipo, dtype):
+    dados = _sinal(dtype)
+    sf.write(str(tmp_path / 'referencia.wav'), dados, 8000, subtype=subtipo)
+    with SaidaMapeada(str(tmp_path / 'mapeada.wav'), 8000, 2, subtipo) as saida:
+        for inicio in range(0, len(dados), 4097):
+            bloco = dados[inicio:inicio + 4097]
+            destino = saida.buffer(len(bloco), dtype)
+            destino[:] = bloco
+            saida.write(destino)
+    esperado, _ = sf.read(str(tmp_path / 'referencia.wav'), dtype='float64')
+    obtido, taxa = sf.read(str(tmp_path / 'mapeada.wav'), dtype='float64')
+    assert taxa == 8000
+    np.testing.assert_array_equal(obtido, esperado)
+
+
+def test_buffer_auxiliar_por_tipo(tmp_path):
+    with SaidaMapeada(str(tmp_path / 'saida.wav'), 8000, 2, 'PCM_16') as saida:
+        de_32 = saida.buffer(256, np.float32)
+        de_64 = saida.buffer(256, np.float64)
+        assert saida.buffer(128, np.float32).base is de_32.base
+        assert saida.buffer(128, np.float64).base is de_64.base
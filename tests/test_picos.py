@@ -0,0 +1,53 @@
+"""Testes dos arquivos de picos."""
+
+import os
+
+import numpy as np
+import soundfile as sf
+
+from eco_audio.fluxo import processar_arquivo
+from eco_audio.picos import (
+    caminho_picos,
+    carregar_picos,
+    pasta_cache_picos,
+    picos_arquivo,
+)
+
+
+def _audio(caminho, quadros=20000, semente=0):
+    sf.write(str(caminho), np.random.RandomState(semente).uniform(-0.5, 0.5, (quadros, 2)), 8000)
+    return str(caminho)
+
+
+def test_pasta_cache_segue_xdg(monkeypatch, tmp_path):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    assert pasta_cache_picos() == os.path.join(str(tmp_path), 'eco_audio', 'picos')
+
+
+def test_picos_na_pasta_de_cache(tmp_path):
+    musicas = tmp_path / 'musicas'
+    musicas.mkdir()
+    audio = _audio(musicas / 'faixa.wav')
+    cache = str(tmp_path / 'cache')
+    piramide = picos_arquivo(audio, pasta=cache)
+    assert os.listdir(musicas) == ['faixa.wav']
+    assert os.path.exists(caminho_picos(audio, cache))
+    guardada = carregar_picos(audio, cache)
+    np.testing.assert_array_equal(guardada.janela(0, 20000, 100)[1],
+                                  piramide.janela(0, 20000, 100)[1])
+    # O arquivo mudou: a pirâmide guardada é descartada
+    _audio(musicas / 'faixa.wav', quadros=12000, semente=1)
+    assert carregar_picos(audio, cache) is None
+    assert picos_arquivo(audio, pasta=cache).quadros == 12000
+
+
+def test_processar_arquivo_com_pasta_nao_grava_ao_lado(tmp_path):
+    musicas = tmp_path / 'musicas'
+    musicas.mkdir()
+    entrada = _audio(musicas / 'entrada.wav')
+    saida = str(musicas / 'saida.wav')
+    cache = str(tmp_path / 'cache')
+    processar_arquivo(entrada, saida, 50, 0.5, picos=cache)
+    assert sorted(os.listdir(musicas)) == ['entrada.wav', 'saida.wav']
+    assert carregar_picos(entrada, cache).quadros == 20000
+    assert carregar_picos(saida, cache).quadros == sf.info(saida).frames
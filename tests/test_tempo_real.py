@@ -0,0 +1,63 @@
+"""Testes do processador em tempo real."""
+
+import numpy as np
+import pytest
+
+from eco_audio.tempo_real import LIMITE_ALOCACAO_BYTES, ProcessadorTempoReal, simular_fluxo
+
+TAXA = 48000
+
+
+def _impulso(quadros, canais=None, semente=1):
+    forma = (quadros,) if canais is None else (quadros, canais)
+    decaimento = np.exp(-6.9 * np.arange(quadros) / quadros)
+    if canais is not None:
+        decaimento = decaimento[:, np.newaxis]
+    return 0.1 * np.random.RandomState(semente).standard_normal(forma) * decaimento
+
+
+CONFIGURACOES = {
+    'eco': dict(canais=2),
+    'realimentacao': dict(canais=1, realimentacao=True),
+    'ir_estereo': dict(canais=2, impulso=_impulso(4800, 2)),
+    'ir_mono_para_estereo': dict(canais=1, impulso=_impulso(4800, 2), mistura=0.5),
+    'ir_matriz': dict(canais=2, impulso=_impulso(2400, 4), decaimento=0.0),
+}
+
+
+@pytest.mark.parametrize('nome', sorted(CONFIGURACOES))
+@pytest.mark.parametrize('precisao', ['float32', 'float64'])
+@pytest.mark.parametrize('tamanho_bloco', [64, 256, 1024])
+def test_fluxo_sem_alocacao(nome, precisao, tamanho_bloco):
+    argumentos = dict(CONFIGURACOES[nome])
+    canais = argumentos.pop('canais')
+    processador = ProcessadorTempoReal(TAXA, canais, tamanho_bloco, dtype=precisao, **argumentos)
+    # Ajustes no meio da medição de memória, para cobrir os blocos com transição
+    ajustes = [(0.0, {'atraso_ms': 300, 'decaimento': 0.3}), (0.2, {'atraso_ms': 120})]
+    if 'mistura' in argumentos:
+        ajustes.append((0.1, {'mistura': 0.8}))
+    resultado = simular_fluxo(processador, duracao_s=0.5, ajustes=ajustes, blocos_memoria=16)
+    assert resultado['alocado_bytes'] <= LIMITE_ALOCACAO_BYTES
+    assert resultado['saldo_alocado_bytes'] <= LIMITE_ALOCACAO_BYTES
+    assert resultado['sem_alocacao']
+
+
+@pytest.mark.parametrize('precisao, tolerancia', [('float32', 1e-5), ('float64', 1e-12)])
+@pytest.mark.parametrize('canais_impulso', [None, 2, 4])
+def test_convolucao_igual_a_convolve(precisao, tolerancia, canais_impulso):
+    tamanho_bloco = 64
+    impulso = _impulso(1000, canais_impulso)
+    processador = ProcessadorTempoReal(TAXA, 2, tamanho_bloco, decaimento=0.0, impulso=impulso,
+                                       dtype=precisao)
+    entrada = np.random.RandomState(0).uniform(-0.5, 0.5, (40 * tamanho_bloco, 2))
+    saida = np.concatenate([
+        processador.processar(entrada[i:i + tamanho_bloco].astype(precisao)).copy()
+        for i in range(0, len(entrada), tamanho_bloco)])
+    caminhos = impulso.reshape(len(impulso), -1)
+    for canal in range(processador.canais_saida):
+        if caminhos.shape[1] == 4:
+            esperado = (np.convolve(entrada[:, 0], caminhos[:, canal])
+                        + np.convolve(entrada[:, 1], caminhos[:, 2 + canal]))
+        else:
+            esperado = np.convolve(entrada[:, canal], caminhos[:, min(canal, caminhos.shape[1] - 1)])
+        np.testing.assert_allclose(saida[:, canal], esperado[:len(entrada)], atol=tolerancia)